@@ -0,0 +1,154 @@
+import asyncio
+import socket
+
+
+class AsyncIngestEngine:
+    """Collects from any number of sensors concurrently on one asyncio event loop.
+
+    Each sensor is a SensorDataCollector driven through begin_collection(),
+    process_received() and end_collection(), so parsing and buffering are the
+    same as in the threaded path; only the socket I/O runs on the event loop.
+    All sensors share one thread, so there is no GIL contention between
+    per-sensor threads no matter how many sensors are attached.
+
+    Events are reported through callback(sensor_id, event_type, *args):
+    "connecting", "connected", "battery" (percentage), "collecting", the
+    collector's own progress events and "error" (message). A collector that
+    is already connected (e.g. by the preflight) is collected from as is,
+    without connecting or waiting for a battery report again.
+    """
+
+    def __init__(self, calibration_time, sample_time, callback=None,
+                 connect_timeout=1.0, battery_timeout=5, recv_timeout=1.0):
+        self.calibration_time = calibration_time
+        self.sample_time = sample_time
+        self.callback = callback
+        self.connect_timeout = connect_timeout
+        self.battery_timeout = battery_timeout
+        self.recv_timeout = recv_timeout
+        self.results = {}
+        self._streams = []
+
+    def add_sensor(self, sensor_id, collector, samples_buffer=None, sample_sink=None):
+        """Add a sensor to collect from; arguments match SensorDataCollector.collect_data."""
+        self._streams.append((sensor_id, collector, samples_buffer, sample_sink))
+
+    def stop(self):
+        """Ask every collection to finish early (safe from another thread)."""
+        for _, collector, _, _ in self._streams:
+            collector.stop()
+
+    def run(self):
+        """Collect from all sensors and block until they are done.
+
+        Returns {sensor_id: (samples_buffer, battery_percentage)}, with None
+        for sensors that failed.
+        """
+        # A selector loop keeps cancelled receives from losing data on Windows,
+        # where the default proactor loop cannot cancel an overlapped recv cleanly.
+        loop = asyncio.SelectorEventLoop()
+        try:
+            loop.run_until_complete(self._run_all())
+        finally:
+            loop.close()
+        return self.results
+
+    async def _run_all(self):
+        await asyncio.gather(*(self._collect(*stream) for stream in self._streams))
+
+    def _report(self, sensor_id, event_type, *args):
+        if self.callback:
+            self.callback(sensor_id, event_type, *args)
+
+    async def _collect(self, sensor_id, collector, samples_buffer, sample_sink):
+        """Connect to one sensor, read its battery level and collect its data."""
+        self.results[sensor_id] = None
+        preconnected = collector.socket is not None
+        if preconnected:
+            collector.socket.setblocking(False)
+        else:
+            self._report(sensor_id, "connecting")
+            try:
+                await self._connect(collector)
+            except Exception as e:
+                self._report(sensor_id, "error", f"Failed to connect to sensor {sensor_id}: {str(e) or 'timed out'}")
+                return
+
+        try:
+            if not preconnected:
+                self._report(sensor_id, "connected")
+                battery = await self._read_battery(collector)
+                if battery is not None:
+                    self._report(sensor_id, "battery", battery)
+
+            self._report(sensor_id, "collecting")
+            collector.begin_collection(
+                self.calibration_time,
+                self.sample_time,
+                lambda event_type, *args: self._report(sensor_id, event_type, *args),
+                samples_buffer,
+                sample_sink
+            )
+
+            while not collector.stop_requested and collector.collection_time_left() > 0:
+                try:
+                    nbytes = await self._receive(collector, min(self.recv_timeout, collector.collection_time_left()))
+                except OSError:
+                    break
+                if nbytes is None:
+                    continue
+                if not nbytes:
+                    break
+                collector.process_received()
+
+            self.results[sensor_id] = collector.end_collection()
+
+        except Exception as e:
+            self._report(sensor_id, "error", f"Error collecting data from sensor {sensor_id}: {str(e)}")
+        finally:
+            collector.close()
+
+    async def _connect(self, collector):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (collector.sensor_ip, collector.port)),
+                                   self.connect_timeout)
+        except BaseException:
+            sock.close()
+            raise
+        collector.socket = sock
+        collector.reset_stream()
+
+    async def _receive(self, collector, timeout):
+        """Receive into the collector's buffer; returns the byte count, or None on timeout."""
+        loop = asyncio.get_running_loop()
+        try:
+            nbytes = await asyncio.wait_for(
+                loop.sock_recv_into(collector.socket, collector.receive_buffer.writable()),
+                max(timeout, 0.01)
+            )
+        except asyncio.TimeoutError:
+            return None
+        collector.receive_buffer.commit(nbytes)
+        return nbytes
+
+    async def _read_battery(self, collector):
+        """Wait up to battery_timeout for a BATTERY line, like get_battery_status."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.battery_timeout
+        while loop.time() < deadline and not collector.stop_requested:
+            try:
+                nbytes = await self._receive(collector, deadline - loop.time())
+            except OSError:
+                return None
+            if nbytes is None:
+                continue
+            if not nbytes:
+                return None
+            battery = collector.scan_battery()
+            if battery is not None:
+                return battery
+        return None
@@ -0,0 +1,743 @@
+"""Throughput benchmarks for the sensor ingest path.
+
+Run all benchmarks:      python benchmarks.py
+Run selected ones:       python benchmarks.py parser
+"""
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+import numpy as np
+
+from sample_parser import parse_sample_block, parse_sample_lines
+from sample_buffer import SAMPLE_COLUMNS, SampleBuffer, compute_deltas
+from capture_writer import CsvCaptureFile, NpzCaptureFile, load_capture
+from timing_analysis import analyze_timing, analyze_timing_blocks
+from receive_buffer import ReceiveBuffer
+from sensor_data_collector import SensorDataCollector
+from sensor_simulator import run_simulator, text_to_frames
+from s3_upload import stream_zip_to_s3
+
+
+def make_text_samples(count, rate_hz=1000.0, seed=0):
+    """Generate `count` sensor lines in the 'timestamp,ax,ay,az,gx,gy,gz' text protocol."""
+    rng = np.random.default_rng(seed)
+    timestamps = 1700000000.0 + np.arange(count) / rate_hz
+    accel = rng.normal(0.0, 0.2, (count, 3)) + (0.0, 0.0, 9.81)
+    gyro = rng.normal(0.0, 0.01, (count, 3))
+    lines = [
+        f"{t:.4f},{a[0]:.4f},{a[1]:.4f},{a[2]:.4f},{g[0]:.5f},{g[1]:.5f},{g[2]:.5f}\n"
+        for t, a, g in zip(timestamps, accel, gyro)
+    ]
+    return "".join(lines).encode()
+
+
+def split_chunks(data, chunk_size=65536):
+    """Cut a byte stream into recv-sized chunks of complete lines."""
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = data.rfind(b'\n', start, start + chunk_size) + 1
+        if end <= start:
+            end = data.index(b'\n', start) + 1
+        chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+def _legacy_parse(chunk, start_time):
+    """The original per-line loop from SensorDataCollector.collect_data."""
+    raw_data = []
+    for line in chunk.decode().split('\n'):
+        if not line.strip():
+            continue
+        if line.startswith("BATTERY:"):
+            continue
+        parts = line.split(',')
+        if len(parts) == 7:
+            try:
+                client_elapsed = time.time() - start_time
+                timestamp = float(parts[0])
+                ax, ay, az = map(float, parts[1:4])
+                gx, gy, gz = map(float, parts[4:7])
+                raw_data.append((client_elapsed, [timestamp, ax, ay, az, gx, gy, gz]))
+            except:
+                continue
+    return raw_data
+
+
+def _best_of(func, repeat=5):
+    """Return the fastest wall time of `repeat` calls to func."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _report(name, seconds, samples, nbytes):
+    print(f"  {name:<28} {samples / seconds:>14,.0f} samples/s  {nbytes / seconds / 1e6:>8.1f} MB/s")
+
+
+def bench_parser(samples=200000, chunk_size=65536):
+    """Compare the per-line parser against the bulk numpy parser."""
+    data = make_text_samples(samples)
+    chunks = split_chunks(data, chunk_size)
+    print(f"parser: {samples:,} samples, {len(data) / 1e6:.1f} MB in {len(chunks)} chunks")
+
+    start_time = time.time()
+    legacy = _best_of(lambda: [_legacy_parse(chunk, start_time) for chunk in chunks])
+    per_line = _best_of(lambda: [parse_sample_lines(chunk) for chunk in chunks])
+    bulk = _best_of(lambda: [parse_sample_block(chunk) for chunk in chunks])
+
+    _report("legacy loop", legacy, samples, len(data))
+    _report("parse_sample_lines", per_line, samples, len(data))
+    _report("parse_sample_block", bulk, samples, len(data))
+    print(f"  speedup vs legacy: {legacy / bulk:.1f}x")
+
+
+def _traced_peak(func):
+    """Return (result, peak traced allocation in bytes) of calling func."""
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def bench_buffer(samples=200000, chunk_size=65536):
+    """Memory per sample of the legacy list-of-tuples store versus SampleBuffer."""
+    chunks = split_chunks(make_text_samples(samples), chunk_size)
+    print(f"buffer: {samples:,} samples")
+
+    def legacy():
+        start_time = time.time()
+        raw_data = []
+        for chunk in chunks:
+            raw_data.extend(_legacy_parse(chunk, start_time))
+        return raw_data
+
+    def columnar():
+        buffer = SampleBuffer()
+        for i, chunk in enumerate(chunks):
+            buffer.append(parse_sample_block(chunk)[0], i)
+        return buffer
+
+    _, legacy_peak = _traced_peak(legacy)
+    buffer, buffer_peak = _traced_peak(columnar)
+    print(f"  {'list of tuples':<28} {legacy_peak / samples:>8.0f} bytes/sample (peak)")
+    print(f"  {'SampleBuffer':<28} {buffer_peak / samples:>8.0f} bytes/sample (peak), "
+          f"{buffer.nbytes / len(buffer):.0f} bytes/sample stored")
+
+
+def _feed_socket(data, chunk_size=65536):
+    """Return a socket that receives `data` from a feeder thread, then EOF."""
+    receiver, sender = socket.socketpair()
+
+    def feed():
+        for start in range(0, len(data), chunk_size):
+            sender.sendall(data[start:start + chunk_size])
+        sender.close()
+
+    threading.Thread(target=feed, daemon=True).start()
+    return receiver
+
+
+def bench_receive(megabytes=64, buffer_size=65536):
+    """Allocations per MB of the recv/decode/split path versus recv_into framing.
+
+    Counts the objects (and their bytes) each framing step creates for
+    every received chunk, up to the point the lines are handed to the parser.
+    """
+    data = make_text_samples(20000) * max(1, int(megabytes * 1e6 / 1.3e6))
+    mb = len(data) / 1e6
+    print(f"receive: {mb:.0f} MB over a local socket pair, {buffer_size // 1024} KiB buffer")
+
+    def legacy():
+        sock = _feed_socket(data)
+        objects = nbytes = 0
+        data_fragment = ""
+        while True:
+            chunk = sock.recv(buffer_size)
+            if not chunk:
+                break
+            decoded = chunk.decode()
+            data_str = data_fragment + decoded
+            lines = data_str.split('\n')
+            data_fragment = lines[-1]
+            objects += 4 + len(lines)
+            nbytes += (sys.getsizeof(chunk) + sys.getsizeof(decoded) + sys.getsizeof(data_str)
+                       + sys.getsizeof(lines) + sum(sys.getsizeof(line) for line in lines))
+        sock.close()
+        return objects, nbytes
+
+    def ring():
+        sock = _feed_socket(data)
+        receive_buffer = ReceiveBuffer(buffer_size)
+        objects = nbytes = 0
+        while receive_buffer.recv_from(sock):
+            block = receive_buffer.take_lines()
+            if block:
+                objects += 1
+                nbytes += sys.getsizeof(block)
+        sock.close()
+        return objects, nbytes
+
+    for name, func in (("recv + decode + split", legacy), ("recv_into + take_lines", ring)):
+        (objects, nbytes), peak = _traced_peak(func)
+        print(f"  {name:<28} {objects / mb:>10,.0f} objects/MB {nbytes / mb / 1e6:>6.2f} MB allocated/MB "
+              f"peak {peak / 1e3:>7.0f} KB")
+
+
+def bench_protocol(samples=500000, buffer_size=65536):
+    """Text lines versus binary frames through SensorDataCollector over a local socket.
+
+    The same samples are sent in both encodings (converted with the
+    simulator's text_to_frames) and decoded with take_received(), which
+    auto-detects the protocol like a live connection does.
+    """
+    text = b"BATTERY:87%\n" + make_text_samples(samples)
+    frames, _ = text_to_frames(text)
+    print(f"protocol: {samples:,} samples over a local socket pair")
+
+    for name, data in (("text lines", text), ("binary frames", frames)):
+        def receive():
+            collector = SensorDataCollector("127.0.0.1", buffer_size=buffer_size)
+            collector.reset_stream()
+            sock = _feed_socket(data)
+            received = 0
+            while collector.receive_buffer.recv_from(sock):
+                received += len(collector.take_received()[0])
+            sock.close()
+            assert received == samples, received
+            return collector.stream_protocol
+
+        seconds = _best_of(receive, repeat=3)
+        _report(f"{name} ({receive()})", seconds, samples, len(data))
+        print(f"  {'':<28} {len(data) / samples:>14.1f} bytes/sample")
+
+
+def bench_capture_format(minutes=10, rate_hz=1000.0, block_rows=1000):
+    """Write time (and its end-of-run finalize share), file size and load time of a capture as CSV versus .npz."""
+    samples, _ = parse_sample_block(make_text_samples(int(minutes * 60 * rate_hz), rate_hz))
+    rows = np.column_stack((samples, compute_deltas(samples[:, 0])))
+    blocks = [rows[start:start + block_rows] for start in range(0, len(rows), block_rows)]
+    print(f"capture format: {minutes} minute capture at {rate_hz:g} Hz ({len(rows):,} rows)")
+
+    directory = tempfile.mkdtemp(prefix="evident_bench_")
+    for name, output_class, extension in (("CSV", CsvCaptureFile, ".csv"), ("npz", NpzCaptureFile, ".npz")):
+        filename = os.path.join(directory, "capture" + extension)
+
+        start = time.perf_counter()
+        output = output_class(filename, SAMPLE_COLUMNS, {'test_id': 'bench'})
+        for block in blocks:
+            output.write_rows(block)
+        finalize_start = time.perf_counter()
+        output.finalize()
+        finalize_time = time.perf_counter() - finalize_start
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns, _ = load_capture(filename)
+        load_time = time.perf_counter() - start
+        assert len(columns["Time"]) == len(rows)
+
+        print(f"  {name:<6} write {write_time:>7.2f} s (finalize {finalize_time:.3f} s)  "
+              f"size {os.path.getsize(filename) / 1e6:>7.1f} MB  load {load_time:>7.3f} s")
+        os.remove(filename)
+    os.rmdir(directory)
+
+
+def bench_upload(captures=4, minutes=10, rate_hz=1000.0, part_size=8 * 1024 * 1024, concurrency=4):
+    """Upload MB/s and temporary disk use: zip file + upload_file versus streaming multipart.
+    
+    Runs against moto's local S3 server (pip install "moto[server]").
+    """
+    try:
+        import boto3
+        import logging
+        from moto.server import ThreadedMotoServer
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    except ImportError:
+        print("upload: skipped, needs boto3 and moto[server]")
+        return
+    
+    directory = tempfile.mkdtemp(prefix="evident_bench_")
+    samples, _ = parse_sample_block(make_text_samples(int(minutes * 60 * rate_hz), rate_hz))
+    rows = np.column_stack((samples, compute_deltas(samples[:, 0])))
+    paths = []
+    for sensor in range(captures):
+        output = NpzCaptureFile(os.path.join(directory, f"capture_sensor{sensor + 1}.npz"), SAMPLE_COLUMNS)
+        output.write_rows(rows)
+        output.finalize()
+        paths.append(output.filename)
+    total = sum(os.path.getsize(path) for path in paths)
+    print(f"upload: {captures} captures, {total / 1e6:.1f} MB, part size {part_size >> 20} MB, "
+          f"{concurrency} parts in flight")
+    
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    s3 = boto3.client('s3', endpoint_url=f"http://{host}:{port}", region_name='us-east-1',
+                      aws_access_key_id='bench', aws_secret_access_key='bench')
+    s3.create_bucket(Bucket='evident-bench')
+    
+    def zip_then_upload():
+        zip_filename = os.path.join(directory, "upload.zip")
+        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for path in paths:
+                zipf.write(path, arcname=os.path.basename(path))
+        disk = os.path.getsize(zip_filename)
+        s3.upload_file(zip_filename, 'evident-bench', "zip.zip")
+        os.remove(zip_filename)
+        return disk
+    
+    def stream():
+        stream_zip_to_s3(s3, 'evident-bench', "stream.zip", paths, part_size, concurrency)
+        return 0
+    
+    try:
+        for name, func in (("zip file", zip_then_upload), ("streaming", stream)):
+            start = time.perf_counter()
+            disk = func()
+            seconds = time.perf_counter() - start
+            print(f"  {name:<10} {seconds:>7.2f} s  {total / seconds / 1e6:>7.1f} MB/s  "
+                  f"temporary disk {disk / 1e6:>7.1f} MB")
+    finally:
+        server.stop()
+        for path in paths:
+            os.remove(path)
+        os.rmdir(directory)
+
+
+def bench_progress(updates=100000, rate_hz=10.0):
+    """Worker CPU and queued GUI events for per-chunk progress, unthrottled versus ProgressThrottle."""
+    from PyQt5.QtCore import QCoreApplication, QObject, pyqtSlot
+    from data_collection_worker import DataCollectionWorker
+
+    class Receiver(QObject):
+        def __init__(self):
+            super().__init__()
+            self.count = 0
+
+        @pyqtSlot(int, str, int)
+        def on_progress(self, sensor_id, message, progress):
+            self.count += 1
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    print(f"progress: {updates:,} progress callbacks (one per received chunk)")
+    for name, rate in (("every chunk", 0), (f"throttled {rate_hz:g} Hz", rate_hz)):
+        worker = DataCollectionWorker({'sensor_ip1': '127.0.0.1', 'progress_rate_hz': rate})
+        receiver = Receiver()
+        worker.sensor_progress.connect(receiver.on_progress)
+        cpu = []
+
+        def report():
+            # Collector threads call this for every chunk they process
+            start = time.thread_time()
+            begin = time.monotonic()
+            for i in range(updates):
+                elapsed = time.monotonic() - begin
+                worker.report_collection_progress(1, "recording_progress", i * 100 // updates, elapsed, 10)
+            worker.progress_throttle.flush()
+            cpu.append(time.thread_time() - start)
+
+        thread = threading.Thread(target=report)
+        thread.start()
+        thread.join()
+
+        start = time.perf_counter()
+        app.processEvents()
+        gui_time = time.perf_counter() - start
+        print(f"  {name:<16} worker CPU {cpu[0] * 1e6 / updates:>6.2f} us/chunk  "
+              f"{receiver.count:>7,} GUI events  (delivered in {gui_time * 1000:.0f} ms)")
+
+
+def bench_live_plot(rates=(1000, 10000, 50000), sensors=2, seconds=3.0, chunk_seconds=0.02, size=(900, 400)):
+    """Frame time of the live plot and its cost to the ingest threads, at several sample rates.
+
+    Needs a display; set QT_QPA_PLATFORM=offscreen to run it headless.
+    """
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtWidgets import QApplication
+    from live_plot_widget import LivePlotWidget
+
+    app = QApplication.instance() or QApplication([])
+    print(f"live plot: {sensors} sensors, {size[0]}x{size[1]} px, {seconds:g} s per rate, 60 fps target")
+    for rate in rates:
+        rows = max(int(rate * chunk_seconds), 1)
+        block = parse_sample_block(make_text_samples(rows, rate))[0]
+        widget = LivePlotWidget()
+        widget.stop()  # frames are driven below
+        widget.resize(*size)
+        widget.set_sensors(range(1, sensors + 1))
+        image = QImage(widget.size(), QImage.Format_ARGB32_Premultiplied)
+        stop = threading.Event()
+        ingest = []
+
+        def feed(sensor_id):
+            # Paced like a sensor: one block every chunk_seconds
+            cpu = 0.0
+            blocks = 0
+            start = time.monotonic()
+            while not stop.is_set():
+                timed = block.copy()
+                timed[:, 0] += blocks * chunk_seconds
+                before = time.thread_time()
+                widget.add_samples(sensor_id, timed)
+                cpu += time.thread_time() - before
+                blocks += 1
+                time.sleep(max(start + blocks * chunk_seconds - time.monotonic(), 0))
+            ingest.append((blocks, cpu, blocks * chunk_seconds / (time.monotonic() - start)))
+
+        threads = [threading.Thread(target=feed, args=(sensor_id,)) for sensor_id in range(1, sensors + 1)]
+        for thread in threads:
+            thread.start()
+        frame_times = []
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            begin = time.perf_counter()
+            widget.refresh()
+            widget.render(image)
+            app.processEvents()
+            frame_times.append(time.perf_counter() - begin)
+            time.sleep(max(1 / 60 - frame_times[-1], 0))
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        frame_ms = np.array(frame_times) * 1000
+        blocks = sum(count for count, _, _ in ingest)
+        cpu_us = sum(cpu for _, cpu, _ in ingest) * 1e6 / max(blocks, 1)
+        pace = min(speed for _, _, speed in ingest)
+        print(f"  {rate:>6} Hz  frame mean {frame_ms.mean():5.2f} ms  p99 {np.percentile(frame_ms, 99):5.2f} ms  "
+              f"({1000 / max(frame_ms.mean(), 1e-3):5.0f} fps possible)  "
+              f"ingest add_samples {cpu_us:4.1f} us/block, kept {pace * 100:3.0f}% of real time")
+
+
+def bench_spectrum(rates=(1000, 10000, 50000), seconds=20.0, chunk_seconds=0.02):
+    """CPU time of the incremental Welch spectrum per second of recording, at several sample rates."""
+    from spectrum_analyzer import SpectrumAnalyzer, find_peak, spectrum_level
+
+    print(f"spectrum: {seconds:g} s of samples per rate, 2 s segments (0.5 Hz bins, interpolated peaks) every 0.25 s")
+    for rate in rates:
+        rows = max(int(rate * chunk_seconds), 1)
+        block = parse_sample_block(make_text_samples(rows, rate))[0]
+        blocks = []
+        for i in range(int(seconds / chunk_seconds)):
+            timed = block.copy()
+            timed[:, 0] += i * chunk_seconds
+            blocks.append(timed)
+        updates = []
+        analyzer = SpectrumAnalyzer(lambda frequencies, psd: updates.append(len(frequencies)))
+        start = time.perf_counter()
+        write_cpu = time.thread_time()
+        for timed in blocks:
+            analyzer.write(timed)
+        write_cpu = time.thread_time() - write_cpu
+        spectrum = analyzer.finish()
+        elapsed = time.perf_counter() - start
+        print(f"  {rate:>6} Hz  {elapsed * 1000 / seconds:6.2f} ms per recorded second "
+              f"({elapsed / seconds * 100:4.1f}% of a core)  write {write_cpu * 1e6 / len(blocks):4.1f} us/block  "
+              f"{spectrum['segments']} segments, {len(updates)} live updates, {analyzer.dropped_blocks} blocks dropped")
+
+    # Interpolated peak of a noisy tone at each shaker setting (0.33 RPS apart)
+    errors = []
+    for frequency in (10, 10.33, 10.66, 11, 11.33, 11.66):
+        times = np.arange(int(10 * rates[0])) / rates[0]
+        samples = np.zeros((len(times), 7))
+        samples[:, 0] = times
+        samples[:, 3] = np.sin(2 * np.pi * frequency * times) + 0.05 * np.random.randn(len(times))
+        analyzer = SpectrumAnalyzer()
+        for i in range(0, len(samples), 20):
+            analyzer.write(samples[i:i + 20])
+        spectrum = analyzer.finish()
+        errors.append(abs(find_peak(spectrum['frequencies'], spectrum_level(spectrum['psd']), frequency) - frequency))
+    print(f"  peak error at the shaker settings: max {max(errors) * 1000:.0f} mHz")
+
+
+def _serve_fake_shaker(delay=0.0):
+    """Start a local HTTP/1.1 stand-in for the shaker controller; returns (server, connection count)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    connections = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            connections[0] += 1
+            super().setup()
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = b'{"voltage": 16.2}' if self.path.startswith("/voltage") else b"ok"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, connections
+
+
+def bench_shaker(commands=200, delay=0.05):
+    """Shaker command round trips per request versus on the pooled session, and a queued burst.
+
+    The pooled run also prints the latency histogram recorded by ShakerMetrics.
+
+    The burst measures how long the GUI thread is held while submitting
+    many commands through ShakerCommandQueue, and how many are sent.
+    """
+    import requests
+    from PyQt5.QtCore import QCoreApplication
+    from shaker_controller import ShakerController
+    from shaker_command_queue import ShakerCommandQueue
+    from shaker_metrics import ShakerMetrics
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    server, connections = _serve_fake_shaker()
+    url = f"http://127.0.0.1:{server.server_port}"
+    print(f"shaker: {commands} commands to a local stand-in controller")
+
+    start = time.perf_counter()
+    for _ in range(commands):
+        requests.get(f"{url}/move?value=10", timeout=2)
+    per_request = time.perf_counter() - start
+    opened = connections[0]
+    metrics = ShakerMetrics()
+    controller = ShakerController(url, metrics=metrics)
+    start = time.perf_counter()
+    for _ in range(commands):
+        controller.set_frequency(10)
+    pooled = time.perf_counter() - start
+    print(f"  {'requests.get':<22} {per_request * 1000 / commands:6.2f} ms/command  {opened} connections")
+    print(f"  {'pooled session':<22} {pooled * 1000 / commands:6.2f} ms/command  {connections[0] - opened} connections")
+    for line in metrics.summary_lines():
+        print(f"    {line}")
+    server.shutdown()
+
+    # A controller that takes `delay` to answer, and a burst of frequency changes and lower presses
+    server, connections = _serve_fake_shaker(delay)
+    controller = ShakerController(f"http://127.0.0.1:{server.server_port}")
+    queue = ShakerCommandQueue(controller)
+    queue.start()
+    done = []
+    start = time.perf_counter()
+    for i in range(commands):
+        queue.submit('set_frequency', 10 + i % 6 / 3, callback=lambda result, error: done.append(result))
+        queue.submit('lower', i % 2 == 0)
+    held = time.perf_counter() - start
+    while queue.pending() or not done:
+        app.processEvents()
+        time.sleep(0.01)
+    time.sleep(2 * delay)
+    app.processEvents()
+    queue.stop()
+    server.shutdown()
+    print(f"  {'queued burst':<22} GUI thread held {held * 1000:.1f} ms for {2 * commands} commands, "
+          f"{len(done)} frequency change(s) sent after coalescing (controller answers in {delay * 1000:.0f} ms)")
+
+
+def bench_spill(lengths=(1000000, 4000000, 16000000), memory_budget=32 * 1024 * 1024, block_rows=500):
+    """Peak memory of capture, timing analysis and save, with and without a memory budget."""
+    block = parse_sample_block(make_text_samples(block_rows))[0]
+    print(f"spill: full-column SampleBuffer, budget {memory_budget / 2 ** 20:.0f} MiB")
+
+    def capture(samples, budget):
+        buffer = SampleBuffer(memory_budget=budget)
+        offset = block[-1, 0] - block[0, 0] + 1e-3
+        for i in range(samples // block_rows):
+            timed = block.copy()
+            timed[:, 0] += i * offset
+            buffer.append(timed, i)
+        if buffer.spilled:
+            stats = analyze_timing_blocks(lambda: buffer.iter_column("Time"))
+        else:
+            stats = analyze_timing(buffer.column("Time"))
+        rows = sum(len(rows) for rows in buffer.iter_rows())
+        buffer.close()
+        return stats, rows
+
+    for samples in lengths:
+        for name, budget in (("unbounded", None), ("budget", memory_budget)):
+            start = time.perf_counter()
+            (stats, rows), peak = _traced_peak(lambda: capture(samples, budget))
+            assert rows == samples and stats.samples == samples
+            print(f"  {samples:>12,} samples  {name:<10} peak {peak / 1e6:>8.1f} MB  "
+                  f"{time.perf_counter() - start:>6.1f} s")
+
+
+def _start_simulators(count, rate_hz, base_port=18888, protocol='text'):
+    """Start `count` simulated sensors, each in its own process.
+
+    Returns (addresses, stop_event, processes).
+    """
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    processes = []
+    addresses = []
+    for i in range(count):
+        ready = context.Event()
+        process = context.Process(target=run_simulator, args=(base_port + i, rate_hz, ready, stop),
+                                  kwargs={'protocol': protocol}, daemon=True)
+        process.start()
+        if not ready.wait(10):
+            raise RuntimeError(f"Simulated sensor on port {base_port + i} did not start")
+        processes.append(process)
+        addresses.append(f"127.0.0.1:{base_port + i}")
+    return addresses, stop, processes
+
+
+def _stop_simulators(stop, processes):
+    stop.set()
+    for process in processes:
+        process.join(5)
+
+
+def _check_capture(data, rate_hz, sample_time):
+    """Return a failure reason for one sensor's recording, or None if it kept up."""
+    if data is None or len(data) < 2:
+        return "no data"
+    times = data.column("Time")
+    gaps = int(np.count_nonzero(np.diff(times) > 1.5 / rate_hz))
+    if gaps:
+        return f"{gaps} gaps"
+    expected = rate_hz * sample_time
+    if len(data) < 0.98 * expected:
+        return f"{len(data) / expected:.0%} of samples"
+    return None
+
+
+def _run_collectors(addresses, rate_hz, calibration_time, sample_time):
+    """Collect with bare SensorDataCollectors, one thread each; returns failure reasons."""
+    results = {}
+
+    def collect(address):
+        host, port = address.split(':')
+        collector = SensorDataCollector(host, int(port))
+        if collector.connect() is not True:
+            results[address] = "connect failed"
+            return
+        try:
+            collector.get_battery_status()
+            data, _ = collector.collect_data(calibration_time, sample_time)
+            results[address] = _check_capture(data, rate_hz, sample_time)
+        finally:
+            collector.close()
+
+    threads = [threading.Thread(target=collect, args=(address,)) for address in addresses]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [reason for reason in results.values() if reason]
+
+
+def _run_worker(addresses, rate_hz, calibration_time, sample_time, engine, save_path):
+    """Collect with a DataCollectionWorker (CSV streaming included); returns failure reasons."""
+    from data_collection_worker import DataCollectionWorker
+
+    config = {
+        'sensor_ips': {i + 1: address for i, address in enumerate(addresses)},
+        'ingest_engine': engine,
+        'calibration_time': calibration_time,
+        'sample_time': sample_time,
+        'save_path': save_path,
+        'vin': 'BENCH', 'car_model': 'Bench', 'year': 2024, 'mileage': 0, 'trim': 'Bench',
+        'soc': 100, 'file_prefix': 'bench', 'test_number': 1, 'test_id': 'bench',
+        # Measure ingest only, and keep benchmark runs out of the user's run catalog
+        'catalog': False, 'journal': False, 'spectrum': False,
+    }
+    worker = DataCollectionWorker(config)
+    worker.run()
+
+    failures = [_check_capture(data, rate_hz, sample_time) for data in worker.sensor_data.values()]
+    failures = [reason for reason in failures if reason]
+    worker.close()
+    if worker.outlier_detected:
+        failures.append("timing outliers")
+    if worker.error_occurred and not failures:
+        failures.append("worker error")
+    return failures
+
+
+def bench_sustained(max_sensors=4, rates=(1000, 2000, 5000, 10000, 20000, 50000, 100000),
+                    calibration_time=0.5, sample_time=3, protocol='text'):
+    """Highest sample rate 1..max_sensors simulated sensors sustain without loss or outliers.
+
+    Each simulated sensor runs in its own process (sensor_simulator.py) and
+    drops samples the way the firmware does when its client falls behind.
+    Rates are stepped up until a run loses samples, has timing outliers or
+    records less than 98% of the expected samples. The default rates all
+    have whole-microsecond periods, so the simulator's 6-decimal timestamps
+    have exact deltas and never look like outliers by themselves.
+    """
+    print(f"sustained: {sample_time}s {protocol} recordings, rates {rates[0]:,}..{rates[-1]:,} Hz per sensor")
+    save_path = tempfile.mkdtemp(prefix="evident_bench_")
+
+    paths = [("collector", lambda addresses, rate: _run_collectors(addresses, rate, calibration_time, sample_time))]
+    for engine in ('threads', 'asyncio'):
+        paths.append((f"worker ({engine})",
+                      lambda addresses, rate, engine=engine:
+                      _run_worker(addresses, rate, calibration_time, sample_time, engine, save_path)))
+
+    for name, run in paths:
+        for sensors in range(1, max_sensors + 1):
+            best = None
+            failure = None
+            for rate in rates:
+                addresses, stop, processes = _start_simulators(sensors, rate, protocol=protocol)
+                try:
+                    failures = run(addresses, rate)
+                finally:
+                    _stop_simulators(stop, processes)
+                if failures:
+                    failure = f"{rate:,} Hz: {failures[0]}"
+                    break
+                best = rate
+            sustained = f"{best:>8,} Hz/sensor {best * sensors:>10,} samples/s" if best else f"{'none':>44}"
+            print(f"  {name:<18} {sensors} sensor(s) {sustained}"
+                  + (f"  (failed at {failure})" if failure else ""))
+
+
+BENCHMARKS = {
+    'parser': bench_parser,
+    'buffer': bench_buffer,
+    'receive': bench_receive,
+    'protocol': bench_protocol,
+    'capture': bench_capture_format,
+    'spill': bench_spill,
+    'upload': bench_upload,
+    'progress': bench_progress,
+    'live_plot': bench_live_plot,
+    'spectrum': bench_spectrum,
+    'shaker': bench_shaker,
+    'sustained': bench_sustained,
+}
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,249 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import struct
+import time
+import zlib
+import numpy as np
+from capture_writer import CsvCaptureFile, NpzCaptureFile
+from utils import app_data_dir
+
+# Journal layout: a header (magic, JSON length, JSON describing the
+# capture) padded to a multiple of HEADER_SIZE, followed by BLOCK_SIZE data
+# blocks. Each data block starts with magic, sequence number, row count and
+# the CRC32 of its rows, and holds up to rows_per_block float64 rows. The
+# last block may be partly filled and shorter than BLOCK_SIZE.
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b"EVJ1"
+BLOCK_MAGIC = b"EVJB"
+HEADER_SIZE = 4096
+BLOCK_SIZE = 65536
+BLOCK_HEADER = struct.Struct('<4sIII')
+
+
+class JournalCaptureFile:
+    """Crash-safe journal of a capture, written next to the real output files.
+
+    Acts as one more output of a CaptureWriter: rows are appended in fixed
+    size blocks and fsynced every fsync_interval seconds, so a crash loses
+    at most that much data. A partly filled block is rewritten in place at
+    each sync until it is full, so slow captures do not grow the journal
+    by a whole block per sync. On a normal finish or abort the journal is
+    deleted; a journal left on disk means the capture did not complete and
+    can be turned into output files with recover_journal(). With a
+    registry_dir the journal is also listed there while it is open, so it
+    is found after a crash whichever folder the capture was saved in.
+    """
+
+    def __init__(self, output_filename, columns, metadata=None, fsync_interval=1.0, export_csv=False,
+                 registry_dir=None):
+        self.filename = None  # not an output file; removed when the capture completes
+        self.journal_filename = output_filename + JOURNAL_SUFFIX
+        self.columns = tuple(columns)
+        self.metadata = dict(metadata or {})
+        self.fsync_interval = fsync_interval
+        self.rows_per_block = (BLOCK_SIZE - BLOCK_HEADER.size) // (8 * len(self.columns))
+        self._pending = np.empty((self.rows_per_block, len(self.columns)))
+        self._pending_rows = 0
+        self._written_rows = 0  # rows of the block being filled already in the file
+        self._crc = 0
+        self._sequence = 0
+        self._last_sync = time.monotonic()
+
+        header = json.dumps({
+            'output_filename': output_filename,
+            'columns': self.columns,
+            'export_csv': export_csv,
+            'metadata': self.metadata
+        }, default=str).encode()
+        header = JOURNAL_MAGIC + struct.pack('<I', len(header)) + header
+        self._block_offset = _header_size(len(header))
+
+        self._file = open(self.journal_filename, 'wb')
+        self._file.write(header.ljust(self._block_offset, b'\0'))
+        self._sync()
+        self.registry_dir = registry_dir
+        if registry_dir:
+            register_journal(self.journal_filename, registry_dir)
+
+    def write_rows(self, rows):
+        """Append an (n, columns) block of rows."""
+        written = 0
+        while written < len(rows):
+            n = min(len(rows) - written, self.rows_per_block - self._pending_rows)
+            self._pending[self._pending_rows:self._pending_rows + n] = rows[written:written + n]
+            self._pending_rows += n
+            written += n
+            if self._pending_rows == self.rows_per_block:
+                self._write_block()
+
+        if time.monotonic() - self._last_sync >= self.fsync_interval:
+            # Write the partial block too so at most fsync_interval of data is at risk
+            self._write_block()
+            self._sync()
+
+    def finalize(self):
+        """The capture completed normally; the journal is no longer needed."""
+        self._file.close()
+        os.remove(self.journal_filename)
+        if self.registry_dir:
+            unregister_journal(self.journal_filename, self.registry_dir)
+
+    def abort(self):
+        """The capture was discarded; so is the journal."""
+        self.finalize()
+
+    def _write_block(self):
+        """Write the rows of the block being filled that are not in the file yet, then its header."""
+        if self._written_rows == self._pending_rows:
+            return
+        row_size = 8 * len(self.columns)
+        payload = self._pending[self._written_rows:self._pending_rows].astype('<f8').tobytes()
+        self._crc = zlib.crc32(payload, self._crc)
+        self._file.seek(self._block_offset + BLOCK_HEADER.size + self._written_rows * row_size)
+        self._file.write(payload)
+        self._file.seek(self._block_offset)
+        self._file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, self._sequence, self._pending_rows, self._crc))
+        self._written_rows = self._pending_rows
+
+        if self._pending_rows == self.rows_per_block:
+            self._block_offset += BLOCK_SIZE
+            self._sequence += 1
+            self._pending_rows = 0
+            self._written_rows = 0
+            self._crc = 0
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+
+def read_journal(journal_filename):
+    """Read a journal; returns (header, rows) with every intact block's rows.
+
+    Reading stops at the first missing, torn or corrupt block.
+    """
+    with open(journal_filename, 'rb') as file:
+        block = file.read(8)
+        if len(block) < 8 or block[:4] != JOURNAL_MAGIC:
+            raise ValueError(f"{journal_filename} is not a capture journal")
+        length = struct.unpack_from('<I', block, 4)[0]
+        header = json.loads(file.read(length))
+        file.seek(_header_size(8 + length))
+        width = len(header['columns'])
+
+        parts = []
+        sequence = 0
+        while True:
+            block = file.read(BLOCK_SIZE)
+            if len(block) < BLOCK_HEADER.size:
+                break
+            magic, block_sequence, rows, crc = BLOCK_HEADER.unpack_from(block)
+            payload = block[BLOCK_HEADER.size:BLOCK_HEADER.size + rows * width * 8]
+            if (magic != BLOCK_MAGIC or block_sequence != sequence
+                    or len(payload) != rows * width * 8 or zlib.crc32(payload) != crc):
+                break
+            parts.append(np.frombuffer(payload, dtype='<f8').reshape(rows, width))
+            sequence += 1
+
+    rows = np.concatenate(parts) if parts else np.empty((0, width))
+    return header, rows
+
+
+def _header_size(length):
+    """Bytes taken by a journal header of `length` bytes: whole HEADER_SIZE pages."""
+    return -(-length // HEADER_SIZE) * HEADER_SIZE
+
+
+def journal_registry_dir():
+    """Per-user folder listing the journals of captures in progress, wherever they are saved."""
+    return os.path.join(app_data_dir(), 'journals')
+
+
+def _registry_entry(journal_filename, registry_dir):
+    journal_filename = os.path.abspath(journal_filename)
+    name = hashlib.sha1(journal_filename.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(registry_dir, name + ".path"), journal_filename
+
+
+def register_journal(journal_filename, registry_dir):
+    """List an open journal in registry_dir; the journal works without it, so failures are ignored."""
+    entry, journal_filename = _registry_entry(journal_filename, registry_dir)
+    try:
+        os.makedirs(registry_dir, exist_ok=True)
+        with open(entry, 'w', encoding='utf-8') as file:
+            file.write(journal_filename)
+    except OSError:
+        pass
+
+
+def unregister_journal(journal_filename, registry_dir):
+    """Remove a journal from registry_dir."""
+    entry, _ = _registry_entry(journal_filename, registry_dir)
+    try:
+        os.remove(entry)
+    except OSError:
+        pass
+
+
+def find_incomplete_journals(directory=None, registry_dir=None):
+    """Return the journals of captures that never completed.
+
+    Looks in directory and at every journal listed in registry_dir;
+    entries of journals that no longer exist (recovered or deleted) are
+    dropped from the registry.
+    """
+    journals = set()
+    if directory is not None:
+        journals.update(os.path.abspath(journal) for journal in
+                        glob.glob(os.path.join(glob.escape(directory), "*" + JOURNAL_SUFFIX)))
+    if registry_dir and os.path.isdir(registry_dir):
+        for entry in glob.glob(os.path.join(glob.escape(registry_dir), "*.path")):
+            try:
+                with open(entry, encoding='utf-8') as file:
+                    journal = file.read().strip()
+            except OSError:
+                continue
+            if journal and os.path.exists(journal):
+                journals.add(journal)
+            else:
+                try:
+                    os.remove(entry)
+                except OSError:
+                    pass
+    return sorted(journals)
+
+
+def recover_journal(journal_filename):
+    """Turn an incomplete capture's journal into normal output files.
+
+    Writes the .npz (and the CSV export if the capture had one) with the
+    recovered rows, marks the metadata as recovered, cleans up the partial
+    outputs and deletes the journal. Returns (filenames, row_count).
+    """
+    header, rows = read_journal(journal_filename)
+    # The journal sits next to its output, even if the folder was moved or the path was relative
+    output_filename = journal_filename[:-len(JOURNAL_SUFFIX)]
+    columns = header['columns']
+    metadata = dict(header['metadata'], recovered=True)
+
+    # Leftovers of the interrupted run
+    for leftover in (output_filename + ".part", output_filename + ".spool"):
+        if os.path.isdir(leftover):
+            shutil.rmtree(leftover, ignore_errors=True)
+        elif os.path.exists(leftover):
+            os.remove(leftover)
+
+    outputs = [NpzCaptureFile(output_filename, columns, metadata)]
+    if header.get('export_csv'):
+        outputs.append(CsvCaptureFile(os.path.splitext(output_filename)[0] + ".csv", columns, metadata))
+    for output in outputs:
+        if len(rows):
+            output.write_rows(rows)
+        output.finalize()
+
+    os.remove(journal_filename)
+    return [output.filename for output in outputs], len(rows)
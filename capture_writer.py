@@ -0,0 +1,200 @@
+import csv
+import json
+import os
+import shutil
+import queue
+import threading
+import zipfile
+import numpy as np
+from sample_buffer import SAMPLE_COLUMNS, compute_deltas
+
+# Name of the metadata entry in .npz captures
+METADATA_KEY = "metadata"
+
+
+class CsvCaptureFile:
+    """CSV output file written to a temporary name and renamed into place on finalize."""
+
+    def __init__(self, filename, columns=SAMPLE_COLUMNS, metadata=None):
+        self.filename = filename
+        self.temp_filename = filename + ".part"
+        # CSV has nowhere to put metadata; kept for interface parity with NpzCaptureFile
+        self.metadata = dict(metadata or {})
+        self._file = open(self.temp_filename, mode='w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write_rows(self, rows):
+        """Append an (n, columns) block of rows."""
+        self._writer.writerows(rows.tolist())
+
+    def finalize(self):
+        """Flush to disk and atomically move the file to its final name."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.temp_filename, self.filename)
+
+    def abort(self):
+        """Close and delete the partial file."""
+        self._file.close()
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+
+class NpzCaptureFile:
+    """Columnar binary capture: a .npz archive with one float64 array per column.
+
+    Rows are appended to one raw spool file per column while recording;
+    finalize() copies the spools into an uncompressed .npz (loadable with
+    numpy.load) together with the metadata as a JSON string, then renames
+    it into place.
+
+    That copy is the one end-of-run cost left, about 1.5 s per GB of
+    capture: each .npz member must be contiguous, so the columns cannot be
+    streamed into the archive while rows are still arriving interleaved.
+    The journal (see capture_journal) covers a crash in the meantime.
+    """
+
+    def __init__(self, filename, columns=SAMPLE_COLUMNS, metadata=None):
+        self.filename = filename
+        self.temp_filename = filename + ".part"
+        self.columns = tuple(columns)
+        self.metadata = dict(metadata or {})
+        self.rows = 0
+        self._spool_dir = filename + ".spool"
+        os.makedirs(self._spool_dir, exist_ok=True)
+        self._spools = [open(os.path.join(self._spool_dir, f"{i}.f8"), 'wb') for i in range(len(self.columns))]
+
+    def write_rows(self, rows):
+        """Append an (n, columns) block of rows."""
+        rows = np.asarray(rows, dtype='<f8')
+        for i, spool in enumerate(self._spools):
+            spool.write(np.ascontiguousarray(rows[:, i]).data)
+        self.rows += len(rows)
+
+    def finalize(self):
+        """Assemble the .npz, flush it to disk and atomically move it to its final name."""
+        for spool in self._spools:
+            spool.close()
+
+        with open(self.temp_filename, 'wb') as file:
+            with zipfile.ZipFile(file, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for i, name in enumerate(self.columns):
+                    with archive.open(name + ".npy", 'w', force_zip64=True) as member:
+                        np.lib.format.write_array_header_1_0(
+                            member, {'descr': '<f8', 'fortran_order': False, 'shape': (self.rows,)})
+                        with open(self._spools[i].name, 'rb') as spool:
+                            shutil.copyfileobj(spool, member, 1 << 20)
+                with archive.open(METADATA_KEY + ".npy", 'w') as member:
+                    np.lib.format.write_array(member, np.array(json.dumps(self.metadata, default=str)))
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(self.temp_filename, self.filename)
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
+
+    def abort(self):
+        """Close and delete the spools and any partial archive."""
+        for spool in self._spools:
+            spool.close()
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+
+def load_capture(filename):
+    """Load a capture written by NpzCaptureFile or CsvCaptureFile.
+
+    Returns (columns, metadata): a dict of column name to 1-D array, and
+    the embedded metadata (empty for CSV files).
+    """
+    if filename.endswith(".npz"):
+        with np.load(filename) as archive:
+            metadata = json.loads(str(archive[METADATA_KEY])) if METADATA_KEY in archive else {}
+            return {name: archive[name] for name in archive.files if name != METADATA_KEY}, metadata
+
+    with open(filename, newline='') as file:
+        header = next(csv.reader(file))
+        values = np.loadtxt(file, delimiter=',', ndmin=2)
+    return {name: values[:, i] for i, name in enumerate(header)}, {}
+
+
+class CaptureWriter:
+    """Background stage that streams recorded sample blocks to output files.
+
+    The collector hands over (n, 7) sample blocks with write() while it is
+    recording; a writer thread adds the Delta_Time column (and, with
+    arrival_time, an Arrival_Time column) and appends the rows to every
+    output. finish() drains the queue and renames the files into place,
+    abort() discards them.
+    """
+
+    _FINISH = object()
+
+    def __init__(self, outputs, max_pending=64, arrival_time=False):
+        self.outputs = list(outputs)
+        self.arrival_time = arrival_time
+        self.error = None
+        self.rows_written = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._last_time = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, samples, arrival_ns=0):
+        """Queue an (n, 7) block of samples received arrival_ns into the collection."""
+        if len(samples) and self.error is None:
+            self._queue.put((samples, arrival_ns))
+
+    def finish(self, metadata=None):
+        """Write everything queued and finalize the outputs.
+
+        metadata is added to each output's metadata before it is finalized,
+        in order, so a journal placed last is only removed once every file
+        is complete. Returns the output filenames. Raises the writer
+        thread's error, if any.
+        """
+        self._queue.put(self._FINISH)
+        self._thread.join()
+        if self.error is not None:
+            self._abort_outputs()
+            raise self.error
+        for output in self.outputs:
+            output.metadata.update(metadata or {})
+            output.finalize()
+        return [output.filename for output in self.outputs if output.filename]
+
+    def abort(self):
+        """Stop writing and delete the partial outputs."""
+        self._queue.put(self._FINISH)
+        self._thread.join()
+        self._abort_outputs()
+
+    def _abort_outputs(self):
+        for output in self.outputs:
+            try:
+                output.abort()
+            except OSError:
+                pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._FINISH:
+                return
+            if self.error is not None:
+                continue
+            try:
+                samples, arrival_ns = item
+                deltas = compute_deltas(samples[:, 0], self._last_time)
+                self._last_time = samples[-1, 0]
+                if self.arrival_time:
+                    rows = np.column_stack((samples, deltas, np.full(len(samples), arrival_ns / 1e9)))
+                else:
+                    rows = np.column_stack((samples, deltas))
+                for output in self.outputs:
+                    output.write_rows(rows)
+                self.rows_written += len(rows)
+            except Exception as e:
+                self.error = e
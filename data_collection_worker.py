@@ -3,8 +3,17 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from datetime import datetime
 import os
 import threading
-from sensor_data_collector import SensorDataCollector
-import csv
+from sensor_data_collector import SensorDataCollector, parse_sensor_address
+from async_ingest import AsyncIngestEngine
+from sample_buffer import ARRIVAL_COLUMN, SAMPLE_COLUMNS, TIMING_COLUMNS, SampleBuffer
+from capture_writer import CaptureWriter, CsvCaptureFile, NpzCaptureFile
+from capture_journal import JournalCaptureFile, journal_registry_dir
+from run_catalog import RunCatalog
+from preflight import run_preflight
+from shaker_controller import ShakerController
+from progress_throttle import ProgressThrottle
+from spectrum_analyzer import SpectrumAnalyzer, save_spectrum
+from timing_analysis import StreamingTimingMonitor, analyze_timing, analyze_timing_blocks
 
 class DataCollectionWorker(QObject):
     """Worker thread for data collection from sensors."""
@@ -19,23 +28,51 @@ class DataCollectionWorker(QObject):
     data_saved = pyqtSignal(int, str)            # sensor_id, filename
     need_redo = pyqtSignal()                     # Signal to trigger automatic redo
     outliers_detected = pyqtSignal(int, float, float)  # New signal: Sensor ID, median value, max outlier
+    shaker_status = pyqtSignal(object)           # shaker battery voltage, None if it did not answer
+    spectrum_update = pyqtSignal(int, object, object)  # sensor_id, frequencies, live PSD (n_frequencies, 3)
     
-    def __init__(self, config):
+    def __init__(self, config, live_sink=None, shaker_controller=None):
         super().__init__()
         self.config = config
+        # Called as live_sink(sensor_id, samples, arrival_ns) with every recorded block, e.g. for a live plot
+        self.live_sink = live_sink
+        # The app's controller; the shaker preflight shares its pooled session and metrics
+        self.shaker_controller = shaker_controller
         self.stop_requested = False
-        self.sensor_data = {1: None, 2: None}
-        self.battery_values = {1: None, 2: None}
-        self.filenames = {1: None, 2: None}
+        self.sensor_targets = self.get_sensor_targets()
+        self.sensor_data = {sensor_id: None for sensor_id, _ in self.sensor_targets}
+        self.battery_values = {sensor_id: None for sensor_id, _ in self.sensor_targets}
+        self.filenames = {sensor_id: None for sensor_id, _ in self.sensor_targets}
+        # (host elapsed time, sensor timestamp) where each sensor's recording began
+        self.recording_starts = {sensor_id: None for sensor_id, _ in self.sensor_targets}
+        self.collectors = {}
+        # Live vibration spectrum of each sensor's recording
+        self.spectrum_analyzers = {}
+        # Timing analysis per sensor, computed once and reused
+        self.timing_stats = {}
         self.error_occurred = False
         self.timing_issue_detected = False
         self.outlier_detected = False  # New flag to track outlier detection
+        self.outlier_abort = False     # Run was stopped early because of timing outliers
+        self.started_at = None
+        self.base_filename = None
+        self.run_id = None             # Id of this run in the run catalog
+        # Per-chunk progress reaches the UI at most 'progress_rate_hz' times a second per sensor
+        self.progress_throttle = ProgressThrottle(self.emit_collection_progress,
+                                                  self.config.get('progress_rate_hz', 10.0))
     
     def run(self):
         """Main worker method to collect data from sensors."""
+        redo = False
         try:
+            # Connect to every sensor at once; the connections are kept for collection
+            if not self.run_preflight():
+                self.finished.emit()
+                return
+            
             # Generate timestamp and base filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            self.started_at = datetime.now()
+            timestamp = self.started_at.strftime('%Y%m%d_%H%M%S')
             
             # Use the test ID from config
             test_id = self.config['test_id']
@@ -45,99 +82,316 @@ class DataCollectionWorker(QObject):
                             f"{self.config['trim'].replace(' ', '_')}_{self.config['soc']}_"
                             f"{self.config['file_prefix']}_{self.config['test_number']:03d}_"
                             f"{test_id}_{timestamp}")
+            self.base_filename = base_filename
             
             # Create save directory if it doesn't exist
             if self.config['save_path']:
                 os.makedirs(self.config['save_path'], exist_ok=True)
             
-            # Start threads for each active sensor
-            threads = []
-            
-            # Sensor 1 thread
-            if self.config['sensor_ip1']:
-                thread1 = threading.Thread(
-                    target=self.collect_from_sensor,
-                    args=(1, self.config['sensor_ip1'], base_filename)
-                )
-                threads.append(thread1)
-                thread1.start()
-            
-            # Sensor 2 thread (if in dual mode)
-            if self.config['dual_sensor_mode'] and self.config['sensor_ip2']:
-                thread2 = threading.Thread(
-                    target=self.collect_from_sensor,
-                    args=(2, self.config['sensor_ip2'], base_filename)
-                )
-                threads.append(thread2)
-                thread2.start()
+            if self.use_async_engine():
+                # One event loop drives every sensor
+                self.collect_with_async_engine(base_filename)
+            else:
+                self.collect_with_threads(base_filename)
             
-            # Wait for all threads to complete or until stop is requested
-            for thread in threads:
-                while thread.is_alive():
-                    thread.join(0.1)  # Join with timeout to check stop_requested
-                    if self.stop_requested:
-                        self.error.emit("Data collection aborted by user")
-                        self.error_occurred = True
-                        break
-                if self.stop_requested:
-                    break
+            if self.stop_requested:
+                self.error.emit("Data collection aborted by user")
+                self.error_occurred = True
             
             # Check if we have data from all expected sensors
-            if self.config['dual_sensor_mode']:
-                expected_sensors = 2
-            else:
-                expected_sensors = 1
+            expected_sensors = len(self.sensor_targets)
                 
             active_sensors = sum(1 for data in self.sensor_data.values() if data is not None)
             
             if self.stop_requested:
                 self.progress.emit("Data collection aborted", 100)
+            elif self.outlier_abort:
+                self.progress.emit("Data collection stopped early - timing outliers detected", 100)
             elif active_sensors < expected_sensors:
                 self.error.emit("Data collection failed for one or more sensors")
                 self.error_occurred = True
             else:
                 self.progress.emit("Data collection complete", 100)
-                
-            self.finished.emit()
             
             # Process collected data
-            if not self.stop_requested and active_sensors == expected_sensors:
+            if self.outlier_abort and not self.stop_requested:
+                redo = True
+            elif not self.stop_requested and active_sensors == expected_sensors:
                 self.process_collected_data()
+                redo = self.outlier_detected
             
         except Exception as e:
             self.error.emit(f"Error in data collection: {str(e)}")
             self.error_occurred = True
-            self.finished.emit()
+        
+        # Cataloged first, so run_id is set when the app handles these signals
+        self.catalog_run()
+        self.finished.emit()
+        if redo:
+            self.need_redo.emit()
+    
+    def run_preflight(self):
+        """Probe all sensors and the shaker concurrently within 'preflight_timeout' seconds.
+        
+        Each sensor is connected and its battery read once; collection then
+        starts on that connection. Returns False, after reporting which
+        sensors could not be reached, if any sensor failed.
+        """
+        self.progress.emit("Checking sensors...", 0)
+        shaker = self.create_preflight_shaker()
+        result = run_preflight(self.sensor_targets, shaker, self.config.get('preflight_timeout', 3.0),
+                               self.create_collector)
+        if shaker:
+            self.shaker_status.emit(result.shaker_voltage)
+        
+        failures = []
+        for sensor_id, sensor_ip in self.sensor_targets:
+            probe = result.sensors[sensor_id]
+            if probe.error is not None:
+                failures.append(f"Cannot connect to Sensor {sensor_id} at {sensor_ip}: {probe.error}")
+            elif probe.battery is not None:
+                self.battery_update.emit(sensor_id, probe.battery)
+                self.battery_values[sensor_id] = probe.battery
+        
+        if failures:
+            for collector in self.collectors.values():
+                collector.close()
+            self.error.emit("\n".join(failures))
+            self.error_occurred = True
+            return False
+        
+        self.progress.emit(f"Sensors ready ({result.seconds:.2f} s)", 0)
+        return True
+    
+    def create_preflight_shaker(self):
+        """Controller for the shaker preflight probe, or None without a 'shaker_url'.
+        
+        It has its own last_error, since the app's controller is in use on
+        the command queue thread, but reuses that controller's session and
+        metrics so the probe shows up in the shaker statistics.
+        """
+        if not self.config.get('shaker_url'):
+            return None
+        shared = self.shaker_controller
+        if shared is None:
+            return ShakerController(self.config['shaker_url'])
+        return ShakerController(self.config['shaker_url'], session=shared.session, metrics=shared.metrics)
+    
+    def get_run_status(self):
+        """Outcome of the run as recorded in the run catalog."""
+        if self.stop_requested:
+            return 'aborted'
+        if self.outlier_abort or self.outlier_detected:
+            return 'outliers'
+        if self.error_occurred:
+            return 'error'
+        return 'complete'
+    
+    def catalog_run(self):
+        """Record the run, its files, sample counts, timing and battery in the run catalog.
+        
+        Turned off with 'catalog': False; 'catalog_path' overrides the
+        default location. A catalog failure never fails the run.
+        """
+        if not self.config.get('catalog', True) or self.started_at is None:
+            return
+        try:
+            captures = []
+            for sensor_id, sensor_ip in self.sensor_targets:
+                stats = self.timing_stats.get(sensor_id)
+                data = self.sensor_data.get(sensor_id)
+                capture = {
+                    'sensor_id': sensor_id,
+                    'sensor_ip': sensor_ip,
+                    'samples': stats.samples if stats else (len(data) if data is not None else 0),
+                    'battery': self.battery_values.get(sensor_id),
+                    'median_delta': stats.median_delta if stats else None,
+                    'outlier_count': stats.outlier_count if stats else None,
+                    'max_outlier': stats.max_outlier if stats else None,
+                    'max_delta': stats.max_delta if stats else None
+                }
+                for filename in self.filenames.get(sensor_id) or [None]:
+                    captures.append(dict(capture, filename=filename))
+            
+            catalog = RunCatalog(self.config.get('catalog_path'))
+            self.run_id = catalog.record_run(
+                self.config,
+                self.started_at.isoformat(timespec='seconds'),
+                datetime.now().isoformat(timespec='seconds'),
+                self.get_run_status(),
+                captures,
+                self.base_filename
+            )
+            catalog.close()
+        except Exception as e:
+            self.error.emit(f"Error recording run in catalog: {str(e)}")
+    
+    def stop(self):
+        """Ask a running collection to stop (safe from another thread)."""
+        self.stop_requested = True
+        for collector in list(self.collectors.values()):
+            collector.stop()
+    
+    def close(self):
+        """Release the sample buffers and delete their spill files once the run has ended.
+        
+        sensor_data must not be read afterwards.
+        """
+        for data in self.sensor_data.values():
+            if data is not None:
+                data.close()
+    
+    def get_sensor_targets(self):
+        """Return (sensor_id, sensor_ip) pairs for every sensor to collect from.
+        
+        'sensor_ips' in the config maps sensor ids to IPs for any number of
+        sensors; otherwise sensor_ip1/sensor_ip2 and dual_sensor_mode are used.
+        """
+        if self.config.get('sensor_ips'):
+            return [(sensor_id, ip) for sensor_id, ip in sorted(self.config['sensor_ips'].items()) if ip]
+        
+        targets = []
+        if self.config.get('sensor_ip1'):
+            targets.append((1, self.config['sensor_ip1']))
+        if self.config.get('dual_sensor_mode') and self.config.get('sensor_ip2'):
+            targets.append((2, self.config['sensor_ip2']))
+        return targets
+    
+    def use_async_engine(self):
+        """Whether to collect on one asyncio loop instead of one thread per sensor."""
+        engine = self.config.get('ingest_engine')
+        if engine is None:
+            return len(self.sensor_targets) > 2
+        return engine == 'asyncio'
+    
+    def create_collector(self, sensor_id, sensor_ip):
+        """Create and register the collector for a sensor."""
+        collector = SensorDataCollector(*parse_sensor_address(sensor_ip))
+        if self.config.get('abort_on_outliers', True):
+            # Watch the timing while recording so a doomed run is cut short
+            collector.timing_monitor = StreamingTimingMonitor()
+        self.collectors[sensor_id] = collector
+        return collector
+    
+    def collect_with_threads(self, base_filename):
+        """Collect from each sensor in its own thread."""
+        threads = []
+        for sensor_id, sensor_ip in self.sensor_targets:
+            thread = threading.Thread(
+                target=self.collect_from_sensor,
+                args=(sensor_id, sensor_ip, base_filename)
+            )
+            threads.append(thread)
+            thread.start()
+        
+        # Wait for all threads to complete or until stop is requested
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.1)  # Join with timeout to check stop_requested
+                if self.stop_requested:
+                    break
+            if self.stop_requested:
+                break
+    
+    def collect_with_async_engine(self, base_filename):
+        """Collect from all sensors concurrently on a single asyncio event loop."""
+        engine = AsyncIngestEngine(
+            self.config['calibration_time'],
+            self.config['sample_time'],
+            callback=self.handle_engine_event
+        )
+        
+        writers = {}
+        for sensor_id, sensor_ip in self.sensor_targets:
+            collector = self.collectors[sensor_id]
+            writer, samples_buffer = self.prepare_capture(sensor_id, base_filename)
+            writers[sensor_id] = writer
+            engine.add_sensor(sensor_id, collector, samples_buffer, self.get_sample_sink(sensor_id, writer))
+        
+        try:
+            results = engine.run()
+        except Exception:
+            for writer in writers.values():
+                if writer:
+                    writer.abort()
+            for sensor_id in writers:
+                self.abort_spectrum(sensor_id)
+            raise
+        
+        for sensor_id, result in results.items():
+            writer = writers[sensor_id]
+            if result is None:
+                if writer:
+                    writer.abort()
+                self.abort_spectrum(sensor_id)
+                continue
+            
+            data, battery_update = result
+            try:
+                self.complete_capture(sensor_id, writer, data, battery_update, base_filename)
+            except Exception as e:
+                self.sensor_error.emit(sensor_id, f"Error collecting data from sensor {sensor_id}: {str(e)}")
+                self.error_occurred = True
+    
+    def handle_engine_event(self, sensor_id, event_type, *args):
+        """Turn AsyncIngestEngine events into the worker's signals."""
+        if event_type == "connecting":
+            self.sensor_progress.emit(sensor_id, f"Connecting to sensor {sensor_id}", 0)
+        elif event_type == "connected":
+            self.sensor_progress.emit(sensor_id, f"Getting battery status for sensor {sensor_id}", 5)
+        elif event_type == "battery":
+            #keep battery between 0 and 100%
+            battery = max(0, min(args[0], 100))
+            self.battery_update.emit(sensor_id, battery)
+        elif event_type == "collecting":
+            self.sensor_progress.emit(sensor_id, f"Starting data collection for sensor {sensor_id}", 10)
+        elif event_type == "error":
+            self.sensor_error.emit(sensor_id, args[0])
+            self.error_occurred = True
+        else:
+            self.report_collection_progress(sensor_id, event_type, *args)
+    
+    def report_collection_progress(self, sensor_id, event_type, *args):
+        """Emit progress for a collector's phase and progress callbacks."""
+        if event_type == "phase_change":
+            # A calibration update still pending would now be out of date
+            self.progress_throttle.discard(sensor_id)
+            self.sensor_progress.emit(sensor_id, f"Starting recording for sensor {sensor_id}", 0)
+        elif event_type in ("calibration_progress", "recording_progress"):
+            # Sent after every received chunk; only the latest state is forwarded
+            self.progress_throttle.update(sensor_id, event_type, *args)
+        elif event_type == "timing_outlier":
+            self.abort_for_outliers(sensor_id, *args)
+    
+    def emit_collection_progress(self, sensor_id, event_type, progress, elapsed, total):
+        """Format and emit a calibration or recording progress update."""
+        if event_type == "calibration_progress":
+            message = f"Calibrating sensor {sensor_id}: {elapsed:.1f}/{total}s"
+        else:
+            message = f"Recording sensor {sensor_id}: {elapsed:.1f}/{total}s"
+        self.sensor_progress.emit(sensor_id, message, progress)
+    
+    def abort_for_outliers(self, sensor_id, median_delta, max_delta):
+        """Stop a run whose timing already fails the outlier check; it is then redone."""
+        self.outliers_detected.emit(sensor_id, median_delta, max_delta)
+        self.outlier_detected = True
+        if self.outlier_abort:
+            return
+        
+        self.outlier_abort = True
+        self.progress_throttle.discard()
+        self.sensor_progress.emit(sensor_id, f"Timing outliers on sensor {sensor_id}, stopping early", 100)
+        for collector in list(self.collectors.values()):
+            collector.stop()
     
     def process_collected_data(self):
-        """Process the collected data and check for timing issues."""
+        """Process the collected data and check for timing issues (sets outlier_detected)."""
         try:
-            # Check for timing issues in each sensor's data
+            # Timing was analyzed when each sensor's data was saved; this only
+            # fills in sensors that were not analyzed yet
             for sensor_id, data in self.sensor_data.items():
-                if data is None or len(data) < 2:
-                    continue
-                    
-                # Calculate delta times between consecutive samples
-                timestamps = [row[0] for row in data]
-                deltas = [timestamps[i] - timestamps[i-1] for i in range(1, len(timestamps))]
-                
-                # Calculate median delta time
-                median_delta = np.median(deltas)
-                
-                # Threshold for outliers (anything greater than 5% of median is an outlier)
-                outlier_threshold = 1.05
-                
-                # Find outliers
-                outliers = [delta for delta in deltas if delta > (median_delta * outlier_threshold)]
-                
-                if outliers:
-                    max_outlier = max(outliers)
-                    self.outliers_detected.emit(sensor_id, median_delta, max_outlier)
-                    self.outlier_detected = True
-                    
-            # If outliers were detected in any sensor, signal for a redo
-            if self.outlier_detected:
-                self.need_redo.emit()
+                if data is not None:
+                    self.analyze_sensor_timing(sensor_id, data)
                 
         except Exception as e:
             self.error.emit(f"Error analyzing data: {str(e)}")
@@ -146,140 +400,296 @@ class DataCollectionWorker(QObject):
     def collect_from_sensor(self, sensor_id, sensor_ip, base_filename):
         """Collect data from a specific sensor."""
         try:
-            self.sensor_progress.emit(sensor_id, f"Connecting to sensor {sensor_id}", 0)
-            
-            # Initialize sensor collector
-            collector = SensorDataCollector(sensor_ip)
-            
-            # Connect to sensor
-            connection_result = collector.connect()
-            
-            # Check if connection result is a string (error message) or True (success)
-            if connection_result is not True:
-                error_msg = f"Failed to connect to sensor {sensor_id}: {connection_result}"
-                self.sensor_error.emit(sensor_id, error_msg)
-                self.error_occurred = True  # Mark that an error occurred
-                return
-                
-            self.sensor_progress.emit(sensor_id, f"Getting battery status for sensor {sensor_id}", 5)
-            
-            # Get battery status
-            battery = collector.get_battery_status()
-            if battery is not None:
-                #keep battery between 0 and 100%
-                battery = max(0, min(battery, 100))
-                self.battery_update.emit(sensor_id, battery)
+            # Connected, and battery read, by the preflight
+            collector = self.collectors[sensor_id]
             
             self.sensor_progress.emit(sensor_id, f"Starting data collection for sensor {sensor_id}", 10)
             
             # Define callback to update progress
             def progress_callback(event_type, *args):
-                if event_type == "phase_change":
-                    self.sensor_progress.emit(sensor_id, f"Starting recording for sensor {sensor_id}", 0)
-                elif event_type == "calibration_progress":
-                    progress, elapsed, total = args
-                    self.sensor_progress.emit(
-                        sensor_id,
-                        f"Calibrating sensor {sensor_id}: {elapsed:.1f}/{total}s",
-                        progress
-                    )
-                elif event_type == "recording_progress":
-                    progress, elapsed, total = args
-                    self.sensor_progress.emit(
-                        sensor_id,
-                        f"Recording sensor {sensor_id}: {elapsed:.1f}/{total}s",
-                        progress
-                    )
+                self.report_collection_progress(sensor_id, event_type, *args)
+            
+            writer, samples_buffer = self.prepare_capture(sensor_id, base_filename)
             
             # Collect data
-            data, battery_update = collector.collect_data(
-                self.config['calibration_time'],
-                self.config['sample_time'],
-                progress_callback
-            )
+            try:
+                data, battery_update = collector.collect_data(
+                    self.config['calibration_time'],
+                    self.config['sample_time'],
+                    progress_callback,
+                    samples_buffer=samples_buffer,
+                    sample_sink=self.get_sample_sink(sensor_id, writer)
+                )
+            except Exception:
+                if writer:
+                    writer.abort()
+                self.abort_spectrum(sensor_id)
+                raise
             
             # Close connection
             collector.close()
             
-            if not data:
-                self.sensor_error.emit(sensor_id, f"No data collected from sensor {sensor_id}")
-                self.error_occurred = True  # Mark that an error occurred
-                return
-                
-            # Update battery if we got a newer value
-            if battery_update is not None:
-                self.battery_update.emit(sensor_id, battery_update)
-                self.battery_values[sensor_id] = battery_update
-            
-            # Save the data
-            filename = self.save_sensor_data(data, sensor_id, base_filename)
-            if filename:
-                self.filenames[sensor_id] = filename
-                self.data_saved.emit(sensor_id, filename)
-            
-            # Store the data
-            self.sensor_data[sensor_id] = data
-            
-            self.sensor_progress.emit(
-                sensor_id,
-                f"Sensor {sensor_id} data collection complete",
-                100
-            )
+            self.complete_capture(sensor_id, writer, data, battery_update, base_filename)
             
         except Exception as e:
             self.sensor_error.emit(sensor_id, f"Error collecting data from sensor {sensor_id}: {str(e)}")
             self.error_occurred = True  # Mark that an error occurred
     
-    def save_sensor_data(self, data, sensor_id, base_filename):
-        """Save sensor data to CSV file and analyze for timing issues."""
+    def prepare_capture(self, sensor_id, base_filename):
+        """Create the writer stage and sample buffer for a sensor's capture.
+        
+        Returns (writer, samples_buffer). When samples are saved after
+        collection instead of streamed, the writer only keeps the capture
+        journal, or is None with journaling turned off.
+        """
+        self.open_spectrum_analyzer(sensor_id)
+        
+        # Stream recorded samples to disk while collecting; only the
+        # timing columns are then kept for the outlier check
+        if self.config.get('stream_to_disk', True):
+            outputs = self.open_capture_files(sensor_id, base_filename)
+            return self.open_capture_writer(sensor_id, base_filename, outputs), self.create_sample_buffer(TIMING_COLUMNS)
+        # Samples are saved after collection; only the journal is written while collecting
+        return self.open_capture_writer(sensor_id, base_filename, []), self.create_sample_buffer(SAMPLE_COLUMNS)
+    
+    def get_sample_sink(self, sensor_id, writer):
+        """The sample_sink for a sensor's collection: its writer, spectrum analyzer and live sink."""
+        sinks = [writer.write] if writer else []
+        if sensor_id in self.spectrum_analyzers:
+            sinks.append(self.spectrum_analyzers[sensor_id].write)
+        if self.live_sink is not None:
+            live_sink = self.live_sink
+            sinks.append(lambda samples, arrival_ns: live_sink(sensor_id, samples, arrival_ns))
+        if len(sinks) <= 1:
+            return sinks[0] if sinks else None
+        
+        def sample_sink(samples, arrival_ns):
+            for sink in sinks:
+                sink(samples, arrival_ns)
+        return sample_sink
+    
+    def open_spectrum_analyzer(self, sensor_id):
+        """Start the vibration spectrum of a sensor's recording, unless 'spectrum' is False."""
+        if not self.config.get('spectrum', True):
+            return None
+        
+        def spectrum_callback(frequencies, psd):
+            self.spectrum_update.emit(sensor_id, frequencies, psd)
+        
+        analyzer = SpectrumAnalyzer(spectrum_callback)
+        self.spectrum_analyzers[sensor_id] = analyzer
+        return analyzer
+    
+    def finish_spectrum(self, sensor_id, base_filename):
+        """Save the spectrum averaged over a sensor's recording; returns the filename or None.
+        
+        A failed spectrum is reported but never fails the capture.
+        """
+        analyzer = self.spectrum_analyzers.pop(sensor_id, None)
+        if analyzer is None:
+            return None
         try:
-            # Calculate delta times between consecutive samples
-            modified_data = []
-            prev_time = None
-            timestamps = []
-            deltas = []
+            spectrum = analyzer.finish()
+            if spectrum is None:
+                return None
+            filename = self.get_output_filename(sensor_id, base_filename, "_spectrum.npz")
+            return save_spectrum(filename, spectrum, self.get_capture_metadata(sensor_id),
+                                 self.config.get('shaker_frequency'))
+        except Exception as e:
+            self.sensor_error.emit(sensor_id, f"Error saving spectrum for sensor {sensor_id}: {str(e)}")
+            return None
+    
+    def abort_spectrum(self, sensor_id):
+        """Stop a sensor's spectrum analysis and discard it."""
+        analyzer = self.spectrum_analyzers.pop(sensor_id, None)
+        if analyzer is not None:
+            analyzer.abort()
+    
+    def create_sample_buffer(self, columns):
+        """Create a sample buffer within this sensor's share of the memory budget.
+        
+        'memory_budget_mb' is shared by all sensors; beyond it, samples are
+        spilled to a temporary file in the save folder.
+        """
+        budget_mb = self.config.get('memory_budget_mb', 512)
+        if budget_mb is None:
+            return SampleBuffer(columns=columns)
+        budget = int(budget_mb * 1024 * 1024 / max(len(self.sensor_targets), 1))
+        return SampleBuffer(columns=columns, memory_budget=budget, spill_dir=self.config.get('save_path') or None)
+    
+    def complete_capture(self, sensor_id, writer, data, battery_update, base_filename):
+        """Save a sensor's collected data and report the result."""
+        if self.outlier_abort:
+            # The run is redone, nothing from it is kept
+            self.progress_throttle.discard(sensor_id)
+            if writer:
+                writer.abort()
+            self.abort_spectrum(sensor_id)
+            return
+        
+        # Show where collection ended before any saving messages
+        self.progress_throttle.flush(sensor_id)
+        
+        if len(data) == 0:
+            if writer:
+                writer.abort()
+            self.abort_spectrum(sensor_id)
+            self.sensor_error.emit(sensor_id, f"No data collected from sensor {sensor_id}")
+            self.error_occurred = True  # Mark that an error occurred
+            return
             
-            for row in data:
-                current_time = row[0]
-                delta = 0.0 if prev_time is None else current_time - prev_time
-                modified_data.append(list(row) + [delta])
-                prev_time = current_time
-                
-                timestamps.append(current_time)
-                if prev_time is not None:
-                    deltas.append(delta)
+        # Update battery if we got a newer value
+        if battery_update is not None:
+            self.battery_update.emit(sensor_id, battery_update)
+            self.battery_values[sensor_id] = battery_update
+        
+        # Store the data
+        self.sensor_data[sensor_id] = data
+        self.recording_starts[sensor_id] = self.collectors[sensor_id].recording_start
+        
+        # Save the data
+        if self.config.get('stream_to_disk', True):
+            filenames = self.finish_capture(writer, data, sensor_id)
+        else:
+            filenames = self.save_sensor_data(data, sensor_id, base_filename)
+            if writer and filenames:
+                # Saved, so the journal is no longer needed
+                writer.finish()
+            elif writer:
+                writer.abort()
+        if filenames:
+            # The averaged spectrum is kept with the capture
+            spectrum_filename = self.finish_spectrum(sensor_id, base_filename)
+            if spectrum_filename:
+                filenames = list(filenames) + [spectrum_filename]
+            self.filenames[sensor_id] = filenames
+            for filename in filenames:
+                self.data_saved.emit(sensor_id, filename)
+        else:
+            self.abort_spectrum(sensor_id)
+        
+        self.sensor_progress.emit(
+            sensor_id,
+            f"Sensor {sensor_id} data collection complete",
+            100
+        )
+    
+    def get_output_filename(self, sensor_id, base_filename, extension=".npz"):
+        """Return the output file path for a sensor."""
+        if self.config['save_path']:
+            return os.path.join(self.config['save_path'], f"{base_filename}_sensor{sensor_id}{extension}")
+        return f"{base_filename}_sensor{sensor_id}{extension}"
+    
+    def get_output_columns(self):
+        """Return the output file columns; 'store_arrival_time' adds the host arrival time."""
+        if self.config.get('store_arrival_time', False):
+            return SAMPLE_COLUMNS + (ARRIVAL_COLUMN,)
+        return SAMPLE_COLUMNS
+    
+    def get_capture_metadata(self, sensor_id):
+        """Return the test configuration and run details embedded in a sensor's capture."""
+        return {
+            'sensor_id': sensor_id,
+            'sensor_ip': dict(self.sensor_targets).get(sensor_id),
+            'battery': self.battery_values.get(sensor_id),
+            'recording_start': self.recording_starts.get(sensor_id),
+            'config': self.config
+        }
+    
+    def open_capture_files(self, sensor_id, base_filename):
+        """Open a sensor's output files: the .npz capture, plus a CSV copy if 'export_csv' is set."""
+        columns = self.get_output_columns()
+        outputs = [NpzCaptureFile(self.get_output_filename(sensor_id, base_filename), columns)]
+        if self.config.get('export_csv', False):
+            outputs.append(CsvCaptureFile(self.get_output_filename(sensor_id, base_filename, ".csv"), columns))
+        return outputs
+    
+    def open_capture_writer(self, sensor_id, base_filename, outputs):
+        """Start a writer stage that streams a sensor's samples to outputs and the capture journal.
+        
+        The journal ('journal', on by default) is fsynced every
+        'journal_fsync_interval' seconds so a crash loses at most that much,
+        and listed in the journal registry (see journal_registry_dir) so the
+        app finds it on the next start whichever folder it is in.
+        If the journal cannot be created the capture is recorded without
+        it. Returns None if there is nothing to write.
+        """
+        if self.config.get('journal', True):
+            try:
+                # Last, so it is only removed after every output is complete
+                outputs = outputs + [JournalCaptureFile(
+                    self.get_output_filename(sensor_id, base_filename),
+                    self.get_output_columns(),
+                    self.get_capture_metadata(sensor_id),
+                    fsync_interval=self.config.get('journal_fsync_interval', 1.0),
+                    export_csv=self.config.get('export_csv', False),
+                    registry_dir=journal_registry_dir()
+                )]
+            except Exception as e:
+                # The journal only protects against crashes; record without it
+                self.sensor_error.emit(sensor_id, f"Recording without a crash journal: {str(e)}")
+        if not outputs:
+            return None
+        return CaptureWriter(outputs, arrival_time=ARRIVAL_COLUMN in self.get_output_columns())
+    
+    def finish_capture(self, writer, data, sensor_id):
+        """Finalize streamed capture files and analyze them for timing issues."""
+        try:
+            filenames = writer.finish(self.get_capture_metadata(sensor_id))
+            self.analyze_sensor_timing(sensor_id, data)
+            return filenames
+        except Exception as e:
+            self.sensor_error.emit(sensor_id, f"Error saving data for sensor {sensor_id}: {str(e)}")
+            self.error_occurred = True  # Mark that an error occurred
+            return None
+    
+    def save_sensor_data(self, data, sensor_id, base_filename):
+        """Save collected sensor data to the output files and analyze for timing issues."""
+        outputs = []
+        try:
+            outputs = self.open_capture_files(sensor_id, base_filename)
+            arrival_time = ARRIVAL_COLUMN in self.get_output_columns()
             
-            # Create filename
-            if self.config['save_path']:
-                filename = os.path.join(self.config['save_path'], f"{base_filename}_sensor{sensor_id}.csv")
-            else:
-                filename = f"{base_filename}_sensor{sensor_id}.csv"
+            # Delta_Time is already part of the buffer, write it chunk by chunk
+            for rows in data.iter_rows(arrival_time=arrival_time):
+                for output in outputs:
+                    output.write_rows(rows)
             
-            # Save to CSV
-            with open(filename, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(["Time", "Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z", "Delta_Time"])
-                writer.writerows(modified_data)
+            metadata = self.get_capture_metadata(sensor_id)
+            for output in outputs:
+                output.metadata.update(metadata)
+                output.finalize()
             
-            # Check for outliers if we have enough data
-            if len(deltas) > 1:
-                # Calculate median delta time
-                median_delta = np.median(deltas)
-                
-                # Threshold for outliers (anything greater than 5% of median is an outlier)
-                outlier_threshold = 1.05
-                
-                # Find outliers
-                outliers = [delta for delta in deltas if delta > (median_delta * outlier_threshold)]
-                
-                if outliers:
-                    max_outlier = max(outliers)
-                    self.outliers_detected.emit(sensor_id, median_delta, max_outlier)
-                    self.outlier_detected = True
+            self.analyze_sensor_timing(sensor_id, data)
             
-            return filename
+            return [output.filename for output in outputs]
                 
         except Exception as e:
+            for output in outputs:
+                try:
+                    output.abort()
+                except OSError:
+                    pass
             self.sensor_error.emit(sensor_id, f"Error saving data for sensor {sensor_id}: {str(e)}")
             self.error_occurred = True  # Mark that an error occurred
-            return None
\ No newline at end of file
+            return None
+    
+    def analyze_sensor_timing(self, sensor_id, data):
+        """Analyze a sensor's sample timing once and report outliers.
+        
+        Returns the cached TimingStats (None if there are too few samples).
+        """
+        if sensor_id in self.timing_stats:
+            return self.timing_stats[sensor_id]
+        
+        if data.spilled:
+            # Too long to load at once; analyze the spilled column in passes
+            stats = analyze_timing_blocks(lambda: data.iter_column("Time"))
+        else:
+            stats = analyze_timing(data.column("Time"))
+        self.timing_stats[sensor_id] = stats
+        
+        if stats is not None and stats.outlier_count:
+            self.outliers_detected.emit(sensor_id, stats.median_delta, stats.max_outlier)
+            self.outlier_detected = True
+        return stats
\ No newline at end of file
@@ -4,8 +4,6 @@ import time
 import threading
 import random
 import string
-import socket
-import zipfile
 import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
@@ -17,13 +15,21 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QTimer 
 from PyQt5.QtGui import QColor, QIntValidator 
-import requests
 
-from utils import load_svg_logo
+from utils import app_data_dir, load_svg_logo
 from shaker_controller import ShakerController
+from shaker_command_queue import ShakerCommandQueue
+from shaker_metrics import ShakerMetrics
+from shaker_health import ShakerHealthPoller
 from data_collection_worker import DataCollectionWorker
+from capture_journal import find_incomplete_journals, journal_registry_dir, recover_journal
+from upload_manifest import UploadManifest, find_test_files
+from s3_upload import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE
+from upload_queue import UploadQueue
+from log_sink import LogSink
+from live_plot_widget import LivePlotWidget
+from spectrum_widget import SpectrumWidget
 from ip_finder import IPFinder
-from custom_events import UpdateShakerBatteryEvent
 from sensor_shaker_panel_widget import SensorPanel, ShakerPanel
 from dotenv import load_dotenv
 from video_panel import VideoPanel
@@ -41,21 +47,43 @@ class EVidentApp(QMainWindow):
         # Initialize application state
         self.sensor_ip1 = '10.1.10.96'
         self.sensor_ip2 = '10.1.10.171'
-        self.shaker_controller = ShakerController()
+        # Latency and errors of every request to the shaker controller, per endpoint
+        self.shaker_metrics = ShakerMetrics()
+        self.shaker_controller = ShakerController(metrics=self.shaker_metrics)
+        # Shaker commands are sent from a background thread so the UI never waits on the controller
+        self.shaker_commands = ShakerCommandQueue(self.shaker_controller)
+        self.shaker_commands.start()
+        # Background health check of the controller; metrics and health are also written
+        # as JSON to EVIDENT_SHAKER_METRICS_FILE (empty to turn it off)
+        self.shaker_health = ShakerHealthPoller(
+            self.shaker_commands,
+            self.shaker_metrics,
+            dump_path=os.getenv("EVIDENT_SHAKER_METRICS_FILE", os.path.join(app_data_dir(), 'shaker_metrics.json'))
+        )
         self.dual_sensor_mode = True
         self.save_path = os.getcwd()
         self.test_number = 1
         self.worker = None
+        self.shaker_frequency = None  # frequency the shaker was last started at
+        self.shaker_reachable = None  # result of the last shaker health check
         self.ip_finder = None
         self.test_id = self.generate_test_id()
         self.had_redos_in_sequence = False  # Keep this as it might be used for other purposes
         self.redo_triggered = False  # Flag to prevent multiple redos
         self.had_outliers = False    # Flag to track if outliers were detected
         self.saved_to_aws = False  # Flag to track if data was saved to AWS
+        self.redo_of = None  # Catalog id of the run being redone
         
         # Instantiate the video panel
         self.video_panel = VideoPanel()
         
+        # Uploads to AWS run in the background from a persistent outbox
+        self.upload_queue = UploadQueue(
+            "evb-cloud-store", self.create_s3_client,
+            part_size=int(os.getenv("EVIDENT_UPLOAD_PART_MB", DEFAULT_PART_SIZE >> 20)) << 20,
+            concurrency=int(os.getenv("EVIDENT_UPLOAD_CONCURRENCY", DEFAULT_CONCURRENCY))
+        )
+        
         # Setup UI
         self.initUI()
     
@@ -237,9 +265,14 @@ class EVidentApp(QMainWindow):
         customer_panel = self.create_customer_info_panel()
         main_layout.addWidget(customer_panel)
         
-        # Create data collection section (third panel - now includes progress)
+        # Create data collection section (third panel - now includes progress),
+        # with the live sensor plot next to it
+        data_row_layout = QHBoxLayout()
         data_panel = self.create_data_collection_panel()
-        main_layout.addWidget(data_panel)
+        data_row_layout.addWidget(data_panel, 1)
+        live_plot_panel = self.create_live_plot_panel()
+        data_row_layout.addWidget(live_plot_panel, 1)
+        main_layout.addLayout(data_row_layout)
         
         # --- Create Video Panel Section ---
         video_group = QGroupBox("Live Video Feed")
@@ -275,8 +308,20 @@ class EVidentApp(QMainWindow):
         # Now it's safe to update the file path display
         self.update_file_path_display()
         
-        # Check the shaker battery status on startup
-        QTimer.singleShot(1000, self.refresh_shaker_battery)
+        # Check the shaker (and its battery) now and then in the background
+        self.shaker_health.health_changed.connect(self.handle_shaker_health)
+        self.shaker_health.error.connect(lambda message: self.log_message(message, "WARNING"))
+        self.shaker_health.start()
+        
+        # Resume uploads left in the outbox by an earlier session
+        self.upload_queue.upload_progress.connect(self.update_upload_progress)
+        self.upload_queue.upload_finished.connect(self.upload_finished)
+        self.upload_queue.upload_failed.connect(self.upload_failed)
+        self.upload_queue.queue_changed.connect(self.update_upload_queue_status)
+        self.upload_queue.start()
+        
+        # Offer to recover captures interrupted by a crash
+        QTimer.singleShot(0, self.check_incomplete_journals)
     
     def connect_file_path_signals(self):
         """Connect signals for updating the file path display."""
@@ -543,6 +588,7 @@ class EVidentApp(QMainWindow):
 
         aws_save_btn = QPushButton('Save to AWS')
         aws_save_btn.setMaximumWidth(200)
+        self.upload_status_label = QLabel("")
 
         # Add to row layout
         row1_layout.addWidget(sample_time_label)
@@ -550,6 +596,7 @@ class EVidentApp(QMainWindow):
         row1_layout.addStretch()
         row1_layout.addWidget(self.save_location_button)
         row1_layout.addWidget(aws_save_btn)
+        row1_layout.addWidget(self.upload_status_label)
         
         # Row for email entry (new)
         email_layout = QHBoxLayout()
@@ -647,6 +694,37 @@ class EVidentApp(QMainWindow):
         
         return panel
     
+    def create_live_plot_panel(self):
+        """Create the live sensor data plot panel."""
+        panel = QFrame()
+        panel.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Preferred)
+        layout = QVBoxLayout(panel)
+        
+        # Add shadow effect
+        shadow = QGraphicsDropShadowEffect()
+        shadow.setBlurRadius(20)
+        shadow.setOffset(0, 10)
+        shadow.setColor(QColor(0, 0, 0, 30))
+        panel.setGraphicsEffect(shadow)
+        
+        # Live plot section
+        live_plot_group = QGroupBox("Live Sensor Data")
+        live_plot_layout = QVBoxLayout(live_plot_group)
+        live_plot_layout.addSpacing(10)
+        
+        # Last few seconds of accel/gyro of each sensor, fed straight from the ingest threads
+        self.live_plot = LivePlotWidget()
+        live_plot_layout.addWidget(self.live_plot, 2)
+        
+        # Vibration spectrum of the recording, with the shaker frequency marked
+        self.spectrum_plot = SpectrumWidget()
+        live_plot_layout.addWidget(self.spectrum_plot, 1)
+        
+        # Add section to panel
+        layout.addWidget(live_plot_group)
+        
+        return panel
+    
     def create_log_panel(self):
         """Create the log panel."""
         panel = QFrame()
@@ -680,6 +758,14 @@ class EVidentApp(QMainWindow):
         # Set minimum height
         self.log_text.setMinimumHeight(150)
         
+        # Messages are batched into the panel and also kept in a rotating log file
+        # (EVIDENT_LOG_FILE, empty to turn it off)
+        self.log_sink = LogSink(
+            self.log_text,
+            max_blocks=int(os.getenv("EVIDENT_LOG_MAX_LINES", 5000)),
+            log_file=os.getenv("EVIDENT_LOG_FILE", os.path.join(app_data_dir(), 'logs', 'evident.log'))
+        )
+        
         # Clear log button
         clear_log_button = QPushButton("Clear Log")
         clear_log_button.setMaximumWidth(120)
@@ -732,8 +818,10 @@ class EVidentApp(QMainWindow):
     
     def update_battery_status(self, sensor_id, percentage):
         """Update battery status display."""
-        sensor_panel = self.sensor_panel1 if sensor_id == 1 else self.sensor_panel2
-        sensor_panel.update_battery_status(percentage)
+        # Sensors beyond the two panels are only logged
+        if sensor_id in (1, 2):
+            sensor_panel = self.sensor_panel1 if sensor_id == 1 else self.sensor_panel2
+            sensor_panel.update_battery_status(percentage)
         self.log_message(f"Sensor {sensor_id} battery: {percentage:.0f}%", "BATTERY")
     
     def log_message(self, message, category=None):
@@ -759,16 +847,12 @@ class EVidentApp(QMainWindow):
         else:
             html_message = formatted_message
         
-        # Append to log
-        self.log_text.append(html_message)
-        
-        # Scroll to bottom
-        scroll_bar = self.log_text.verticalScrollBar()
-        scroll_bar.setValue(scroll_bar.maximum())
+        # Queue for the log panel; it is redrawn in batches (safe from any thread)
+        self.log_sink.write(html_message, f"{time.strftime('%Y-%m-%d')} {formatted_message}")
     
     def clear_log(self):
         """Clear the log text area."""
-        self.log_text.clear()
+        self.log_sink.clear()
         self.log_message("Log cleared", "INFO")
     
     def set_save_location(self):
@@ -778,6 +862,36 @@ class EVidentApp(QMainWindow):
             self.save_path = folder
             self.save_path_label.setText("Save Folder: " + folder)
             self.log_message(f"Save folder set to: {folder}", "INFO")
+            self.check_incomplete_journals()
+    
+    def check_incomplete_journals(self):
+        """Offer to recover captures that never completed, in the save folder or wherever they were saved."""
+        if self.worker and self.worker_thread.is_alive():
+            return
+        journals = find_incomplete_journals(self.save_path, journal_registry_dir())
+        if not journals:
+            return
+        
+        save_path = os.path.abspath(self.save_path)
+        names = "\n".join(os.path.basename(journal) if os.path.dirname(journal) == save_path else journal
+                          for journal in journals)
+        confirm = QMessageBox.question(
+            self,
+            "Recover Captures",
+            f"Found {len(journals)} incomplete capture(s) from an interrupted run:\n{names}\n\n"
+            "Recover the samples they contain?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            return
+        
+        for journal in journals:
+            try:
+                filenames, rows = recover_journal(journal)
+                for filename in filenames:
+                    self.log_message(f"Recovered {rows} samples to {filename}", "SUCCESS")
+            except Exception as e:
+                self.log_message(f"Could not recover {journal}: {str(e)}", "ERROR")
     
     # Shaker control methods
     def start_shaker(self):
@@ -788,14 +902,20 @@ class EVidentApp(QMainWindow):
                 frequency = float(self.shaker_panel.direct_freq_entry.text())
             else:
                 frequency = float(self.shaker_panel.freq_selector.currentText().split()[0])
-                
-            if self.shaker_controller.set_frequency(frequency):
+        except ValueError:
+            self.log_message("Invalid frequency value", "ERROR")
+            return
+        
+        def started(success, error):
+            if success:
+                self.shaker_frequency = frequency
+                self.spectrum_plot.set_commanded_frequency(frequency)
                 self.log_message(f"Shaker started at {frequency} Hz", "SUCCESS")
                 self.overall_status_label.setText(f"Shaker running at {frequency} Hz")
             else:
-                self.log_message("Failed to start shaker", "ERROR")
-        except ValueError:
-            self.log_message("Invalid frequency value", "ERROR")
+                self.log_message(f"Failed to start shaker: {error}", "ERROR")
+        
+        self.shaker_commands.submit('set_frequency', frequency, callback=started)
     
     def set_direct_frequency(self):
         """Set frequency from direct input field."""
@@ -803,19 +923,27 @@ class EVidentApp(QMainWindow):
     
     def stop_shaker(self):
         """Stop the shaker."""
-        if self.shaker_controller.stop():
-            self.log_message("Shaker stopped", "SUCCESS")
-            self.overall_status_label.setText("Shaker stopped")
-        else:
-            self.log_message("Failed to stop shaker", "ERROR")
+        def stopped(success, error):
+            if success:
+                self.shaker_frequency = None
+                self.spectrum_plot.set_commanded_frequency(None)
+                self.log_message("Shaker stopped", "SUCCESS")
+                self.overall_status_label.setText("Shaker stopped")
+            else:
+                self.log_message(f"Failed to stop shaker: {error}", "ERROR")
+        
+        self.shaker_commands.submit('stop', callback=stopped)
     
     def home_shaker(self):
         """Return shaker to home position."""
-        if self.shaker_controller.home():
-            self.log_message("Shaker returned to home position", "SUCCESS")
-            self.overall_status_label.setText("Shaker at home position")
-        else:
-            self.log_message("Failed to return shaker to home", "ERROR")
+        def homed(success, error):
+            if success:
+                self.log_message("Shaker returned to home position", "SUCCESS")
+                self.overall_status_label.setText("Shaker at home position")
+            else:
+                self.log_message(f"Failed to return shaker to home: {error}", "ERROR")
+        
+        self.shaker_commands.submit('home', callback=homed)
     
     def calibrate_shaker(self):
         """Calibrate the shaker."""
@@ -828,79 +956,79 @@ class EVidentApp(QMainWindow):
         )
         
         if confirm == QMessageBox.Yes:
-            try:
-                self.log_message("Calibrating shaker...", "INFO")
-                self.overall_status_label.setText("Calibrating shaker...")
-                
-                # Send the calibration request directly instead of using the controller class
-                response = requests.get(f"{self.shaker_controller.base_url}/calibrate")
-                
-                if response.status_code == 200:
-                    self.log_message("Shaker calibrated successfully", "SUCCESS")
-                    
-                    # Don't enable the auto raise button yet - move it to after home position is set
-                    
-                    # Ask to set home position, using the same style as the first dialog
-                    set_home = QMessageBox.question(
-                        self,
-                        "Set Home Position",
-                        "Confirm that the shaker head is in the lowest position",
-                        QMessageBox.Yes | QMessageBox.No
-                    )
-                    
-                    if set_home == QMessageBox.Yes:
-                        self.set_home_position()
-                    else:
-                        self.overall_status_label.setText("Home position setup cancelled")
-                        self.log_message("Home position setup cancelled", "WARNING")
-                else:
-                    self.log_message(f"Shaker calibration failed with status code: {response.status_code}", "ERROR")
-                    self.overall_status_label.setText(f"Calibration failed: {response.status_code}")
-                    
-            except requests.RequestException as e:
-                self.log_message(f"Error calibrating shaker: {str(e)}", "ERROR")
-                self.overall_status_label.setText(f"Calibration error: {str(e)}")
+            self.log_message("Calibrating shaker...", "INFO")
+            self.overall_status_label.setText("Calibrating shaker...")
+            self.shaker_commands.submit('calibrate', callback=self.shaker_calibrated)
     
-    def set_home_position(self):
-        """Set the home position of the shaker."""
-        try:
-            self.log_message("Setting home position...", "INFO")
-            self.overall_status_label.setText("Setting home position...")
+    def shaker_calibrated(self, success, error):
+        """Handle the end of the shaker calibration."""
+        if success:
+            self.log_message("Shaker calibrated successfully", "SUCCESS")
             
-            # Send the set home request directly
-            response = requests.get(f"{self.shaker_controller.base_url}/set_home")
+            # Don't enable the auto raise button yet - move it to after home position is set
             
-            if response.status_code == 200:
+            # Ask to set home position, using the same style as the first dialog
+            set_home = QMessageBox.question(
+                self,
+                "Set Home Position",
+                "Confirm that the shaker head is in the lowest position",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            
+            if set_home == QMessageBox.Yes:
+                self.set_home_position()
+            else:
+                self.overall_status_label.setText("Home position setup cancelled")
+                self.log_message("Home position setup cancelled", "WARNING")
+        else:
+            self.log_message(f"Shaker calibration failed: {error}", "ERROR")
+            self.overall_status_label.setText(f"Calibration failed: {error}")
+    
+    def set_home_position(self):
+        """Set the home position of the shaker."""
+        self.log_message("Setting home position...", "INFO")
+        self.overall_status_label.setText("Setting home position...")
+        
+        def home_set(success, error):
+            if success:
                 self.log_message("Home position set successfully", "SUCCESS")
                 self.overall_status_label.setText("Calibration complete, home position set")
                 
                 # Enable the auto raise button here, after home position is successfully set
                 self.shaker_panel.auto_raise_button.setEnabled(True)
             else:
-                self.log_message(f"Failed to set home position: {response.status_code}", "ERROR")
-                self.overall_status_label.setText(f"Failed to set home position: {response.status_code}")
-                
-        except requests.RequestException as e:
-            self.log_message(f"Error setting home position: {str(e)}", "ERROR")
-            self.overall_status_label.setText(f"Error setting home position: {str(e)}")
+                self.log_message(f"Failed to set home position: {error}", "ERROR")
+                self.overall_status_label.setText(f"Failed to set home position: {error}")
+        
+        self.shaker_commands.submit('set_home', callback=home_set)
     
     def auto_raise_shaker(self):
         """Automatically raise the shaker."""
-        if self.shaker_controller.auto_raise():
-            self.log_message("Shaker auto-raise initiated", "SUCCESS")
-            self.overall_status_label.setText("Shaker auto-raise in progress")
-        else:
-            self.log_message("Failed to start auto-raise", "ERROR")
+        def raised(success, error):
+            if success:
+                self.log_message("Shaker auto-raise initiated", "SUCCESS")
+                self.overall_status_label.setText("Shaker auto-raise in progress")
+            else:
+                self.log_message(f"Failed to start auto-raise: {error}", "ERROR")
+        
+        self.shaker_commands.submit('auto_raise', callback=raised)
     
     def lower_shaker_pressed(self):
         """Handle lower button press."""
-        if self.shaker_controller.lower(True):
-            self.log_message("Lowering shaker...", "INFO")
+        def lowering(success, error):
+            if success:
+                self.log_message("Lowering shaker...", "INFO")
+        
+        # A release before the press was sent replaces it
+        self.shaker_commands.submit('lower', True, callback=lowering)
     
     def lower_shaker_released(self):
         """Handle lower button release."""
-        if self.shaker_controller.lower(False):
-            self.log_message("Stopped lowering shaker", "INFO")
+        def stopped_lowering(success, error):
+            if success:
+                self.log_message("Stopped lowering shaker", "INFO")
+        
+        self.shaker_commands.submit('lower', False, callback=stopped_lowering)
     
     # Controller IP methods
     def auto_find_controller(self):
@@ -926,22 +1054,20 @@ class EVidentApp(QMainWindow):
         """Update controller IP from entry field."""
         ip = self.shaker_panel.controller_ip_entry.text().strip()
         if ip:
+            if not ip.startswith("http://"):
+                ip = f"http://{ip}"
+            
             # Test connection before setting
-            if self.test_controller_connection(ip):
-                self.set_controller_ip(ip)
-            else:
-                self.log_message("Failed to connect to shaker controller", "ERROR")
-                self.shaker_panel.controller_progress.setFormat("Failed to connect to shaker controller")
-                # popup a message box to the user
-                QMessageBox.warning(self, "Shaker Controller Connection Error", "Failed to connect to shaker controller")
-    
-    def test_controller_connection(self, ip):
-        """Test connection to the shaker controller."""
-        if not ip.startswith("http://"):
-            ip = f"http://{ip}"
-        
-        controller = ShakerController(ip)
-        return controller.ping()
+            def tested(reachable, error):
+                if reachable:
+                    self.set_controller_ip(ip)
+                else:
+                    self.log_message("Failed to connect to shaker controller", "ERROR")
+                    self.shaker_panel.controller_progress.setFormat("Failed to connect to shaker controller")
+                    # popup a message box to the user
+                    QMessageBox.warning(self, "Shaker Controller Connection Error", "Failed to connect to shaker controller")
+            
+            self.shaker_commands.submit('ping', ip, callback=tested)
     
     def update_controller_find_progress(self, message, value):
         """Update progress for controller IP finder."""
@@ -959,8 +1085,8 @@ class EVidentApp(QMainWindow):
         self.shaker_panel.controller_progress.setFormat(f"Shaker controller IP set to {ip.replace("http://", "")}")
         self.overall_status_label.setText(f"Shaker controller IP: {ip}")
         
-        # Refresh battery status with new IP
-        self.refresh_shaker_battery()
+        # Refresh battery status and health with new IP
+        self.shaker_health.poke()
     
     def show_error(self, message):
         """Display error message in the UI."""
@@ -1065,17 +1191,7 @@ class EVidentApp(QMainWindow):
             self.show_error("Please enter valid numeric values for all fields")
             return
         
-        # Test sensor connections before starting
-        sensor1_connected = self.test_sensor_connection(1)
-        if not sensor1_connected:
-            self.show_error(f"Cannot connect to Sensor 1 at {self.sensor_ip1}:8888")
-            return
-        
-        if self.dual_sensor_mode:
-            sensor2_connected = self.test_sensor_connection(2) 
-            if not sensor2_connected:
-                self.show_error(f"Cannot connect to Sensor 2 at {self.sensor_ip2}:8888")
-                return
+        # Sensor connections are checked by the worker's preflight, off the UI thread
         
         # Create the configuration dictionary
         config = {
@@ -1093,8 +1209,12 @@ class EVidentApp(QMainWindow):
             'soc': soc_value,
             'trim': self.trim_selector.currentText(),
             'test_number': test_number,
-            'test_id': self.test_id
+            'test_id': self.test_id,
+            'redo_of': self.redo_of,
+            'shaker_url': self.shaker_controller.base_url,
+            'shaker_frequency': self.shaker_frequency
         }
+        self.redo_of = None
         
         # Reset progress UI for data collection
         self.sensor_panel1.progress_bar.setValue(0)
@@ -1120,8 +1240,15 @@ class EVidentApp(QMainWindow):
         if test_number == 1:
             self.had_redos_in_sequence = False
         
+        # The previous run's samples are no longer needed
+        if self.worker and not self.worker_thread.is_alive():
+            self.worker.close()
+        
         # Create and start worker with the config
-        self.worker = DataCollectionWorker(config)
+        self.worker = DataCollectionWorker(config, live_sink=self.live_plot.add_samples,
+                                           shaker_controller=self.shaker_controller)
+        self.live_plot.set_sensors([sensor_id for sensor_id, _ in self.worker.sensor_targets])
+        self.spectrum_plot.set_sensors([sensor_id for sensor_id, _ in self.worker.sensor_targets])
         
         # Connect signals
         self.worker.progress.connect(lambda msg, val: self.overall_status_label.setText(msg))
@@ -1133,6 +1260,8 @@ class EVidentApp(QMainWindow):
         self.worker.finished.connect(self.data_collection_finished)
         self.worker.need_redo.connect(self.auto_redo_test)
         self.worker.outliers_detected.connect(self.handle_outliers)  # New signal connection
+        self.worker.shaker_status.connect(self.handle_shaker_preflight)
+        self.worker.spectrum_update.connect(self.spectrum_plot.update_spectrum)
         
         # Start worker in a new thread
         self.worker_thread = threading.Thread(target=self.worker.run)
@@ -1174,6 +1303,11 @@ class EVidentApp(QMainWindow):
             
             # Log completion but only show dialog if no outliers and not in redo mode
             self.log_message("Data collection complete", "SUCCESS")
+            for sensor_id, stats in sorted(self.worker.timing_stats.items()):
+                if stats is not None:
+                    self.log_message(
+                        f"Sensor {sensor_id} timing: {stats.samples} samples, median delta "
+                        f"{stats.median_delta * 1000:.3f} ms, {stats.outlier_count} outliers", "INFO")
             
             if outliers_detected or self.redo_triggered:
                 self.overall_status_label.setText("Processing data - checking for timing issues...")
@@ -1201,7 +1335,7 @@ class EVidentApp(QMainWindow):
             f"{self.vin_entry.text()}_{self.make_selector.currentText()}_{self.model_selector.currentText().replace(' ', '_')}_"
             f"{self.year_selector.currentText()}_{self.mileage_entry.text()}_"
             f"{self.trim_selector.currentText().replace(' ', '_')}_{soc_value}_"
-            f"{self.file_prefix_entry.text()}_{self.test_id}_[timestamp]_sensor[1-2].csv"
+            f"{self.file_prefix_entry.text()}_{self.test_id}_[timestamp]_sensor[1-2].npz"
         )
         
         # Update the display
@@ -1214,7 +1348,7 @@ class EVidentApp(QMainWindow):
             self.sensor1_progress_bar.setValue(progress)
             self.sensor1_progress_bar.setFormat(message)
             self.sensor_panel1.status_label.setText(message)
-        else:  # sensor_id == 2
+        elif sensor_id == 2:
             self.sensor2_progress_bar.setValue(progress)
             self.sensor2_progress_bar.setFormat(message)
             self.sensor_panel2.status_label.setText(message)
@@ -1252,72 +1386,69 @@ class EVidentApp(QMainWindow):
             self.model_selector.currentText() + '_' + self.year_selector.currentText() + '_' + \
             self.mileage_entry.text() + '_' + self.soc_selector.currentText() + '_' + self.test_id
         
-        zip_filename = os.path.join(self.save_path, f"{folder_name}.zip")
-        
         if not os.access(self.save_path, os.W_OK):
             self.log_message("You don't have write permissions for this folder.", "ERROR")
             return
+        
+        # Only the current test's files that are new or changed since the last
+        # upload, and not already waiting in the outbox
+        test_id = self.worker.config['test_id'] if self.worker else self.test_id
+        manifest = UploadManifest(self.save_path)
+        queued = self.upload_queue.queued_paths()
+        test_files = find_test_files(self.save_path, test_id)
+        changed = manifest.changed_files([path for path in test_files if path not in queued])
+        if not changed:
+            self.log_message(f"All {len(test_files)} files of test {test_id} are already uploaded or queued.", "INFO")
+            self.show_warning_dialog("Already Uploaded", "There is no new data to upload for this test.")
+            self.saved_to_aws = bool(test_files)
+            return
+        
+        # Later uploads of the same test go out as separate, numbered archives
+        used_keys = manifest.shipped_keys(test_files) | {
+            key for key in self.upload_queue.queued_keys() if key.startswith(folder_name)}
+        if used_keys:
+            folder_name += f"_update{len(used_keys)}"
+        s3_key = f"{folder_name}.zip"
 
-        # Remove existing ZIP file to avoid permission conflicts.
-        if os.path.exists(zip_filename):
-            try:
-                os.remove(zip_filename)
-            except PermissionError:
-                self.log_message("Existing ZIP file cannot be removed. Check file permissions.", "ERROR")
-                return
-
+        # Zipping and uploading happen on the upload queue's thread, so the
+        # next test can start while this one uploads
         try:
-            with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Walk through the entire directory structure.
-                for root, dirs, files in os.walk(self.save_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        # Skip the ZIP file itself to prevent including it inside the archive.
-                        if os.path.abspath(file_path) == os.path.abspath(zip_filename):
-                            continue
-                        # Get the relative path for a clean folder structure in the archive.
-                        relative_path = os.path.relpath(file_path, self.save_path)
-                        zipf.write(file_path, arcname=relative_path)
-
-            upload_result = self.upload_zip_to_aws(zip_filename)
-
-            if upload_result:
-                # Show success dialog if upload to AWS is successful
-                self.show_warning_dialog("Upload Successful", f"Data uploaded to AWS successfully!")
-            else:
-                # Show error dialog if upload to AWS fails
-                self.show_warning_dialog("Upload Failed", "Failed to upload data to AWS.")
-        
-        except PermissionError:
-            self.log_message("Please check your folder permissions.", "ERROR")
-            self.show_warning_dialog("Permission Error", "Please check your folder permissions.")
+            self.upload_queue.enqueue(sorted(changed), s3_key, changed, self.save_path)
+            self.log_message(f"Queued {len(changed)} of {len(test_files)} files of test {test_id} "
+                             f"for upload as {s3_key}", "INFO")
         except Exception as e:
-            self.show_warning_dialog("Error", f"Error occurred while uploading data: {str(e)}")
-            self.log_message(f"Error zipping files: {str(e)}", "ERROR")
+            self.show_warning_dialog("Error", f"Error occurred while queuing the upload: {str(e)}")
+            self.log_message(f"Error queuing upload: {str(e)}", "ERROR")
+            return
         
         self.saved_to_aws = True
-        os.remove(zip_filename)  # Delete the zip file
 
-    def upload_zip_to_aws(self, zip_filename):
-        """
-        Uploads the generated zip file to AWS S3.
-        """
-        try:
-            bucket_name = "evb-cloud-store"
-            s3_key = os.path.basename(zip_filename)
+    def create_s3_client(self):
+        """Create the S3 client used by the upload queue."""
+        return boto3.client(
+            's3',
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+        )
 
-            s3 = boto3.client(
-                's3',
-                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-            )
+    def update_upload_progress(self, s3_key, percent):
+        """Show the progress of the upload in progress."""
+        self.upload_status_label.setText(f"Uploading: {percent}%")
 
-            s3.upload_file(zip_filename, bucket_name, s3_key)
-            self.log_message(f"Successfully uploaded {zip_filename} to {bucket_name}/{s3_key}", "SUCCESS")
-            return True  # Return True if upload is successful
-        except Exception as e:
-            self.log_message(f"Error uploading to AWS: {str(e)}", "ERROR")
-            return False  # Return False if there was an error
+    def upload_finished(self, s3_key, file_count):
+        """Log an upload that completed."""
+        self.log_message(f"Successfully uploaded {file_count} files to evb-cloud-store/{s3_key}", "SUCCESS")
+
+    def upload_failed(self, s3_key, message, retry_in):
+        """Log a failed upload attempt; the queue retries it after retry_in seconds."""
+        if retry_in < 0:
+            self.log_message(f"Upload of {s3_key} dropped: {message}", "ERROR")
+        else:
+            self.log_message(f"Error uploading {s3_key} to AWS: {message} - retrying in {retry_in:.0f} s", "WARNING")
+
+    def update_upload_queue_status(self, pending):
+        """Show how many uploads are still waiting."""
+        self.upload_status_label.setText(f"{pending} upload(s) pending" if pending else "Uploads complete")
 
     def submit_email(self):
         """Submit the email address from the entry field."""
@@ -1406,29 +1537,12 @@ EVident Battery Team
             # Return the MessageId upon successful email sending
             return f"The retrieval code has been successfully sent to {recipient_email}."
 
-    def test_sensor_connection(self, sensor_id):
-        """Test connection to a sensor and report result."""
-        ip = self.sensor_ip1 if sensor_id == 1 else self.sensor_ip2
-        port = 8888  # Default port
-        
-        try:
-            # Create a socket
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(2.0)  # 2 second timeout
-            
-            # Try to connect
-            result = s.connect_ex((ip, port))
-            s.close()
-            
-            if result == 0:
-                self.log_message(f"Sensor {sensor_id} ({ip}:{port}) is reachable", "INFO")
-                return True
-            else:
-                self.log_message(f"Sensor {sensor_id} ({ip}:{port}) is not reachable, error code: {result}", "ERROR")
-                return False
-        except Exception as e:
-            self.log_message(f"Error testing connection to sensor {sensor_id} ({ip}:{port}): {str(e)}", "ERROR")
-            return False
+    def handle_shaker_preflight(self, voltage):
+        """Show the shaker battery read by the preflight, or warn that the shaker did not answer."""
+        if voltage is None:
+            self.log_message(f"Shaker ({self.shaker_controller.base_url}) is not reachable", "WARNING")
+        else:
+            self.update_shaker_battery_status(voltage)
 
     def handle_outliers(self, sensor_id, median_value, max_outlier):
         """Handle outliers detected in delta time data by automatically redoing the test."""
@@ -1450,17 +1564,24 @@ EVident Battery Team
         if not self.redo_triggered:
             return
         
+        # Outliers are reported while the worker is still saving; wait until it has cataloged the run
+        if self.worker_thread.is_alive():
+            QTimer.singleShot(200, self.redo_test)
+            return
+        
         # If there were previously generated files, remove them
-        for sensor_id, filename in self.worker.filenames.items():
-            if filename and os.path.exists(filename):
-                try:
-                    os.remove(filename)
-                    self.log_message(f"Removed file from failed test: {filename}", "INFO")
-                except Exception as e:
-                    self.log_message(f"Warning: Could not remove file: {str(e)}", "WARNING")
+        for sensor_id, filenames in self.worker.filenames.items():
+            for filename in filenames or []:
+                if os.path.exists(filename):
+                    try:
+                        os.remove(filename)
+                        self.log_message(f"Removed file from failed test: {filename}", "INFO")
+                    except Exception as e:
+                        self.log_message(f"Warning: Could not remove file: {str(e)}", "WARNING")
         
         # Reset the redo trigger before starting the collection
         self.redo_triggered = False
+        self.redo_of = self.worker.run_id
         
         self.log_message(f"Test will be redone due to timing outliers", "INFO")
         
@@ -1470,22 +1591,32 @@ EVident Battery Team
     def refresh_shaker_battery(self):
         """Refresh the shaker battery status."""
         self.log_message("Refreshing shaker battery status...", "INFO")
-        # Start in a separate thread to avoid blocking UI
-        threading.Thread(target=self._get_shaker_battery_status, daemon=True).start()
+        self.shaker_commands.submit('get_battery_voltage', callback=self.shaker_battery_received)
 
-    def _get_shaker_battery_status(self):
-        """Get the shaker battery status in a separate thread."""
-        voltage = self.shaker_controller.get_battery_voltage()
-        # Use signal to update UI from thread
+    def shaker_battery_received(self, voltage, error):
+        """Show the battery voltage read from the shaker controller."""
         if voltage is not None:
-            # Update UI in main thread
-            QApplication.instance().postEvent(self, 
-                UpdateShakerBatteryEvent(voltage))
-            return True
+            self.update_shaker_battery_status(voltage)
         else:
-            self.log_message("Failed to get shaker battery status", "WARNING")
-            return False
+            self.log_message(f"Failed to get shaker battery status: {error}", "WARNING")
 
+    def handle_shaker_health(self, status):
+        """Show the result of a background shaker health check."""
+        was_reachable = self.shaker_reachable
+        self.shaker_reachable = status['reachable']
+        self.shaker_panel.update_health(status, self.shaker_metrics.summary_lines())
+        
+        if status['reachable']:
+            # The battery display follows every check; the log only changes of state
+            self.shaker_panel.update_battery_status(status['voltage'])
+            if not was_reachable:
+                self.log_message(f"Shaker battery voltage: {status['voltage']:.2f}V", "BATTERY")
+            if was_reachable is False:
+                self.log_message("Shaker controller is responding again", "SUCCESS")
+        elif was_reachable is not False:
+            self.log_message(f"Shaker controller is not responding: {status['error']} "
+                             f"(retrying in {status['next_check_in']:.0f}s)", "WARNING")
+    
     def update_shaker_battery_status(self, voltage):
         """Update the shaker battery status display."""
         # Update battery display through the shaker panel
@@ -1494,13 +1625,6 @@ EVident Battery Team
         # Keep the logging in the main app
         self.log_message(f"Shaker battery voltage: {voltage:.2f}V", "BATTERY")
 
-    def event(self, event):
-        """Handle custom events."""
-        if event.type() == UpdateShakerBatteryEvent.EVENT_TYPE:
-            self.update_shaker_battery_status(event.voltage)
-            return True
-        return super().event(event)
-
     def closeEvent(self, event):
         """Ensure resources are released when the window closes."""
         self.log_message("Closing application...", "INFO")
@@ -1512,11 +1636,20 @@ EVident Battery Team
         # Stop worker thread if running (add this if not already handled)
         if self.worker and self.worker_thread and self.worker_thread.is_alive():
              self.log_message("Attempting to stop data collection worker...", "INFO")
-             # Implement a safe stop mechanism in your worker if possible
-             # self.worker.stop() # Example - you'd need to implement this
-             # self.worker_thread.join(timeout=2) # Wait briefly
+             self.worker.stop()
+             self.worker_thread.join(timeout=2) # Wait briefly
+        if self.worker and not self.worker_thread.is_alive():
+            self.worker.close()
+
+        # Pending uploads stay in the outbox and resume on the next start
+        self.upload_queue.stop()
+        self.live_plot.stop()
+        self.shaker_health.stop()
+        self.shaker_commands.stop()
+        self.shaker_controller.close()
 
         # Add cleanup for other resources if needed (e.g., shaker controller)
 
         self.log_message("Cleanup complete. Exiting.", "INFO")
+        self.log_sink.close()
         event.accept() # Accept the close event
\ No newline at end of file
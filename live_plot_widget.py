@@ -0,0 +1,235 @@
+from collections import deque
+import numpy as np
+from PyQt5.QtCore import Qt, QTimer, QRectF
+from PyQt5.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QSizePolicy, QWidget
+
+# Columns of a received (n, 7) sample block
+ACCEL_COLUMNS = (1, 2, 3)
+GYRO_COLUMNS = (4, 5, 6)
+CHANNEL_COLORS = (QColor(229, 57, 53), QColor(67, 160, 71), QColor(30, 136, 229))  # X, Y, Z
+
+
+class MinMaxEnvelope:
+    """Min/max of each channel per time bin, over the last `bins` bins of `window` seconds.
+
+    Samples are folded into the bin their sensor timestamp falls in, so
+    one bin is one pixel column of the plot and the envelope costs the
+    same to draw whatever the sample rate or the length of the capture.
+    Bins are kept in a ring; old bins are reused as time moves on.
+    """
+
+    def __init__(self, bins, window, channels):
+        self.bins = max(int(bins), 1)
+        self.window = window
+        self.bin_width = window / self.bins
+        self.mins = np.full((self.bins, channels), np.nan)
+        self.maxs = np.full((self.bins, channels), np.nan)
+        self.last_bin = None  # absolute index of the newest bin
+
+    def add(self, times, values):
+        """Fold samples (times in seconds, values (n, channels)) into the envelope."""
+        if not len(times):
+            return
+        index = np.floor(np.asarray(times) / self.bin_width).astype(np.int64)
+        if np.any(index[1:] < index[:-1]):
+            order = np.argsort(index, kind='stable')
+            index, values = index[order], values[order]
+
+        newest = int(index[-1])
+        if self.last_bin is None or newest < self.last_bin - self.bins or newest - self.last_bin >= self.bins:
+            # First data, the sensor clock restarted, or a gap longer than the window
+            self.mins.fill(np.nan)
+            self.maxs.fill(np.nan)
+            self.last_bin = newest
+        elif newest > self.last_bin:
+            # Bins that scroll in are reused from the ones scrolling out
+            stale = np.arange(self.last_bin + 1, newest + 1) % self.bins
+            self.mins[stale] = np.nan
+            self.maxs[stale] = np.nan
+            self.last_bin = newest
+
+        # Samples that are already outside the window
+        keep = index > self.last_bin - self.bins
+        if not keep.all():
+            index, values = index[keep], values[keep]
+            if not len(index):
+                return
+
+        # Sorted samples fall into contiguous runs, one run per bin
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(index)) + 1))
+        slots = index[starts] % self.bins
+        self.mins[slots] = np.fmin(self.mins[slots], np.minimum.reduceat(values, starts, axis=0))
+        self.maxs[slots] = np.fmax(self.maxs[slots], np.maximum.reduceat(values, starts, axis=0))
+
+    def snapshot(self):
+        """Return (mins, maxs), oldest bin first; bins without samples are NaN."""
+        if self.last_bin is None:
+            return self.mins, self.maxs
+        order = np.arange(self.last_bin + 1, self.last_bin + 1 + self.bins) % self.bins
+        return self.mins[order], self.maxs[order]
+
+
+def polygon_from_arrays(x, y):
+    """QPolygonF with the points (x[i], y[i]), filled straight from the arrays."""
+    count = len(x)
+    polygon = QPolygonF(count)
+    pointer = polygon.data()
+    pointer.setsize(count * 16)
+    points = np.frombuffer(pointer, dtype=np.float64).reshape(-1, 2)
+    points[:, 0] = x
+    points[:, 1] = y
+    return polygon
+
+
+def envelope_polygon(x, mins, maxs):
+    """Closed polygon running along maxs left to right and back along mins."""
+    return polygon_from_arrays(np.concatenate((x, x[::-1])), np.concatenate((maxs, mins[::-1])))
+
+
+class LivePlotWidget(QWidget):
+    """Live accelerometer and gyroscope plot of every active sensor.
+
+    add_samples() may be called from the ingest threads for every received
+    block: it only queues a reference to the block. A timer on the GUI
+    thread folds the queued blocks into a MinMaxEnvelope per sensor and
+    plot (one bin per pixel column) and repaints at most `fps` times a
+    second, drawing each channel as a single min/max polygon.
+    """
+
+    MARGIN = 6
+    LABEL_HEIGHT = 16
+
+    def __init__(self, parent=None, window_seconds=5.0, fps=60):
+        super().__init__(parent)
+        self.window_seconds = window_seconds
+        self.setMinimumSize(360, 240)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        self.sensor_ids = []
+        self.envelopes = {}
+        # Blocks waiting to be plotted; if the GUI falls behind the oldest are dropped
+        self._incoming = deque(maxlen=4096)
+        self._plot_width = 0
+        self._dirty = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(int(1000 / fps), 1))
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+
+    def set_sensors(self, sensor_ids):
+        """Start a new plot for the given sensors."""
+        self.sensor_ids = list(sensor_ids)
+        self._incoming.clear()
+        self._reset_envelopes()
+        self.update()
+
+    def clear(self):
+        """Drop everything plotted so far."""
+        self.set_sensors(self.sensor_ids)
+
+    def add_samples(self, sensor_id, samples, arrival_ns=0):
+        """Queue an (n, 7) block of received samples (any thread)."""
+        self._incoming.append((sensor_id, samples))
+
+    def refresh(self):
+        """Fold the queued blocks into the envelopes and repaint if anything changed."""
+        while self._incoming:
+            sensor_id, samples = self._incoming.popleft()
+            envelopes = self.envelopes.get(sensor_id)
+            if envelopes is None or not len(samples):
+                continue
+            times = samples[:, 0]
+            envelopes[0].add(times, samples[:, ACCEL_COLUMNS])
+            envelopes[1].add(times, samples[:, GYRO_COLUMNS])
+            self._dirty = True
+        if self._dirty:
+            self._dirty = False
+            self.update()
+
+    def stop(self):
+        """Stop the refresh timer."""
+        self._timer.stop()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        width = int(self._plot_rects()[0][0].width()) if self.sensor_ids else 0
+        if width != self._plot_width:
+            # One bin per pixel column; the plot refills within the window
+            self._reset_envelopes()
+
+    def _reset_envelopes(self):
+        self._plot_width = int(self._plot_rects()[0][0].width()) if self.sensor_ids else 0
+        self.envelopes = {
+            sensor_id: (MinMaxEnvelope(self._plot_width, self.window_seconds, len(ACCEL_COLUMNS)),
+                        MinMaxEnvelope(self._plot_width, self.window_seconds, len(GYRO_COLUMNS)))
+            for sensor_id in self.sensor_ids
+        }
+
+    def _plot_rects(self):
+        """Plot area of each (sensor, accel/gyro) pair; sensors in rows, accel left, gyro right."""
+        rows = max(len(self.sensor_ids), 1)
+        cell_width = self.width() / 2
+        cell_height = self.height() / rows
+        rects = []
+        for row in range(rows):
+            rects.append(tuple(
+                QRectF(column * cell_width + self.MARGIN,
+                       row * cell_height + self.MARGIN + self.LABEL_HEIGHT,
+                       max(cell_width - 2 * self.MARGIN, 1),
+                       max(cell_height - 2 * self.MARGIN - self.LABEL_HEIGHT, 1))
+                for column in range(2)
+            ))
+        return rects
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if not self.sensor_ids:
+            painter.setPen(QColor('#757575'))
+            painter.drawText(self.rect(), Qt.AlignCenter, "Live sensor data appears here while recording")
+            return
+
+        for sensor_id, rects in zip(self.sensor_ids, self._plot_rects()):
+            for name, rect, envelope in zip(("Accel", "Gyro"), rects, self.envelopes[sensor_id]):
+                self._draw_plot(painter, f"Sensor {sensor_id} {name}", rect, envelope)
+
+    def _draw_plot(self, painter, title, rect, envelope):
+        painter.setPen(QPen(QColor('#e0e0e0')))
+        painter.setBrush(QColor('#fafafa'))
+        painter.drawRect(rect)
+
+        mins, maxs = envelope.snapshot()
+        has_data = np.isfinite(mins).any(axis=1)
+        low = np.nanmin(mins[has_data]) if has_data.any() else -1.0
+        high = np.nanmax(maxs[has_data]) if has_data.any() else 1.0
+        if high - low < 1e-9:
+            low, high = low - 1.0, high + 1.0
+        padding = (high - low) * 0.05
+        low, high = low - padding, high + padding
+
+        painter.setPen(QColor('#424242'))
+        painter.drawText(QRectF(rect.left(), rect.top() - self.LABEL_HEIGHT, rect.width(), self.LABEL_HEIGHT),
+                         Qt.AlignLeft | Qt.AlignVCenter, title)
+        painter.drawText(QRectF(rect.left(), rect.top() - self.LABEL_HEIGHT, rect.width(), self.LABEL_HEIGHT),
+                         Qt.AlignRight | Qt.AlignVCenter, f"{low:.3g} .. {high:.3g}")
+        if not has_data.any():
+            return
+
+        # Bin i is pixel column i of the plot
+        columns = np.flatnonzero(has_data)
+        x = rect.left() + columns + 0.5
+        scale = rect.height() / (high - low)
+        bottom = rect.bottom()
+        painter.save()
+        painter.setClipRect(rect)
+        for channel, color in enumerate(CHANNEL_COLORS):
+            painter.setPen(color)
+            painter.setBrush(color)
+            painter.drawPolygon(envelope_polygon(
+                x,
+                bottom - (mins[columns, channel] - low) * scale,
+                bottom - (maxs[columns, channel] - low) * scale
+            ))
+        painter.restore()
@@ -0,0 +1,81 @@
+import logging
+import os
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from PyQt5.QtCore import QObject, QTimer
+
+
+class LogSink(QObject):
+    """Buffered writer for the activity log panel, with an optional rotating log file.
+
+    write() only queues the message and may be called from any thread. A
+    timer on the GUI thread flushes the queue every flush_interval_ms:
+    the whole batch is appended with repaints suspended and the view is
+    scrolled once, so a burst of messages costs one repaint instead of one
+    per message. The panel keeps at most max_blocks lines; older lines are
+    dropped from the top but stay in the log file.
+    """
+
+    def __init__(self, text_edit, flush_interval_ms=100, max_blocks=5000,
+                 log_file=None, max_bytes=5 * 1024 * 1024, backup_count=5):
+        super().__init__(text_edit)
+        self.text_edit = text_edit
+        self.text_edit.document().setMaximumBlockCount(max_blocks)
+        # Messages beyond what the panel can show are never rendered
+        self._pending = deque(maxlen=max_blocks)
+        self._lock = threading.Lock()
+
+        self._file_handler = None
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+            self._file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                     backupCount=backup_count, encoding='utf-8')
+        self._file_lines = []
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(flush_interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def write(self, html_message, plain_message):
+        """Queue a message for the panel (as HTML) and the log file (as plain text)."""
+        with self._lock:
+            self._pending.append(html_message)
+            if self._file_handler:
+                self._file_lines.append(plain_message)
+
+    def flush(self):
+        """Render the queued messages and write them to the log file (GUI thread only)."""
+        with self._lock:
+            messages = list(self._pending)
+            self._pending.clear()
+            file_lines, self._file_lines = self._file_lines, []
+
+        if messages:
+            scroll_bar = self.text_edit.verticalScrollBar()
+            self.text_edit.setUpdatesEnabled(False)
+            try:
+                for message in messages:
+                    self.text_edit.append(message)
+            finally:
+                self.text_edit.setUpdatesEnabled(True)
+            # Scroll to bottom
+            scroll_bar.setValue(scroll_bar.maximum())
+
+        if file_lines:
+            record = logging.LogRecord('evident', logging.INFO, __file__, 0, "\n".join(file_lines), None, None)
+            self._file_handler.emit(record)
+
+    def clear(self):
+        """Drop queued messages and empty the panel."""
+        with self._lock:
+            self._pending.clear()
+        self.text_edit.clear()
+
+    def close(self):
+        """Flush what is queued and close the log file."""
+        self._timer.stop()
+        self.flush()
+        if self._file_handler:
+            self._file_handler.close()
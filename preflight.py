@@ -0,0 +1,71 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from sensor_data_collector import SensorDataCollector, parse_sensor_address
+
+SensorProbe = namedtuple('SensorProbe', ['collector', 'battery', 'error', 'seconds'])
+SensorProbe.__doc__ = """Preflight result for one sensor; collector is connected (and error None) on success."""
+
+PreflightResult = namedtuple('PreflightResult', ['sensors', 'shaker_voltage', 'seconds'])
+PreflightResult.__doc__ = """Preflight results: {sensor_id: SensorProbe}, the shaker battery voltage (None if
+the shaker did not answer) and the time the preflight took."""
+
+
+def probe_sensor(collector, deadline):
+    """Connect a collector and read the battery report the sensor sends on connect.
+
+    Gives up at `deadline` (a time.monotonic() value). On success the
+    connection is left open, so collection starts on it without connecting
+    again. Returns a SensorProbe.
+    """
+    start = time.monotonic()
+    collector.connect_timeout = max(deadline - start, 0.01)
+    result = collector.connect()
+    if result is not True:
+        collector.close()
+        return SensorProbe(None, None, result or "timed out", time.monotonic() - start)
+
+    # Don't let a single blocking receive run past the deadline
+    remaining = deadline - time.monotonic()
+    collector.socket.settimeout(max(min(remaining, 1.0), 0.01))
+    battery = collector.get_battery_status(timeout=max(remaining, 0.0))
+    collector.socket.settimeout(1.0)
+    if battery is not None:
+        #keep battery between 0 and 100%
+        battery = max(0, min(battery, 100))
+    return SensorProbe(collector, battery, None, time.monotonic() - start)
+
+
+def run_preflight(sensor_targets, shaker_controller=None, timeout=3.0, create_collector=None):
+    """Probe every sensor and the shaker at the same time, within one overall timeout.
+
+    sensor_targets are (sensor_id, address) pairs; create_collector(sensor_id,
+    address) makes each collector (a plain SensorDataCollector by default).
+    A sensor still connecting when the timeout runs out is reported as
+    failed. Returns a PreflightResult.
+    """
+    if create_collector is None:
+        create_collector = lambda sensor_id, address: SensorDataCollector(*parse_sensor_address(address))
+
+    start = time.monotonic()
+    deadline = start + timeout
+    collectors = {sensor_id: create_collector(sensor_id, address) for sensor_id, address in sensor_targets}
+
+    executor = ThreadPoolExecutor(max_workers=len(collectors) + 1)
+    futures = {sensor_id: executor.submit(probe_sensor, collector, deadline)
+               for sensor_id, collector in collectors.items()}
+    shaker = executor.submit(shaker_controller.get_battery_voltage) if shaker_controller else None
+    wait(list(futures.values()) + ([shaker] if shaker else []), timeout=timeout + 0.1)
+    executor.shutdown(wait=False)
+
+    sensors = {}
+    for sensor_id, future in futures.items():
+        if future.done() and not future.exception():
+            sensors[sensor_id] = future.result()
+        else:
+            collectors[sensor_id].close()
+            error = str(future.exception()) if future.done() else "timed out"
+            sensors[sensor_id] = SensorProbe(None, None, error, time.monotonic() - start)
+
+    shaker_voltage = shaker.result() if shaker and shaker.done() and not shaker.exception() else None
+    return PreflightResult(sensors, shaker_voltage, time.monotonic() - start)
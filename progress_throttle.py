@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class ProgressThrottle:
+    """Rate-limited progress channel that forwards only the latest state per key.
+
+    update() is cheap enough to call for every received chunk: it only
+    stores the state, and calls emit(key, *state) when at least 1/rate_hz
+    seconds have passed since that key was last emitted. States in between
+    are dropped, since only the newest one matters for a progress display.
+    flush() sends whatever is still pending, e.g. when a collection ends.
+    A rate_hz of 0 forwards every update.
+    """
+
+    def __init__(self, emit, rate_hz=10.0):
+        self.emit = emit
+        self.interval = 1.0 / rate_hz if rate_hz else 0.0
+        self._pending = {}
+        self._last_emit = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, *state):
+        """Record the latest state for key and forward it if it is due."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_emit.get(key, float('-inf')) < self.interval:
+                self._pending[key] = state
+                return
+            self._last_emit[key] = now
+            self._pending.pop(key, None)
+        self.emit(key, *state)
+
+    def flush(self, key=None):
+        """Forward the pending state of key (or of every key) right away."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._pending)
+            pending = [(k, self._pending.pop(k)) for k in keys if k in self._pending]
+            now = time.monotonic()
+            for k, _ in pending:
+                self._last_emit[k] = now
+        for k, state in pending:
+            self.emit(k, *state)
+
+    def discard(self, key=None):
+        """Forget the pending state of key (or of every key) without sending it."""
+        with self._lock:
+            if key is None:
+                self._pending.clear()
+            else:
+                self._pending.pop(key, None)
@@ -0,0 +1,82 @@
+class ReceiveBuffer:
+    """Reusable socket receive buffer that frames newline terminated lines on bytes.
+
+    Data is received with socket.recv_into straight into a preallocated
+    bytearray, so a receive allocates nothing. take_lines() hands out the
+    complete lines received so far as a single bytes object and keeps the
+    trailing partial line in place for the next receive. Binary frames are
+    read in place through pending() and consume().
+    """
+
+    def __init__(self, size=65536):
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # first byte not yet handed out
+        self._end = 0    # end of received data
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        """Discard everything received."""
+        self._start = self._end = 0
+
+    def writable(self):
+        """Return a memoryview of the free space at the end of the buffer.
+
+        Pass it to recv_into (or loop.sock_recv_into) and then call
+        commit() with the number of bytes received.
+        """
+        if self._end == len(self._buffer):
+            self._make_room()
+        return self._view[self._end:]
+
+    def commit(self, nbytes):
+        """Mark nbytes written into writable() as received."""
+        self._end += nbytes
+
+    def recv_from(self, sock):
+        """Receive from a socket into the buffer; returns the byte count (0 on EOF)."""
+        nbytes = sock.recv_into(self.writable())
+        self._end += nbytes
+        return nbytes
+
+    def pending(self):
+        """Return a memoryview of the data received but not yet consumed.
+
+        Release the view before the next receive so the buffer can be reused.
+        """
+        return self._view[self._start:self._end]
+
+    def consume(self, nbytes):
+        """Mark the first nbytes of pending() as handled."""
+        self._start += nbytes
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def take_lines(self):
+        """Return all complete lines received so far as bytes, or b'' if there are none."""
+        end = self._buffer.rfind(b'\n', self._start, self._end) + 1
+        if end <= self._start:
+            return b''
+
+        lines = bytes(self._view[self._start:end])
+        self._start = end
+        if self._start == self._end:
+            self._start = self._end = 0
+        return lines
+
+    def _make_room(self):
+        """Move the partial line (or frame) to the front, growing the buffer if it fills it."""
+        pending = self._end - self._start
+        if self._start == 0:
+            # A single line fills the whole buffer
+            buffer = bytearray(2 * len(self._buffer))
+            buffer[:pending] = self._view[:pending]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+            return
+
+        self._buffer[:pending] = self._buffer[self._start:self._end]
+        self._start = 0
+        self._end = pending
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+from utils import app_data_dir
+
+# One row per run and one per sensor capture. Indexes cover the usual
+# lookups (all runs of a VIN, the runs of a test ID, runs in a date range)
+# so they stay instant however many captures have been catalogued.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    test_id TEXT,
+    vin TEXT,
+    car_model TEXT,
+    year TEXT,
+    mileage TEXT,
+    trim TEXT,
+    soc TEXT,
+    file_prefix TEXT,
+    test_number INTEGER,
+    started_at TEXT,
+    finished_at TEXT,
+    status TEXT,
+    redo_of INTEGER REFERENCES runs(run_id),
+    base_filename TEXT,
+    save_path TEXT,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS captures (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    sensor_id INTEGER,
+    sensor_ip TEXT,
+    filename TEXT,
+    samples INTEGER,
+    battery REAL,
+    median_delta REAL,
+    outlier_count INTEGER,
+    max_outlier REAL,
+    max_delta REAL
+);
+CREATE INDEX IF NOT EXISTS runs_vin ON runs (vin, started_at);
+CREATE INDEX IF NOT EXISTS runs_test_id ON runs (test_id);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS captures_run_id ON captures (run_id);
+CREATE INDEX IF NOT EXISTS captures_filename ON captures (filename);
+"""
+
+# Config keys that get their own column in the runs table
+_RUN_FIELDS = ('test_id', 'vin', 'car_model', 'year', 'mileage', 'trim', 'soc', 'file_prefix', 'test_number')
+
+
+def default_catalog_path():
+    """Location of the run catalog in the per-user application data folder."""
+    return os.path.join(app_data_dir(), 'runs.sqlite')
+
+
+class RunCatalog:
+    """Local SQLite catalog of every data collection run and its capture files.
+
+    Run metadata used to live only in the long output filenames; the
+    catalog makes it queryable. Connections are opened per thread, so one
+    catalog can be shared by the worker and the UI.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_catalog_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.row_factory = sqlite3.Row
+            # Readers are not blocked while a run is being written
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def close(self):
+        """Close this thread's connection."""
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def record_run(self, config, started_at, finished_at, status, captures, base_filename=None):
+        """Add a finished run and its captures in one transaction; returns the run id.
+
+        captures is a list of dicts with the captures table's columns
+        (sensor_id, filename, samples, battery, timing stats, ...).
+        """
+        row = {field: config.get(field) for field in _RUN_FIELDS}
+        row.update(
+            started_at=started_at,
+            finished_at=finished_at,
+            status=status,
+            redo_of=config.get('redo_of'),
+            base_filename=base_filename,
+            save_path=config.get('save_path'),
+            config=json.dumps(config, default=str)
+        )
+
+        db = self._connect()
+        with db:
+            cursor = db.execute(
+                f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values())
+            )
+            run_id = cursor.lastrowid
+            for capture in captures:
+                capture = dict(capture, run_id=run_id)
+                db.execute(
+                    f"INSERT INTO captures ({', '.join(capture)}) VALUES ({', '.join('?' * len(capture))})",
+                    tuple(capture.values())
+                )
+        return run_id
+
+    def runs_for_vin(self, vin):
+        """All runs of a vehicle, newest first."""
+        return self._query("SELECT * FROM runs WHERE vin = ? ORDER BY started_at DESC", (vin,))
+
+    def runs_for_test(self, test_id):
+        """The runs (including redos) recorded under a test ID."""
+        return self._query("SELECT * FROM runs WHERE test_id = ? ORDER BY started_at", (test_id,))
+
+    def runs_between(self, start, end):
+        """Runs started in [start, end); both are ISO dates or timestamps."""
+        return self._query("SELECT * FROM runs WHERE started_at >= ? AND started_at < ? ORDER BY started_at",
+                           (start, end))
+
+    def captures_for_run(self, run_id):
+        """The capture files of a run, one row per sensor file."""
+        return self._query("SELECT * FROM captures WHERE run_id = ? ORDER BY sensor_id, filename", (run_id,))
+
+    def redo_history(self, run_id):
+        """The chain of runs that ended in run_id, oldest first, following redo_of."""
+        history = []
+        while run_id is not None:
+            rows = self._query("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+            if not rows:
+                break
+            history.append(rows[0])
+            run_id = rows[0]['redo_of']
+        return history[::-1]
+
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self._connect().execute(sql, params)]
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+# Fastest deflate level: captures still shrink about 3x, at around 60 MB/s per
+# core, so compressing is quicker than sending the raw bytes over most links
+COMPRESS_LEVEL = 1
+
+
+class ResumeMismatch(Exception):
+    """The archive being uploaded differs from the one an interrupted upload started with."""
+
+
+class _MultipartStream:
+    """Write-only, unseekable file object that uploads what is written as S3 multipart parts.
+
+    Parts are uploaded on a thread pool; at most `concurrency` parts are in
+    flight, so memory stays around (concurrency + 1) * part_size. Parts
+    listed in `completed` (part number -> ETag, from an interrupted upload)
+    are checked against the regenerated data instead of being uploaded again.
+    """
+
+    def __init__(self, s3, bucket, key, upload_id, part_size, concurrency, completed=None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.upload_id = upload_id
+        self.part_size = part_size
+        self.completed = completed or {}
+        self.parts = {}
+        self.resumed_parts = 0
+        self.bytes_uploaded = 0
+        self._buffer = bytearray()
+        self._position = 0
+        self._next_part = 1
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._futures = []
+        self._error = None
+
+    def write(self, data):
+        if self._error:
+            raise self._error
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        """Upload the last part, wait for every part; returns the sorted part list."""
+        if self._buffer or self._next_part == 1:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        self._executor.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+        return [{'PartNumber': number, 'ETag': etag} for number, etag in sorted(self.parts.items())]
+
+    def cancel(self):
+        """Stop uploading; parts already in flight are allowed to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit(self, data):
+        number = self._next_part
+        self._next_part += 1
+
+        if number in self.completed:
+            # Already uploaded by the interrupted attempt; make sure it is the same data
+            if '"%s"' % hashlib.md5(data).hexdigest() != self.completed[number]:
+                raise ResumeMismatch(f"Part {number} of {self.key} changed since the upload was interrupted")
+            self._part_done(number, self.completed[number], len(data), resumed=True)
+            return
+
+        self._slots.acquire()
+        self._futures.append(self._executor.submit(self._upload_part, number, data))
+
+    def _upload_part(self, number, data):
+        try:
+            response = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=data)
+            self._part_done(number, response['ETag'], len(data))
+        except Exception as e:
+            self._error = e
+            raise
+        finally:
+            self._slots.release()
+
+    def _part_done(self, number, etag, size, resumed=False):
+        with self._lock:
+            self.parts[number] = etag
+            self.bytes_uploaded += size
+            if resumed:
+                self.resumed_parts += 1
+
+
+def _write_files(zipf, paths, progress=None, block_size=1024 * 1024):
+    """Deflate the files into zipf (like ZipFile.write), reporting progress as they are read."""
+    total = sum(os.path.getsize(path) for path in paths)
+    done = 0
+    for path in paths:
+        # Entry timestamps come from the files, so an unchanged set of files
+        # always produces the same archive bytes (needed to resume)
+        zinfo = zipfile.ZipInfo.from_file(path, arcname=os.path.basename(path))
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo._compresslevel = COMPRESS_LEVEL  # what ZipFile.write(compresslevel=...) sets
+        with open(path, 'rb') as source, zipf.open(zinfo, 'w') as target:
+            for block in iter(lambda: source.read(block_size), b''):
+                target.write(block)
+                done += len(block)
+                if progress:
+                    progress(done, total)
+
+
+def find_interrupted_upload(s3, bucket, key):
+    """Return (upload_id, {part number: ETag}, part size) of an unfinished upload of key, or None."""
+    response = s3.list_multipart_uploads(Bucket=bucket, Prefix=key)
+    uploads = [upload for upload in response.get('Uploads', []) if upload['Key'] == key]
+    if not uploads:
+        return None
+    upload_id = max(uploads, key=lambda upload: upload['Initiated'])['UploadId']
+
+    parts = []
+    marker = 0
+    while True:
+        response = s3.list_parts(Bucket=bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+        parts.extend(response.get('Parts', []))
+        if not response.get('IsTruncated'):
+            break
+        marker = response['NextPartNumberMarker']
+
+    # Only the unbroken run of full-size parts from part 1 can be reused
+    completed = {}
+    part_size = parts[0]['Size'] if parts else None
+    for expected, part in enumerate(sorted(parts, key=lambda part: part['PartNumber']), start=1):
+        if part['PartNumber'] != expected or part['Size'] != part_size:
+            break
+        completed[expected] = part['ETag']
+    return upload_id, completed, part_size
+
+
+def abort_interrupted_uploads(s3, bucket, key):
+    """Abort every unfinished multipart upload of key, deleting its stored parts; returns how many."""
+    response = s3.list_multipart_uploads(Bucket=bucket, Prefix=key)
+    uploads = [upload for upload in response.get('Uploads', []) if upload['Key'] == key]
+    for upload in uploads:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload['UploadId'])
+    return len(uploads)
+
+
+def stream_zip_to_s3(s3, bucket, key, paths, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                     progress=None, resume=True):
+    """Zip `paths` straight into a multipart upload of bucket/key, without a local zip file.
+
+    An unfinished upload of the same key is resumed from its last
+    completed part (the archive is rebuilt identically from unchanged
+    files, and the parts already in S3 are checked against it). If the
+    files changed in the meantime the old upload is abandoned and the
+    archive is uploaded from scratch. On failure the multipart upload is
+    left open so the next call can resume it, except when one of the files
+    disappeared: the upload can never complete then, so it is aborted.
+
+    progress(bytes_read, total_bytes) reports how much of the files has
+    been read into the archive so far.
+    Returns a dict with the archive size, part count and resumed parts.
+    """
+    if part_size < MIN_PART_SIZE:
+        raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+
+    requested_part_size = part_size
+    interrupted = find_interrupted_upload(s3, bucket, key) if resume else None
+    if interrupted:
+        upload_id, completed, previous_part_size = interrupted
+        if previous_part_size and previous_part_size >= MIN_PART_SIZE:
+            # Keep the part size of the interrupted upload so its parts line up
+            part_size = previous_part_size
+        else:
+            # Only a short last part made it; it is uploaded again at the requested size
+            completed = {}
+    else:
+        upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+        completed = {}
+
+    stream = _MultipartStream(s3, bucket, key, upload_id, part_size, concurrency, completed)
+    try:
+        with zipfile.ZipFile(stream, 'w') as zipf:
+            _write_files(zipf, paths, progress)
+        parts = stream.finish()
+    except ResumeMismatch:
+        stream.cancel()
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        return stream_zip_to_s3(s3, bucket, key, paths, requested_part_size, concurrency, progress, resume=False)
+    except FileNotFoundError:
+        stream.cancel()
+        # Parts of an upload that is never completed stay stored (and billed) until aborted
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    except Exception:
+        stream.cancel()
+        raise
+
+    s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                 MultipartUpload={'Parts': parts})
+    return {
+        'bytes': stream.tell(),
+        'parts': len(parts),
+        'resumed_parts': stream.resumed_parts
+    }
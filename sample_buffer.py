@@ -0,0 +1,226 @@
+import tempfile
+import numpy as np
+from sample_parser import SAMPLE_FIELDS
+
+# Columns written to the output files, in order
+SAMPLE_COLUMNS = ("Time", "Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z", "Delta_Time")
+
+# Optional output column: host arrival time of each sample, in seconds from
+# the start of the collection
+ARRIVAL_COLUMN = "Arrival_Time"
+
+# Columns needed for timing analysis when the samples themselves are streamed to disk
+TIMING_COLUMNS = ("Time", "Delta_Time")
+
+
+def compute_deltas(times, last_time=None):
+    """Return the delta to the previous sample for each timestamp.
+
+    last_time is the timestamp preceding times[0]; without one the first
+    delta is 0.
+    """
+    deltas = np.empty(len(times))
+    if len(times):
+        deltas[0] = 0.0 if last_time is None else times[0] - last_time
+        np.subtract(times[1:], times[:-1], out=deltas[1:])
+    return deltas
+
+
+class SampleBuffer:
+    """Growable, chunked float64 column store for sensor samples.
+
+    Samples are kept in fixed-size chunks of shape (columns, chunk_size), so
+    appending never copies what is already stored and a capture costs
+    8 bytes per column per sample. Delta_Time is computed as samples arrive;
+    the first sample appended gets a Delta_Time of 0. A subset of
+    SAMPLE_COLUMNS can be kept, e.g. TIMING_COLUMNS when the full samples
+    are streamed to disk.
+
+    Host arrival times are not stored per sample: each append() records one
+    (first row, arrival time) pair in a side array, so the arrival time of
+    any sample can be looked up for 16 bytes per received chunk.
+
+    With a memory_budget (bytes), full chunks beyond the budget are spilled
+    oldest first to an append-only temporary file in spill_dir and read
+    back through numpy.memmap, so memory use stays flat however long the
+    capture runs. Reading (iter_chunks, iter_rows, column) works the same
+    either way.
+    """
+
+    def __init__(self, chunk_size=16384, columns=SAMPLE_COLUMNS, memory_budget=None, spill_dir=None):
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self._delta_index = self.columns.index("Delta_Time")
+        self._sample_fields = [(i, SAMPLE_COLUMNS.index(name)) for i, name in enumerate(self.columns)
+                               if SAMPLE_COLUMNS.index(name) < SAMPLE_FIELDS]
+        self._chunks = []       # in-memory arrays, or byte offsets into the spill file
+        self._fill = 0          # rows used in the last chunk
+        self._last_time = None  # sensor timestamp of the last sample, for Delta_Time
+        self._spill_file = None
+        self._spilled = 0       # leading chunks that live in the spill file
+
+        # Side array: first row and host arrival time (ns) of each appended block
+        self._arrival_rows = np.empty(256, dtype=np.int64)
+        self._arrival_ns = np.empty(256, dtype=np.int64)
+        self._arrival_count = 0
+
+    def __len__(self):
+        if not self._chunks:
+            return 0
+        return (len(self._chunks) - 1) * self.chunk_size + self._fill
+
+    @property
+    def nbytes(self):
+        """Memory held by the buffer in bytes (spilled chunks excluded)."""
+        return (sum(chunk.nbytes for chunk in self._chunks[self._spilled:])
+                + self._arrival_rows.nbytes + self._arrival_ns.nbytes)
+
+    @property
+    def spilled(self):
+        """Whether any samples have been spilled to disk."""
+        return self._spilled > 0
+
+    def close(self):
+        """Delete the spill file; the buffer must not be read afterwards."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def append(self, samples, arrival_ns):
+        """Append an (n, 7) block of samples received arrival_ns nanoseconds into the collection."""
+        count = len(samples)
+        if not count:
+            return
+
+        self._record_arrival(len(self), arrival_ns)
+        deltas = compute_deltas(samples[:, 0], self._last_time)
+        self._last_time = samples[-1, 0]
+
+        written = 0
+        while written < count:
+            if not self._chunks or self._fill == self.chunk_size:
+                self._spill_over_budget()
+                self._chunks.append(np.empty((len(self.columns), self.chunk_size)))
+                self._fill = 0
+
+            chunk = self._chunks[-1]
+            n = min(count - written, self.chunk_size - self._fill)
+            end = self._fill + n
+            for index, field in self._sample_fields:
+                chunk[index, self._fill:end] = samples[written:written + n, field]
+            chunk[self._delta_index, self._fill:end] = deltas[written:written + n]
+            self._fill = end
+            written += n
+
+    def _spill_over_budget(self):
+        """Spill the oldest in-memory chunks until a new chunk fits in the memory budget."""
+        if self.memory_budget is None:
+            return
+        chunk_bytes = len(self.columns) * self.chunk_size * 8
+        while self._spilled < len(self._chunks) and \
+                (len(self._chunks) - self._spilled + 1) * chunk_bytes > self.memory_budget:
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile(prefix="evident_spill_", dir=self.spill_dir)
+            offset = self._spill_file.seek(0, 2)
+            self._chunks[self._spilled].tofile(self._spill_file)
+            self._chunks[self._spilled] = offset
+            self._spilled += 1
+        if self._spill_file is not None:
+            self._spill_file.flush()
+
+    def _load_chunk(self, i):
+        """Return chunk i, memory-mapping it from the spill file if it was spilled."""
+        chunk = self._chunks[i]
+        if i >= self._spilled:
+            return chunk
+        return np.memmap(self._spill_file, dtype=np.float64, mode='r', offset=chunk,
+                         shape=(len(self.columns), self.chunk_size))
+
+    def _record_arrival(self, first_row, arrival_ns):
+        if self._arrival_count == len(self._arrival_rows):
+            self._arrival_rows = np.resize(self._arrival_rows, 2 * len(self._arrival_rows))
+            self._arrival_ns = np.resize(self._arrival_ns, 2 * len(self._arrival_ns))
+        self._arrival_rows[self._arrival_count] = first_row
+        self._arrival_ns[self._arrival_count] = arrival_ns
+        self._arrival_count += 1
+
+    def arrivals(self):
+        """Return (first_rows, arrival_ns) of every received block, oldest first."""
+        return (self._arrival_rows[:self._arrival_count].copy(),
+                self._arrival_ns[:self._arrival_count].copy())
+
+    def arrival_times(self, start=0, stop=None):
+        """Host arrival time in seconds of samples start..stop, one value per sample."""
+        stop = len(self) if stop is None else stop
+        rows = self._arrival_rows[:self._arrival_count]
+        blocks = np.searchsorted(rows, np.arange(start, stop), side='right') - 1
+        return self._arrival_ns[blocks] / 1e9
+
+    def iter_chunks(self):
+        """Yield (columns, n) views of the stored samples, oldest first."""
+        last = len(self._chunks) - 1
+        for i in range(len(self._chunks)):
+            end = self._fill if i == last else self.chunk_size
+            if end:
+                yield self._load_chunk(i)[:, :end]
+
+    def iter_rows(self, arrival_time=False):
+        """Yield row-major (n, 8) blocks of the output columns for writing.
+
+        With arrival_time, an Arrival_Time column is added as a ninth column.
+        """
+        rows_index = [self.columns.index(name) for name in SAMPLE_COLUMNS]
+        start = 0
+        for chunk in self.iter_chunks():
+            rows = chunk[rows_index].T
+            if arrival_time:
+                rows = np.column_stack((rows, self.arrival_times(start, start + len(rows))))
+            start += len(rows)
+            yield rows
+
+    def iter_column(self, name):
+        """Yield one column in 1-D blocks, oldest first, without joining them."""
+        index = self.columns.index(name)
+        for chunk in self.iter_chunks():
+            yield chunk[index]
+
+    def column(self, name):
+        """Return one column as a contiguous 1-D array."""
+        index = self.columns.index(name)
+        parts = [chunk[index] for chunk in self.iter_chunks()]
+        if not parts:
+            return np.empty(0)
+        return np.concatenate(parts)
+
+
+class CalibrationSummary:
+    """Running statistics of samples that are summarized instead of stored.
+
+    Used for the calibration period: only the sample count, the first and
+    last sensor timestamps and the mean of each IMU channel are kept.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.first_time = None
+        self.last_time = None
+        self._sums = np.zeros(SAMPLE_FIELDS - 1)
+
+    def add(self, samples):
+        """Fold an (n, 7) block of samples into the summary."""
+        if not len(samples):
+            return
+        if self.first_time is None:
+            self.first_time = samples[0, 0]
+        self.last_time = samples[-1, 0]
+        self.count += len(samples)
+        self._sums += samples[:, 1:].sum(axis=0)
+
+    @property
+    def mean(self):
+        """Mean accel x/y/z and gyro x/y/z, or None if nothing was added."""
+        if not self.count:
+            return None
+        return self._sums / self.count
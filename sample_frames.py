@@ -0,0 +1,125 @@
+import struct
+import numpy as np
+
+# Binary sensor protocol. Every frame is a 12 byte little-endian header
+#   magic (4s), kind (B), flags (B), payload length (H), sequence (I)
+# followed by the payload. Sample frames carry fixed-size records of a
+# float64 sensor timestamp and float32 accel x/y/z, gyro x/y/z; battery
+# frames carry a single float32 percentage. The sequence counter goes up
+# by one per frame so lost frames can be counted.
+FRAME_MAGIC = b"EVSB"
+FRAME_HEADER = struct.Struct('<4sBBHI')
+
+FRAME_SAMPLES = 1
+FRAME_BATTERY = 2
+
+SAMPLE_RECORD = np.dtype([('time', '<f8'), ('imu', '<f4', (6,))])
+MAX_FRAME_RECORDS = 0xFFFF // SAMPLE_RECORD.itemsize
+
+_SEQUENCE_MASK = 0xFFFFFFFF
+
+
+def encode_samples(samples, seq=0):
+    """Encode an (n, 7) sample array as sample frames.
+
+    Returns (frames, next_seq).
+    """
+    records = np.empty(len(samples), dtype=SAMPLE_RECORD)
+    records['time'] = samples[:, 0]
+    records['imu'] = samples[:, 1:]
+
+    frames = []
+    for start in range(0, len(records), MAX_FRAME_RECORDS):
+        payload = records[start:start + MAX_FRAME_RECORDS].tobytes()
+        frames.append(FRAME_HEADER.pack(FRAME_MAGIC, FRAME_SAMPLES, 0, len(payload), seq))
+        frames.append(payload)
+        seq = (seq + 1) & _SEQUENCE_MASK
+    return b"".join(frames), seq
+
+
+def encode_battery(percentage, seq=0):
+    """Encode a battery report frame; returns (frame, next_seq)."""
+    payload = struct.pack('<f', percentage)
+    frame = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_BATTERY, 0, len(payload), seq) + payload
+    return frame, (seq + 1) & _SEQUENCE_MASK
+
+
+class FrameDecoder:
+    """Decodes binary sensor frames straight out of a ReceiveBuffer.
+
+    Sample payloads are read with numpy.frombuffer on the receive buffer
+    itself; the only copy is the conversion to the (n, 7) float64 layout
+    the rest of the ingest path uses. A trailing partial frame stays in
+    the buffer for the next receive.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the stream state, e.g. after reconnecting."""
+        self.next_seq = None
+        self.frames_lost = 0
+        self.bytes_skipped = 0
+
+    def decode(self, receive_buffer):
+        """Decode every complete frame received so far.
+
+        Returns (samples, battery_values) where samples is an (n, 7)
+        float64 array and battery_values a list of reported percentages.
+        """
+        data = receive_buffer.pending()
+        offset = 0
+        records = []
+        battery_values = []
+
+        while len(data) - offset >= FRAME_HEADER.size:
+            magic, kind, _, length, seq = FRAME_HEADER.unpack_from(data, offset)
+            if magic != FRAME_MAGIC or (kind == FRAME_SAMPLES and length % SAMPLE_RECORD.itemsize):
+                # Not a frame start, or a sample frame no whole number of records long
+                offset = self._resync(data, offset)
+                continue
+
+            end = offset + FRAME_HEADER.size + length
+            if end > len(data):
+                break
+
+            self._track_sequence(seq)
+            payload = data[offset + FRAME_HEADER.size:end]
+            if kind == FRAME_SAMPLES:
+                records.append(np.frombuffer(payload, dtype=SAMPLE_RECORD))
+            elif kind == FRAME_BATTERY and length >= 4:
+                battery_values.append(struct.unpack_from('<f', payload)[0])
+            offset = end
+
+        # Copy out of the receive buffer before it is reused
+        samples = self._to_samples(records)
+        receive_buffer.consume(offset)
+        return samples, battery_values
+
+    def _resync(self, data, offset):
+        """Skip to the next frame magic after corrupt bytes; returns the new offset."""
+        found = bytes(data[offset + 1:]).find(FRAME_MAGIC)
+        if found < 0:
+            # Keep a tail that might be the start of the next magic
+            skip_to = max(offset + 1, len(data) - len(FRAME_MAGIC) + 1)
+        else:
+            skip_to = offset + 1 + found
+        self.bytes_skipped += skip_to - offset
+        return skip_to
+
+    def _track_sequence(self, seq):
+        if self.next_seq is not None and seq != self.next_seq:
+            self.frames_lost += (seq - self.next_seq) & _SEQUENCE_MASK
+        self.next_seq = (seq + 1) & _SEQUENCE_MASK
+
+    @staticmethod
+    def _to_samples(records):
+        """Convert decoded record arrays to one (n, 7) float64 array."""
+        samples = np.empty((sum(len(block) for block in records), 7))
+        row = 0
+        for block in records:
+            samples[row:row + len(block), 0] = block['time']
+            samples[row:row + len(block), 1:] = block['imu']
+            row += len(block)
+        return samples
@@ -0,0 +1,115 @@
+import numpy as np
+
+# Number of comma separated fields in a sensor sample line:
+# timestamp, accel x/y/z, gyro x/y/z
+SAMPLE_FIELDS = 7
+
+BATTERY_PREFIX = b"BATTERY:"
+
+_NEWLINE = ord('\n')
+_COMMA = ord(',')
+
+
+def parse_battery_line(line):
+    """Parse a 'BATTERY:nn%' line and return the percentage, or None."""
+    if isinstance(line, bytes):
+        line = line.decode(errors='replace')
+    try:
+        return float(line.strip().replace("BATTERY:", "").replace("%", ""))
+    except ValueError:
+        return None
+
+
+def parse_sample_line(line):
+    """Parse a single 'timestamp,ax,ay,az,gx,gy,gz' line into a list of floats.
+
+    Returns None if the line is not a valid sample line.
+    """
+    parts = line.split(b',') if isinstance(line, bytes) else line.split(',')
+    if len(parts) != SAMPLE_FIELDS:
+        return None
+    try:
+        return [float(part) for part in parts]
+    except ValueError:
+        return None
+
+
+def parse_sample_lines(block):
+    """Parse a block of complete lines one line at a time.
+
+    This is the original per-line parser, kept as the fallback path for
+    malformed blocks and for comparison in the benchmarks.
+
+    Returns (samples, leftovers) in the same form as parse_sample_block.
+    """
+    rows = []
+    leftovers = []
+    for line in block.split(b'\n'):
+        if not line.strip():
+            continue
+        row = parse_sample_line(line)
+        if row is not None:
+            rows.append(row)
+        elif line.count(b',') != SAMPLE_FIELDS - 1:
+            leftovers.append(line)
+
+    samples = np.array(rows, dtype=np.float64).reshape(-1, SAMPLE_FIELDS)
+    return samples, leftovers
+
+
+def parse_sample_block(block):
+    """Parse a block of complete newline terminated lines in one call.
+
+    The common case, a block made only of well formed sample lines, is
+    converted to an (n, 7) float64 array with a single numpy call. Blocks
+    containing other lines (battery reports, truncated lines) have those
+    lines split off first; only if the numeric conversion itself fails do
+    we drop to the per-line parser.
+
+    Returns (samples, leftovers) where samples is an (n, 7) float64 array
+    and leftovers is a list of non-sample lines (as bytes), e.g. BATTERY
+    lines, for the caller to handle individually.
+    """
+    if not block:
+        return np.empty((0, SAMPLE_FIELDS)), []
+
+    buf = np.frombuffer(block, dtype=np.uint8)
+    separators = np.flatnonzero((buf == _COMMA) | (buf == _NEWLINE))
+    line_count = len(separators) // SAMPLE_FIELDS
+
+    # Fast path: every line has exactly six commas followed by a newline
+    if (line_count and len(separators) == line_count * SAMPLE_FIELDS
+            and np.count_nonzero(buf[separators] == _NEWLINE) == line_count
+            and (buf[separators[SAMPLE_FIELDS - 1::SAMPLE_FIELDS]] == _NEWLINE).all()):
+        samples = _convert(block.replace(b'\n', b','), line_count)
+        if samples is not None:
+            return samples, []
+        return parse_sample_lines(block)
+
+    # Mixed block: split off anything that is not shaped like a sample line
+    sample_lines = []
+    leftovers = []
+    for line in block.split(b'\n'):
+        if line.count(b',') == SAMPLE_FIELDS - 1:
+            sample_lines.append(line)
+        elif line.strip():
+            leftovers.append(line)
+
+    if not sample_lines:
+        return np.empty((0, SAMPLE_FIELDS)), leftovers
+
+    samples = _convert(b','.join(sample_lines), len(sample_lines))
+    if samples is None:
+        samples, _ = parse_sample_lines(b'\n'.join(sample_lines))
+    return samples, leftovers
+
+
+def _convert(text, line_count):
+    """Convert comma separated numbers to an (n, 7) array, or None if malformed."""
+    try:
+        values = np.fromstring(text, dtype=np.float64, sep=',')
+    except ValueError:
+        return None
+    if values.size != line_count * SAMPLE_FIELDS:
+        return None
+    return values.reshape(line_count, SAMPLE_FIELDS)
@@ -1,22 +1,50 @@
 import socket
 import time
+import numpy as np
+from sample_parser import SAMPLE_FIELDS, BATTERY_PREFIX, parse_battery_line, parse_sample_block, parse_sample_lines
+from sample_frames import FRAME_MAGIC, FrameDecoder
+from sample_buffer import CalibrationSummary, SampleBuffer
+from receive_buffer import ReceiveBuffer
+
+def parse_sensor_address(address, default_port=8888):
+    """Split an 'ip' or 'ip:port' sensor address into (ip, port)."""
+    host, _, port = address.strip().rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address.strip(), default_port
 
 class SensorDataCollector:
     """Class for handling sensor data collection and processing."""
     
-    def __init__(self, sensor_ip, port=8888, buffer_size=65536):
+    def __init__(self, sensor_ip, port=8888, buffer_size=65536, bulk_parse=True, protocol='auto',
+                 connect_timeout=1.0):
         self.sensor_ip = sensor_ip
         self.port = port
+        self.connect_timeout = connect_timeout
         self.buffer_size = buffer_size
+        # Parse each received block with one numpy call instead of line by line
+        self.bulk_parse = bulk_parse
+        # 'auto' detects binary frames or text lines from the first bytes received
+        self.protocol = protocol
+        self.stream_protocol = None
         self.socket = None
+        self.stop_requested = False
+        # Reused for every receive; keeps any partial line between calls
+        self.receive_buffer = ReceiveBuffer(buffer_size)
+        self.frame_decoder = FrameDecoder()
+        # Optional StreamingTimingMonitor fed with the recorded timestamps;
+        # reports "timing_outlier" through the callback as soon as it fires
+        self.timing_monitor = None
     
     def connect(self):
         """Establish connection to the sensor."""
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-        self.socket.settimeout(1.0)
+        self.socket.settimeout(self.connect_timeout)
+        self.reset_stream()
         try:
             self.socket.connect((self.sensor_ip, self.port))
+            self.socket.settimeout(1.0)
             return True
         except Exception as e:
             # Return the exception message to provide better error reporting
@@ -28,35 +56,40 @@ class SensorDataCollector:
             self.socket.close()
             self.socket = None
     
+    def stop(self):
+        """Ask a running collection to finish early (safe from another thread)."""
+        self.stop_requested = True
+    
+    def reset_stream(self):
+        """Forget everything received on a previous connection."""
+        self.receive_buffer.clear()
+        self.frame_decoder.reset()
+        self.stream_protocol = None if self.protocol == 'auto' else self.protocol
+    
+    def detect_protocol(self):
+        """Return 'binary' or 'text' for the connection, or None until enough bytes are in."""
+        if self.stream_protocol is None:
+            head = bytes(self.receive_buffer.pending()[:len(FRAME_MAGIC)])
+            if len(head) < len(FRAME_MAGIC) and FRAME_MAGIC.startswith(head):
+                return None
+            self.stream_protocol = 'binary' if head == FRAME_MAGIC else 'text'
+        return self.stream_protocol
+    
     def get_battery_status(self, timeout=5):
         """Get battery status from the sensor."""
         if not self.socket:
             return None
             
-        data_fragment = ""
-        battery_percentage = None
-        start_time = time.time()
+        start_time = time.monotonic()
         
-        while time.time() - start_time < timeout:
+        while time.monotonic() - start_time < timeout:
             try:
-                data = self.socket.recv(self.buffer_size)
-                if not data:
+                if not self.receive_buffer.recv_from(self.socket):
                     break
                 
-                data_str = data_fragment + data.decode()
-                lines = data_str.split('\n')
-                data_fragment = lines[-1]
-                
-                for line in lines[:-1]:
-                    if not line.strip():
-                        continue
-                    
-                    if line.startswith("BATTERY:"):
-                        try:
-                            battery_value = float(line.replace("BATTERY:", "").replace("%", ""))
-                            return battery_value
-                        except:
-                            continue
+                battery_value = self.scan_battery()
+                if battery_value is not None:
+                    return battery_value
             except socket.timeout:
                 continue
             except Exception:
@@ -64,74 +97,142 @@ class SensorDataCollector:
                 
         return None
     
-    def collect_data(self, calibration_time, sample_time, callback=None):
-        """Collect data from sensor with calibration and sampling periods."""
+    def scan_battery(self):
+        """Look for a battery report in the data received so far; returns it or None."""
+        protocol = self.detect_protocol()
+        if protocol == 'binary':
+            _, battery_values = self.frame_decoder.decode(self.receive_buffer)
+            return battery_values[0] if battery_values else None
+        if protocol is None:
+            return None
+        
+        # Only split and decode blocks that contain a battery report
+        block = self.receive_buffer.take_lines()
+        if BATTERY_PREFIX not in block:
+            return None
+        
+        for line in block.split(b'\n'):
+            if line.startswith(BATTERY_PREFIX):
+                battery_value = parse_battery_line(line)
+                if battery_value is not None:
+                    return battery_value
+        return None
+    
+    def take_received(self):
+        """Decode the data received so far; returns (samples, battery_values)."""
+        protocol = self.detect_protocol()
+        if protocol == 'binary':
+            return self.frame_decoder.decode(self.receive_buffer)
+        
+        block = self.receive_buffer.take_lines() if protocol == 'text' else b''
+        if not block:
+            return np.empty((0, SAMPLE_FIELDS)), []
+        
+        samples, leftovers = self.parse_block(block)
+        battery_values = [parse_battery_line(line) for line in leftovers if line.startswith(BATTERY_PREFIX)]
+        return samples, [value for value in battery_values if value is not None]
+    
+    def collect_data(self, calibration_time, sample_time, callback=None, samples_buffer=None, sample_sink=None):
+        """Collect data from sensor with calibration and sampling periods.
+
+        Returns a SampleBuffer holding the samples received after the
+        calibration period, and the first battery percentage reported.
+        Samples received during calibration are only summarized in
+        calibration_summary; recording_start records where recording began.
+        If sample_sink is given, every (n, 7) block of samples received
+        after the calibration period is also passed to it as it arrives,
+        as sample_sink(samples, arrival_ns).
+        """
+        self.begin_collection(calibration_time, sample_time, callback, samples_buffer, sample_sink)
         if not self.socket:
-            return [], None
-            
-        raw_data = []
-        battery_percentage = None
-        data_fragment = ""
-        total_time = calibration_time + sample_time
-        start_time = time.time()
-        in_calibration = True
+            return self.end_collection()
         
-        while time.time() - start_time < total_time:
+        while not self.stop_requested and self.collection_time_left() > 0:
             try:
-                data = self.socket.recv(self.buffer_size)
-                if not data:
+                if not self.receive_buffer.recv_from(self.socket):
                     break
-                    
-                data_str = data_fragment + data.decode()
-                lines = data_str.split('\n')
-                data_fragment = lines[-1]
                 
-                for line in lines[:-1]:
-                    if not line.strip():
-                        continue
-                        
-                    if line.startswith("BATTERY:") and battery_percentage is None:
-                        try:
-                            battery_percentage = float(line.replace("BATTERY:", "").replace("%", ""))
-                        except:
-                            pass
-                        continue
-                        
-                    parts = line.split(',')
-                    if len(parts) == 7:
-                        try:
-                            client_elapsed = time.time() - start_time
-                            timestamp = float(parts[0])
-                            ax, ay, az = map(float, parts[1:4])
-                            gx, gy, gz = map(float, parts[4:7])
-                            raw_data.append((client_elapsed, [timestamp, ax, ay, az, gx, gy, gz]))
-                        except:
-                            continue
-                
-                elapsed = time.time() - start_time
-                
-                # Check for phase transition
-                if in_calibration and elapsed > calibration_time:
-                    in_calibration = False
-                    if callback:
-                        callback("phase_change")
-                
-                # Update progress
-                if callback:
-                    if in_calibration:
-                        progress = int((elapsed/calibration_time) * 100)
-                        callback("calibration_progress", progress, elapsed, calibration_time)
-                    else:
-                        effective_elapsed = elapsed - calibration_time
-                        progress = int((effective_elapsed/sample_time) * 100)
-                        callback("recording_progress", progress, effective_elapsed, sample_time)
+                self.process_received()
                         
             except socket.timeout:
                 continue
             except Exception:
                 break
         
-        # Filter data to only include samples after calibration period
-        filtered_data = [sample[1] for sample in raw_data if sample[0] >= calibration_time]
+        return self.end_collection()
+    
+    def begin_collection(self, calibration_time, sample_time, callback=None, samples_buffer=None, sample_sink=None):
+        """Start a collection run; data is then fed in with process_received().
+
+        collect_data drives this with blocking receives; the asyncio ingest
+        engine drives it from an event loop.
+        """
+        self.calibration_time = calibration_time
+        self.sample_time = sample_time
+        self.callback = callback
+        self.samples_buffer = samples_buffer if samples_buffer is not None else SampleBuffer()
+        self.sample_sink = sample_sink
+        self.battery_percentage = None
+        self.in_calibration = True
+        # Calibration samples are summarized, never stored
+        self.calibration_summary = CalibrationSummary()
+        # (host elapsed time, sensor timestamp) of the first recorded sample
+        self.recording_start = None
+        # Host times are monotonic so clock adjustments cannot move the phase boundary
+        self.start_ns = time.monotonic_ns()
+    
+    def elapsed(self):
+        """Seconds since the collection run started."""
+        return (time.monotonic_ns() - self.start_ns) / 1e9
+    
+    def collection_time_left(self):
+        """Seconds left in the current collection run."""
+        return self.calibration_time + self.sample_time - self.elapsed()
+    
+    def process_received(self):
+        """Decode the data in the receive buffer and report progress."""
+        samples, battery_values = self.take_received()
+        if len(samples):
+            # One host timestamp per received chunk
+            arrival_ns = time.monotonic_ns() - self.start_ns
+            if arrival_ns < self.calibration_time * 1e9:
+                self.calibration_summary.add(samples)
+            else:
+                if self.recording_start is None:
+                    self.recording_start = (arrival_ns / 1e9, float(samples[0, 0]))
+                self.samples_buffer.append(samples, arrival_ns)
+                if self.sample_sink is not None:
+                    self.sample_sink(samples, arrival_ns)
+                if self.timing_monitor is not None and self.timing_monitor.add(samples[:, 0]) and self.callback:
+                    self.callback("timing_outlier", self.timing_monitor.median_delta, self.timing_monitor.max_delta)
+        
+        if battery_values and self.battery_percentage is None:
+            self.battery_percentage = battery_values[0]
+        
+        elapsed = self.elapsed()
         
-        return filtered_data, battery_percentage
\ No newline at end of file
+        # Check for phase transition
+        if self.in_calibration and elapsed > self.calibration_time:
+            self.in_calibration = False
+            if self.callback:
+                self.callback("phase_change")
+        
+        # Update progress
+        if self.callback:
+            if self.in_calibration:
+                progress = int((elapsed/self.calibration_time) * 100)
+                self.callback("calibration_progress", progress, elapsed, self.calibration_time)
+            else:
+                effective_elapsed = elapsed - self.calibration_time
+                progress = int((effective_elapsed/self.sample_time) * 100)
+                self.callback("recording_progress", progress, effective_elapsed, self.sample_time)
+    
+    def end_collection(self):
+        """Finish the collection run; returns (samples_buffer, battery_percentage)."""
+        return self.samples_buffer, self.battery_percentage
+    
+    def parse_block(self, block):
+        """Parse a block of complete lines into (samples, leftover_lines)."""
+        if self.bulk_parse:
+            return parse_sample_block(block)
+        return parse_sample_lines(block)
@@ -1,3 +1,4 @@
+import html
 from PyQt5.QtWidgets import QHBoxLayout, QLabel, QLineEdit, QPushButton, QProgressBar, QComboBox
 from PyQt5.QtGui import QDoubleValidator
 
@@ -123,12 +124,17 @@ class ShakerPanel:
         self.refresh_battery_button = QPushButton("Refresh")
         self.refresh_battery_button.setMaximumWidth(100)
         
+        # Controller health from the background poller; per-endpoint stats in the tooltip
+        self.health_label = QLabel("Controller: checking...")
+        self.health_label.setStyleSheet("color: #757575; font-size: 12px;")
+        
         # Add widgets to battery layout
         self.battery_layout.addWidget(self.battery_label)
         self.battery_layout.addWidget(self.battery_icon)
         self.battery_layout.addWidget(self.battery_value)
         self.battery_layout.addWidget(self.refresh_battery_button)
         self.battery_layout.addStretch()
+        self.battery_layout.addWidget(self.health_label)
         
         # Frequency controls
         self.freq_layout = QHBoxLayout()
@@ -229,4 +235,17 @@ class ShakerPanel:
             self.battery_value.setStyleSheet("font-weight: bold; color: #ff9800;")
         else:
             self.battery_icon.setStyleSheet("font-size: 18px; color: #4caf50;")  # Green
-            self.battery_value.setStyleSheet("font-weight: bold; color: #4caf50;")
\ No newline at end of file
+            self.battery_value.setStyleSheet("font-weight: bold; color: #4caf50;")
+    
+    def update_health(self, status, endpoint_lines):
+        """Show the controller health and the per-endpoint latency/error summary"""
+        if status['reachable']:
+            self.health_label.setText("Controller: online")
+            self.health_label.setStyleSheet("color: #4caf50; font-size: 12px;")
+        else:
+            self.health_label.setText(f"Controller: not responding (retry in {status['next_check_in']:.0f}s)")
+            self.health_label.setStyleSheet("color: #f44336; font-size: 12px;")
+        tooltip = "\n".join(endpoint_lines) or "No requests yet"
+        if status['error']:
+            tooltip = f"Last error: {status['error']}\n\n{tooltip}"
+        self.health_label.setToolTip(f"<pre>{html.escape(tooltip)}</pre>")
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""Local TCP stand-in for an EVident IMU sensor.
+
+Speaks the sensor text protocol: a 'BATTERY:nn%' line on connect (and
+periodically after that) followed by 'timestamp,ax,ay,az,gx,gy,gz' lines
+at the configured sample rate. With protocol='binary' it sends the same
+stream as binary frames (see sample_frames.py) instead. Timing jitter,
+dropped samples and malformed lines can be injected to exercise the
+ingest path.
+
+Run standalone:  python sensor_simulator.py --port 8888 --rate 1000 [--binary]
+"""
+import argparse
+import socket
+import threading
+import time
+import numpy as np
+from sample_frames import encode_battery, encode_samples
+from sample_parser import BATTERY_PREFIX, parse_battery_line, parse_sample_block
+
+# Number of pregenerated sample payloads cycled through when sending
+_PAYLOAD_POOL = 4096
+
+
+class SimulatedSensor:
+    """TCP server that streams synthetic IMU samples to every client that connects."""
+
+    def __init__(self, host='127.0.0.1', port=8888, rate_hz=1000.0, jitter=0.0,
+                 dropout_rate=0.0, malformed_rate=0.0, battery=87.0,
+                 battery_interval=10.0, max_backlog=0.5, seed=None, protocol='text'):
+        self.host = host
+        self.port = port
+        self.rate_hz = rate_hz
+        self.jitter = jitter                  # std dev of timestamp noise, seconds
+        self.dropout_rate = dropout_rate      # probability that a sample is never sent
+        self.malformed_rate = malformed_rate  # probability that a line is truncated
+        self.battery = battery
+        self.battery_interval = battery_interval
+        self.max_backlog = max_backlog        # seconds of samples kept when the client falls behind
+        self.protocol = protocol              # 'text' or 'binary'
+        self.rng = np.random.default_rng(seed)
+
+        self.samples_sent = 0
+        self.samples_dropped = 0
+        self.malformed_sent = 0
+
+        self._server = None
+        self._stop = threading.Event()
+        self._threads = []
+        self._payloads = self._make_payloads()
+
+    def start(self):
+        """Start listening; returns the bound port (useful with port=0)."""
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen()
+        self._server.settimeout(0.2)
+        self.port = self._server.getsockname()[1]
+
+        thread = threading.Thread(target=self._accept_loop, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self.port
+
+    def stop(self):
+        """Stop serving and close all connections."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        if self._server:
+            self._server.close()
+            self._server = None
+
+    def _make_payloads(self):
+        accel = self.rng.normal(0.0, 0.2, (_PAYLOAD_POOL, 3)) + (0.0, 0.0, 9.81)
+        gyro = self.rng.normal(0.0, 0.01, (_PAYLOAD_POOL, 3))
+        # Binary frames carry the same values the text lines print
+        self._imu = np.hstack((np.round(accel, 4), np.round(gyro, 5)))
+        return [
+            f",{a[0]:.4f},{a[1]:.4f},{a[2]:.4f},{g[0]:.5f},{g[1]:.5f},{g[2]:.5f}\n"
+            for a, g in zip(accel, gyro)
+        ]
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            thread = threading.Thread(target=self._serve_client, args=(conn,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def make_lines(self, first_index, count):
+        """Return (text, dropped, malformed) for samples first_index .. first_index + count."""
+        indices, timestamps, keep, malformed = self._draw_samples(first_index, count)
+
+        payloads = self._payloads
+        lines = []
+        for index, timestamp, send, broken in zip(indices.tolist(), timestamps.tolist(),
+                                                   keep.tolist(), malformed.tolist()):
+            if not send:
+                continue
+            line = f"{timestamp:.6f}" + payloads[index % _PAYLOAD_POOL]
+            if broken:
+                line = line[:len(line) // 2] + "\n"
+            lines.append(line)
+
+        dropped = count - int(keep.sum())
+        return "".join(lines).encode(), dropped, int((malformed & keep).sum())
+
+    def make_frames(self, first_index, count, seq):
+        """Binary counterpart of make_lines; returns (frames, dropped, malformed, next_seq).
+
+        A malformed sample is replaced by a run of junk bytes the receiver
+        has to resynchronize over.
+        """
+        indices, timestamps, keep, malformed = self._draw_samples(first_index, count)
+        send = keep & ~malformed
+        samples = np.empty((int(send.sum()), 7))
+        samples[:, 0] = timestamps[send]
+        samples[:, 1:] = self._imu[indices[send] % _PAYLOAD_POOL]
+
+        frames, seq = encode_samples(samples, seq)
+        broken = int((malformed & keep).sum())
+        if broken:
+            frames = bytes(8 * broken) + frames
+        return frames, count - int(keep.sum()), broken, seq
+
+    def _draw_samples(self, first_index, count):
+        """Sample indices, timestamps and the dropped/malformed masks for a batch."""
+        indices = np.arange(first_index, first_index + count)
+        timestamps = indices / self.rate_hz
+        if self.jitter:
+            timestamps = timestamps + self.rng.normal(0.0, self.jitter, count)
+
+        keep = np.ones(count, dtype=bool)
+        if self.dropout_rate:
+            keep = self.rng.random(count) >= self.dropout_rate
+        malformed = np.zeros(count, dtype=bool)
+        if self.malformed_rate:
+            malformed = self.rng.random(count) < self.malformed_rate
+        return indices, timestamps, keep, malformed
+
+    def _serve_client(self, conn):
+        """Send samples to one client, paced by the wall clock."""
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        seq = 0
+        try:
+            seq = self._send_battery(conn, seq)
+            start = time.monotonic()
+            last_battery = start
+            next_index = 0
+
+            while not self._stop.is_set():
+                now = time.monotonic()
+                due = int((now - start) * self.rate_hz)
+
+                # A real sensor only buffers so much; if the client is too slow
+                # the oldest samples are lost
+                backlog_limit = int(self.max_backlog * self.rate_hz)
+                if due - next_index > backlog_limit:
+                    skipped = due - next_index - backlog_limit
+                    self.samples_dropped += skipped
+                    next_index += skipped
+
+                if due > next_index:
+                    if self.protocol == 'binary':
+                        data, dropped, malformed, seq = self.make_frames(next_index, due - next_index, seq)
+                    else:
+                        data, dropped, malformed = self.make_lines(next_index, due - next_index)
+                    conn.sendall(data)
+                    self.samples_sent += due - next_index - dropped
+                    self.samples_dropped += dropped
+                    self.malformed_sent += malformed
+                    next_index = due
+
+                if self.battery_interval and now - last_battery >= self.battery_interval:
+                    seq = self._send_battery(conn, seq)
+                    last_battery = now
+
+                time.sleep(0.005)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _send_battery(self, conn, seq):
+        if self.protocol == 'binary':
+            frame, seq = encode_battery(self.battery, seq)
+            conn.sendall(frame)
+        else:
+            conn.sendall(f"BATTERY:{self.battery:.0f}%\n".encode())
+        return seq
+
+
+def text_to_frames(text, seq=0):
+    """Convert a recorded text protocol stream to the equivalent binary frames.
+
+    Sample lines become sample frames and BATTERY lines battery frames, in
+    their original order; malformed lines are dropped. Returns (frames, next_seq).
+    """
+    frames = []
+    pending = []
+    for line in text.splitlines(keepends=True):
+        if line.startswith(BATTERY_PREFIX):
+            if pending:
+                samples, _ = parse_sample_block(b"".join(pending))
+                data, seq = encode_samples(samples, seq)
+                frames.append(data)
+                pending = []
+            battery = parse_battery_line(line)
+            if battery is not None:
+                data, seq = encode_battery(battery, seq)
+                frames.append(data)
+        else:
+            pending.append(line)
+    if pending:
+        samples, _ = parse_sample_block(b"".join(pending))
+        data, seq = encode_samples(samples, seq)
+        frames.append(data)
+    return b"".join(frames), seq
+
+
+def run_simulator(port, rate_hz, ready=None, stop=None, **options):
+    """Run a SimulatedSensor until `stop` (a multiprocessing Event) is set.
+
+    Used by the benchmarks to run each simulated sensor in its own process.
+    """
+    sensor = SimulatedSensor(port=port, rate_hz=rate_hz, **options)
+    sensor.start()
+    if ready is not None:
+        ready.set()
+    try:
+        while stop is None or not stop.is_set():
+            time.sleep(0.1)
+    finally:
+        sensor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated EVident IMU sensor")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--rate', type=float, default=1000.0, help="samples per second")
+    parser.add_argument('--jitter', type=float, default=0.0, help="timestamp noise std dev (s)")
+    parser.add_argument('--dropout', type=float, default=0.0, help="probability a sample is dropped")
+    parser.add_argument('--malformed', type=float, default=0.0, help="probability a line is truncated")
+    parser.add_argument('--battery', type=float, default=87.0, help="reported battery percentage")
+    parser.add_argument('--binary', action='store_true', help="send binary frames instead of text")
+    args = parser.parse_args()
+
+    sensor = SimulatedSensor(args.host, args.port, args.rate, args.jitter,
+                             args.dropout, args.malformed, args.battery,
+                             protocol='binary' if args.binary else 'text')
+    sensor.start()
+    print(f"Simulated sensor on {args.host}:{sensor.port} at {args.rate:g} Hz, "
+          f"{sensor.protocol} protocol (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sensor.stop()
+
+
+if __name__ == '__main__':
+    main()
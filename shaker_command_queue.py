@@ -0,0 +1,120 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# Commands that supersede each other while waiting: the newest setpoint wins
+COALESCE_KEYS = {
+    'set_frequency': 'move',
+    'stop': 'move',
+    'lower': 'lower',
+    'get_battery_voltage': 'voltage',
+    'ping': 'ping'
+}
+
+
+class ShakerCommandQueue(QObject):
+    """Sends ShakerController commands from a background thread, one at a time.
+
+    submit() never blocks: it queues a controller method call and returns
+    a concurrent.futures.Future for its result. An optional callback is
+    called on the GUI thread as callback(result, error) when the command
+    has run, error being the controller's last_error (None on success).
+
+    Commands still waiting are coalesced. A command with the same
+    coalescing key as a waiting one (e.g. a new frequency while the last
+    frequency change has not been sent, or a lower release before the
+    press went out) takes its place; the replaced command's future is
+    cancelled and its callbacks are not called. An identical waiting
+    command is shared instead, so both callers get its result.
+    """
+
+    # Define signals
+    command_finished = pyqtSignal(str, object, object)  # command name, result, error
+    _deliver = pyqtSignal(object, object, object)        # callback, result, error
+
+    def __init__(self, controller):
+        super().__init__()
+        self.controller = controller
+        self._jobs = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._deliver.connect(self._call_back)
+
+    def start(self):
+        """Start the command thread."""
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Cancel waiting commands and stop the command thread."""
+        with self._condition:
+            self._stopping = True
+            while self._jobs:
+                self._jobs.popleft()['future'].cancel()
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, name, *args, callback=None):
+        """Queue controller.<name>(*args); returns a Future for its result."""
+        key = COALESCE_KEYS.get(name)
+        with self._condition:
+            for job in self._jobs:
+                if key is None or job['key'] != key:
+                    continue
+                if job['name'] == name and job['args'] == args:
+                    # The same command is already waiting; share its result
+                    if callback:
+                        job['callbacks'].append(callback)
+                    return job['future']
+                # A newer setpoint replaces the waiting one, keeping its place in line
+                job['future'].cancel()
+                job.update(name=name, args=args, future=Future(), callbacks=[callback] if callback else [])
+                return job['future']
+
+            job = {
+                'name': name,
+                'args': args,
+                'key': key,
+                'future': Future(),
+                'callbacks': [callback] if callback else []
+            }
+            self._jobs.append(job)
+            self._condition.notify()
+            return job['future']
+
+    def pending(self):
+        """Names of the commands waiting to be sent, oldest first."""
+        with self._condition:
+            return [job['name'] for job in self._jobs]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                job = self._jobs.popleft()
+            if not job['future'].set_running_or_notify_cancel():
+                continue
+
+            try:
+                result = getattr(self.controller, job['name'])(*job['args'])
+                error = self.controller.last_error
+                job['future'].set_result(result)
+            except Exception as e:
+                result, error = None, str(e)
+                job['future'].set_exception(e)
+
+            self.command_finished.emit(job['name'], result, error)
+            for callback in job['callbacks']:
+                self._deliver.emit(callback, result, error)
+
+    def _call_back(self, callback, result, error):
+        callback(result, error)
@@ -1,85 +1,122 @@
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(pool_size=2):
+    """HTTP session for the shaker controller: keep-alive connections, one retry if connecting fails."""
+    session = requests.Session()
+    # Only retry when the request was never sent, since most commands move the shaker
+    retry = Retry(total=1, connect=1, read=0, status=0, other=0, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 class ShakerController:
-    """Class to handle communication with the shaker controller."""
-    
-    def __init__(self, base_url="http://10.1.10.195"):
+    """Class to handle communication with the shaker controller.
+
+    Requests go through one pooled keep-alive session, so repeated commands
+    reuse the connection instead of opening a new one each time. The
+    methods block until the controller answers; use ShakerCommandQueue to
+    send commands from the GUI thread. last_error describes why the last
+    command failed (None if it succeeded). With a ShakerMetrics, the
+    latency and outcome of every request is recorded per endpoint.
+    """
+
+    def __init__(self, base_url="http://10.1.10.195", session=None, metrics=None):
         self.base_url = base_url
-    
-    # TODO: Add a function to check if the shaker is connected (ping)
-    def ping(self):
-        """Ping the shaker controller."""
+        self.session = session or create_session()
+        self.metrics = metrics
+        self.last_error = None
+
+    def request(self, path, timeout=2):
+        """GET base_url + path; returns the response, or None if the controller could not be reached."""
+        return self._get(f"{self.base_url}{path}", path.split('?')[0], timeout)
+
+    def _get(self, url, endpoint, timeout, ok_status=200):
+        start = time.monotonic()
         try:
-            response = requests.get(f"{self.base_url}", timeout=2)
-            return response.status_code == 404
+            response = self.session.get(url, timeout=timeout)
         except Exception as e:
-            return False
-    
+            if isinstance(e, requests.Timeout):
+                kind = 'timeout'
+            elif isinstance(e, requests.ConnectionError):
+                kind = 'connection'
+            else:
+                kind = 'other'
+            self.last_error = str(e)
+            self._record(endpoint, start, kind)
+            return None
+        if response.status_code == ok_status:
+            self.last_error = None
+            self._record(endpoint, start)
+        else:
+            self.last_error = f"status code {response.status_code}"
+            self._record(endpoint, start, f"http_{response.status_code}")
+        return response
+
+    def _record(self, endpoint, start, error_kind=None):
+        if self.metrics is not None:
+            self.metrics.record(endpoint, time.monotonic() - start, error_kind, self.last_error if error_kind else None)
+
+    def command(self, path, timeout=2):
+        """Send a command; True if the controller answered 200."""
+        response = self.request(path, timeout)
+        return response is not None and response.status_code == 200
+
+    # TODO: Add a function to check if the shaker is connected (ping)
+    def ping(self, base_url=None):
+        """Ping the shaker controller (or the controller at base_url)."""
+        # The controller has no page at '/', so a 404 means it is up
+        response = self._get(base_url or self.base_url, '/', timeout=2, ok_status=404)
+        return response is not None and response.status_code == 404
+
     def set_frequency(self, frequency):
         """Set the shaker frequency."""
-        try:
-            response = requests.get(f"{self.base_url}/move?value={frequency}", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
-    
+        return self.command(f"/move?value={frequency}")
+
     def stop(self):
         """Stop the shaker."""
-        try:
-            response = requests.get(f"{self.base_url}/move?value=0", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
-    
+        return self.command("/move?value=0")
+
     def home(self):
         """Return the shaker to home position."""
-        try:
-            response = requests.get(f"{self.base_url}/reset", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
-    
+        return self.command("/reset")
+
     def calibrate(self):
         """Calibrate the shaker."""
-        try:
-            # Use a longer timeout for calibration (10 seconds)
-            response = requests.get(f"{self.base_url}/calibrate", timeout=10)
-            return response.status_code == 200
-        except Exception as e:
-            return False
-    
+        # Use a longer timeout for calibration (10 seconds)
+        return self.command("/calibrate", timeout=10)
+
     def set_home(self):
         """Set the current position as home."""
-        try:
-            response = requests.get(f"{self.base_url}/set_home", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
-    
+        return self.command("/set_home")
+
     def auto_raise(self):
         """Start the auto raise function."""
-        try:
-            response = requests.get(f"{self.base_url}/start", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
-    
+        return self.command("/start")
+
     def lower(self, active=True):
         """Activate or deactivate the lower function."""
-        try:
-            value = "true" if active else "false"
-            response = requests.get(f"{self.base_url}/lower?value={value}", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
-    
+        value = "true" if active else "false"
+        return self.command(f"/lower?value={value}")
+
     def get_battery_voltage(self):
         """Get the battery voltage of the shaker controller."""
+        response = self.request("/voltage")
+        if response is None or response.status_code != 200:
+            return None
         try:
-            response = requests.get(f"{self.base_url}/voltage", timeout=2)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("voltage")
+            return response.json().get("voltage")
+        except Exception as e:
+            self.last_error = f"invalid voltage response: {str(e)}"
+            if self.metrics is not None:
+                self.metrics.record_error("/voltage", 'invalid_response', self.last_error)
             return None
-        except:
-            return None 
\ No newline at end of file
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
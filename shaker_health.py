@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class ShakerHealthPoller(QObject):
+    """Checks the shaker controller in the background by reading its battery voltage.
+
+    Reads go through the ShakerCommandQueue, so they wait their turn behind
+    user commands and are shared with a manual refresh that is already
+    waiting. While the controller answers it is polled every `interval`
+    seconds; after a failure the wait starts at retry_delay and doubles up
+    to max_delay, so an unreachable controller is not hammered. poke()
+    checks right away (e.g. after the controller address changed).
+
+    Every check emits health_changed with a status dict and, with a
+    dump_path, writes the metrics and that status there as JSON; a failed
+    write is reported with the error signal.
+    """
+
+    # Define signals
+    health_changed = pyqtSignal(object)   # status dict, see check()
+    error = pyqtSignal(str)
+
+    def __init__(self, commands, metrics=None, interval=30.0, retry_delay=5.0, max_delay=300.0,
+                 first_delay=1.0, dump_path=None, answer_timeout=15.0):
+        super().__init__()
+        self.commands = commands
+        self.metrics = metrics
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.first_delay = first_delay
+        self.dump_path = dump_path
+        self.answer_timeout = answer_timeout
+        self.status = None
+        self.consecutive_failures = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start polling; the first check runs after first_delay seconds."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop polling and write a last dump."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.dump()
+
+    def poke(self):
+        """Check the controller now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def next_delay(self):
+        """Seconds until the next check, given how many checks in a row have failed."""
+        if not self.consecutive_failures:
+            return self.interval
+        delay = min(self.retry_delay * 2 ** (self.consecutive_failures - 1), self.max_delay)
+        return delay * random.uniform(0.9, 1.1)
+
+    def check(self):
+        """Read the battery voltage once and return the resulting status.
+
+        The status has 'reachable', 'voltage', 'error', 'consecutive_failures',
+        'checked_at' and 'next_check_in' (seconds).
+        """
+        start = time.monotonic()
+        try:
+            voltage = self.commands.submit('get_battery_voltage').result(timeout=self.answer_timeout)
+            error = None if voltage is not None else self._last_error() or "no voltage in the answer"
+        except Exception as e:
+            voltage, error = None, str(e) or type(e).__name__
+
+        self.consecutive_failures = 0 if voltage is not None else self.consecutive_failures + 1
+        self.status = {
+            'reachable': voltage is not None,
+            'voltage': voltage,
+            'error': error,
+            'consecutive_failures': self.consecutive_failures,
+            'checked_at': time.time(),
+            'check_seconds': time.monotonic() - start,
+            'next_check_in': self.next_delay()
+        }
+        return self.status
+
+    def dump(self):
+        """Write the metrics and last status to dump_path, if set."""
+        if not self.dump_path or self.metrics is None:
+            return
+        try:
+            self.metrics.dump(self.dump_path, {'health': self.status})
+        except OSError as e:
+            self.error.emit(f"Error writing shaker metrics: {str(e)}")
+
+    def _last_error(self):
+        return self.metrics.last_error('/voltage') if self.metrics is not None else None
+
+    def _run(self):
+        delay = self.first_delay
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            status = self.check()
+            self.health_changed.emit(dict(status))
+            self.dump()
+            delay = status['next_check_in']
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency buckets in milliseconds; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Request latencies counted in fixed buckets, cheap enough to keep for every request."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        """Count one request that took `ms` milliseconds."""
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100), capped at the slowest request."""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bounds[i], self.max_ms) if i < len(self.bounds) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            'bucket_upper_bounds_ms': list(self.bounds) + [None],
+            'counts': list(self.counts),
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else None,
+            'max_ms': self.max_ms if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99)
+        }
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.error_kinds = {}
+        self.last_error = None
+        self.last_error_at = None
+        self.last_ok_at = None
+
+
+class ShakerMetrics:
+    """Per-endpoint latency histograms and error counters for the shaker controller.
+
+    ShakerController.record()s every request here, successful or not, with
+    the time it took; failures are counted by kind ('timeout',
+    'connection', 'http_500', ...). Thread-safe. snapshot() returns
+    everything as plain JSON-compatible data and dump() writes it to a file.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error_kind=None, error=None):
+        """Record a request to endpoint (e.g. '/move') that took `seconds`; error_kind None means it succeeded."""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.latency.add(seconds * 1000.0)
+            self._count(stats, error_kind, error)
+
+    def record_error(self, endpoint, error_kind, error=None):
+        """Count a failure found after the request completed (e.g. an unreadable response)."""
+        with self._lock:
+            self._count(self._endpoint(endpoint), error_kind, error)
+
+    def last_error(self, endpoint):
+        """The last error seen on endpoint, or None."""
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            return stats.last_error if stats else None
+
+    def snapshot(self):
+        """All counters and histograms as a JSON-compatible dict."""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    'requests': stats.latency.count,
+                    'errors': stats.errors,
+                    'error_kinds': dict(stats.error_kinds),
+                    'last_error': stats.last_error,
+                    'last_error_at': stats.last_error_at,
+                    'last_ok_at': stats.last_ok_at,
+                    'latency': stats.latency.to_dict()
+                }
+                for endpoint, stats in sorted(self._endpoints.items())
+            }
+        return {'started_at': self.started_at, 'generated_at': time.time(), 'endpoints': endpoints}
+
+    def summary_lines(self):
+        """One human-readable line per endpoint: requests, errors and latency percentiles."""
+        lines = []
+        for endpoint, stats in self.snapshot()['endpoints'].items():
+            latency = stats['latency']
+            lines.append(f"{endpoint:<12} {stats['requests']:>5} req {stats['errors']:>4} err  "
+                         f"p50 {_format_ms(latency['p50_ms'])}  p95 {_format_ms(latency['p95_ms'])}  "
+                         f"max {_format_ms(latency['max_ms'])}")
+        return lines
+
+    def dump(self, filename, extra=None):
+        """Write snapshot() (plus any `extra` entries) to filename as JSON, atomically."""
+        data = self.snapshot()
+        data.update(extra or {})
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, 'w') as file:
+            json.dump(data, file, indent=1, default=str)
+        os.replace(temp_filename, filename)
+
+    def _endpoint(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = _EndpointStats()
+        return stats
+
+    def _count(self, stats, error_kind, error):
+        now = time.time()
+        if error_kind is None:
+            stats.last_ok_at = now
+            return
+        stats.errors += 1
+        stats.error_kinds[error_kind] = stats.error_kinds.get(error_kind, 0) + 1
+        stats.last_error = error or error_kind
+        stats.last_error_at = now
+
+
+def _format_ms(ms):
+    return "   -  " if ms is None else f"{ms:>4.0f}ms"
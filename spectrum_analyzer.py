@@ -0,0 +1,253 @@
+import json
+import os
+import queue
+import threading
+from collections import deque
+import numpy as np
+from capture_writer import METADATA_KEY
+from sample_buffer import SAMPLE_COLUMNS
+
+# Accelerometer columns of a received (n, 7) sample block
+ACCEL_COLUMNS = (1, 2, 3)
+DEFAULT_SEGMENT_SECONDS = 2.0   # 0.5 Hz bins; find_peak interpolates between them
+DEFAULT_HOP_SECONDS = 0.25      # a new segment, and a live update, four times a second
+DEFAULT_WINDOW_SECONDS = 8.0    # the live spectrum averages the segments of the last 8 s
+DEFAULT_LIVE_MAX_FREQUENCY = 50.0
+# Peaks are looked for this close to the commanded shaker frequency
+PEAK_SEARCH_HZ = 2.0
+# Timestamps collected to estimate the sample rate before segments can be cut
+RATE_ESTIMATE_SAMPLES = 64
+RATE_ESTIMATE_SECONDS = 0.25
+
+
+def hann_window(length):
+    """Periodic Hann window, as used by scipy.signal.welch."""
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length) / length)
+
+
+def estimate_sample_rate(times):
+    """Sample rate of a run of sensor timestamps, or None until there are enough of them.
+
+    Uses the median interval, which ignores dropped samples; when the
+    timestamps are coarser than the interval (so most intervals are 0),
+    the average rate over the whole run instead.
+    """
+    if len(times) < RATE_ESTIMATE_SAMPLES or times[-1] - times[0] < RATE_ESTIMATE_SECONDS:
+        return None
+    median = np.median(np.diff(times))
+    if median > 0:
+        return 1.0 / median
+    return (len(times) - 1) / (times[-1] - times[0])
+
+
+def segment_psd(segments, window, sample_rate):
+    """One-sided power spectral density of each segment.
+
+    segments is (n_segments, channels, segment_length); each segment has
+    its mean removed and the window applied. Returns (n_segments, channels,
+    n_frequencies), scaled like scipy.signal.welch(scaling='density').
+    """
+    segments = segments - segments.mean(axis=-1, keepdims=True)
+    spectrum = np.fft.rfft(segments * window, axis=-1)
+    psd = (spectrum.real ** 2 + spectrum.imag ** 2) / (sample_rate * np.sum(window ** 2))
+    # Fold the negative frequencies in; DC (and Nyquist for even lengths) have none
+    last = -1 if window.size % 2 == 0 else None
+    psd[..., 1:last] *= 2
+    return psd
+
+
+def find_peak(frequencies, level, near=None, search_hz=PEAK_SEARCH_HZ):
+    """Frequency of the highest peak within search_hz of `near` (anywhere above 1 Hz without it), or None.
+
+    level is the spectrum in dB. The peak is placed between bins with a
+    parabola through the highest bin and its neighbours, so a shaker tone
+    is found to a small fraction of the bin spacing and adjacent shaker
+    settings (0.33 RPS apart) are told apart with 0.5 Hz bins.
+    """
+    if near:
+        band = np.flatnonzero(np.abs(frequencies - near) <= search_hz)
+    else:
+        band = np.flatnonzero(frequencies >= 1.0)
+    if not len(band):
+        return None
+    index = band[np.argmax(level[band])]
+    peak = float(frequencies[index])
+    if 0 < index < len(level) - 1:
+        before, at, after = level[index - 1], level[index], level[index + 1]
+        curvature = before - 2 * at + after
+        if curvature < 0:
+            offset = np.clip(0.5 * (before - after) / curvature, -0.5, 0.5)
+            peak += float(offset * (frequencies[1] - frequencies[0]))
+    return peak
+
+
+def spectrum_level(psd):
+    """(n_frequencies, channels) PSD summed over the channels, in dB."""
+    return 10 * np.log10(np.maximum(psd.sum(axis=1), 1e-20))
+
+
+class SpectrumAnalyzer:
+    """Background stage computing an incremental Welch spectrum of the accelerometer channels.
+
+    Recorded sample blocks are handed over with write() (a sample_sink, like
+    CaptureWriter.write). A worker thread cuts them into Hann-windowed
+    segments of segment_seconds, hop_seconds apart, and computes each
+    segment's PSD once, all segments of a batch in one vectorized FFT.
+    Every batch updates two averages: the live spectrum over the last
+    window_seconds (up to live_max_frequency), passed to
+    callback(frequencies, psd) a few times a second, and the spectrum of
+    the whole recording, returned by finish().
+
+    The sample rate is estimated from the first sensor timestamps. If the
+    thread falls behind, blocks are dropped rather than holding up the
+    ingest thread, and segments restart after the gap.
+    """
+
+    _FINISH = object()
+
+    def __init__(self, callback=None, segment_seconds=DEFAULT_SEGMENT_SECONDS, hop_seconds=DEFAULT_HOP_SECONDS,
+                 window_seconds=DEFAULT_WINDOW_SECONDS, live_max_frequency=DEFAULT_LIVE_MAX_FREQUENCY,
+                 columns=ACCEL_COLUMNS, max_pending=1024):
+        self.callback = callback
+        self.segment_seconds = segment_seconds
+        self.hop_seconds = hop_seconds
+        self.window_seconds = window_seconds
+        self.live_max_frequency = live_max_frequency
+        self.columns = list(columns)
+        self.error = None
+        self.dropped_blocks = 0
+
+        self.sample_rate = None
+        self.frequencies = None
+        self._segment_length = None
+        self._hop = None
+        self._window = None
+        self._live_bins = None
+        self._pending = []
+        self._pending_rows = 0
+        self._rate_times = []
+        self._gap = False
+        self._total = None
+        self._segments = 0
+        self._recent = deque(maxlen=max(int(round(window_seconds / hop_seconds)), 1))
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, samples, arrival_ns=0):
+        """Queue an (n, 7) block of recorded samples; never blocks."""
+        if not len(samples) or self.error is not None:
+            return
+        try:
+            self._queue.put_nowait(samples)
+        except queue.Full:
+            self.dropped_blocks += 1
+            self._gap = True
+
+    def finish(self):
+        """Process everything queued and return the spectrum of the whole recording.
+
+        Returns a dict with 'frequencies', 'psd' (n_frequencies, channels),
+        the 'columns' analyzed, 'segments' and 'sample_rate', or None if
+        the recording was shorter than one segment. Raises the analysis thread's error, if any.
+        """
+        self._queue.put(self._FINISH)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        if not self._segments:
+            return None
+        return {
+            'frequencies': self.frequencies,
+            'psd': (self._total / self._segments).T,
+            'columns': [SAMPLE_COLUMNS[column] for column in self.columns],
+            'segments': self._segments,
+            'sample_rate': self.sample_rate
+        }
+
+    def abort(self):
+        """Stop the analysis thread without computing a result."""
+        self._queue.put(self._FINISH)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            samples = self._queue.get()
+            if samples is self._FINISH:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self._add(samples)
+            except Exception as e:
+                self.error = e
+
+    def _add(self, samples):
+        if self._gap:
+            # Blocks were dropped; a segment must not span the gap
+            self._gap = False
+            self._pending = []
+            self._pending_rows = 0
+
+        self._pending.append(samples[:, self.columns])
+        self._pending_rows += len(samples)
+        if self.sample_rate is None:
+            self._rate_times.append(samples[:, 0])
+            sample_rate = estimate_sample_rate(np.concatenate(self._rate_times))
+            if sample_rate is None:
+                return
+            self._start(sample_rate)
+
+        # Blocks are only joined once there is a new segment to cut
+        if self._pending_rows < self._segment_length:
+            return
+        pending = np.concatenate(self._pending)
+
+        count = 1 + (len(pending) - self._segment_length) // self._hop
+        views = np.lib.stride_tricks.sliding_window_view(pending, self._segment_length, axis=0)
+        psd = segment_psd(views[:count * self._hop:self._hop], self._window, self.sample_rate)
+        self._pending = [pending[count * self._hop:]]
+        self._pending_rows = len(self._pending[0])
+
+        self._total += psd.sum(axis=0)
+        self._segments += count
+        self._recent.extend(psd[:, :, :self._live_bins])
+
+        if self.callback:
+            live = np.mean(self._recent, axis=0).T
+            self.callback(self.frequencies[:self._live_bins], live)
+
+    def _start(self, sample_rate):
+        self.sample_rate = float(sample_rate)
+        self._segment_length = max(int(round(self.sample_rate * self.segment_seconds)), 8)
+        self._hop = max(int(round(self.sample_rate * self.hop_seconds)), 1)
+        self._window = hann_window(self._segment_length)
+        self.frequencies = np.fft.rfftfreq(self._segment_length, 1.0 / self.sample_rate)
+        self._live_bins = int(np.searchsorted(self.frequencies, self.live_max_frequency, side='right'))
+        self._total = np.zeros((len(self.columns), len(self.frequencies)))
+
+
+def save_spectrum(filename, spectrum, metadata=None, shaker_frequency=None):
+    """Write a spectrum from SpectrumAnalyzer.finish() to an .npz, atomically.
+
+    The archive holds 'Frequency', one PSD array per analyzed column
+    and the metadata as a JSON string, like the capture files. The
+    metadata gains 'peak_frequency', the interpolated peak of the summed
+    PSD near shaker_frequency (see find_peak).
+    """
+    arrays = {'Frequency': spectrum['frequencies']}
+    for i, column in enumerate(spectrum['columns']):
+        arrays[column] = spectrum['psd'][:, i]
+    metadata = dict(metadata or {})
+    peak = find_peak(spectrum['frequencies'], spectrum_level(spectrum['psd']), shaker_frequency)
+    metadata.update(segments=spectrum['segments'], sample_rate=spectrum['sample_rate'], peak_frequency=peak)
+    arrays[METADATA_KEY] = np.array(json.dumps(metadata, default=str))
+
+    temp_filename = filename + ".part"
+    with open(temp_filename, 'wb') as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+    return filename
@@ -0,0 +1,109 @@
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QColor, QPainter, QPen
+from PyQt5.QtWidgets import QSizePolicy, QWidget
+from live_plot_widget import polygon_from_arrays
+from spectrum_analyzer import find_peak, spectrum_level
+
+SENSOR_COLORS = (QColor(41, 98, 255), QColor(255, 143, 0), QColor(0, 150, 136), QColor(142, 36, 170))
+
+
+class SpectrumWidget(QWidget):
+    """Live vibration spectrum of each sensor, with the commanded shaker frequency marked.
+
+    Shows the accelerometer power spectral density (summed over X, Y and Z,
+    in dB) from the worker's spectrum_update signal, and the peak found
+    near the commanded frequency for each sensor.
+    """
+
+    MARGIN = 6
+    LABEL_HEIGHT = 16
+    AXIS_HEIGHT = 14
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(360, 180)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.sensor_ids = []
+        self.spectra = {}
+        self.commanded_frequency = None
+
+    def set_sensors(self, sensor_ids):
+        """Start a new spectrum for the given sensors."""
+        self.sensor_ids = list(sensor_ids)
+        self.spectra = {}
+        self.update()
+
+    def set_commanded_frequency(self, frequency):
+        """Mark the frequency the shaker was told to run at (None for no marker)."""
+        self.commanded_frequency = frequency
+        self.update()
+
+    def update_spectrum(self, sensor_id, frequencies, psd):
+        """Show a new live spectrum for a sensor; psd is (n_frequencies, channels)."""
+        self.spectra[sensor_id] = (frequencies, spectrum_level(psd))
+        self.update()
+
+    def find_peak(self, frequencies, level):
+        """Interpolated peak frequency near the commanded frequency (anywhere above 1 Hz without one)."""
+        return find_peak(frequencies, level, self.commanded_frequency)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        rect = QRectF(self.MARGIN, self.MARGIN + self.LABEL_HEIGHT,
+                      max(self.width() - 2 * self.MARGIN, 1),
+                      max(self.height() - 2 * self.MARGIN - self.LABEL_HEIGHT - self.AXIS_HEIGHT, 1))
+        painter.setPen(QPen(QColor('#e0e0e0')))
+        painter.setBrush(QColor('#fafafa'))
+        painter.drawRect(rect)
+
+        spectra = [(sensor_id, self.spectra[sensor_id]) for sensor_id in self.sensor_ids if sensor_id in self.spectra]
+        if not spectra:
+            painter.setPen(QColor('#757575'))
+            painter.drawText(rect, Qt.AlignCenter, "Vibration spectrum appears here while recording")
+            return
+
+        max_frequency = max(frequencies[-1] for _, (frequencies, _) in spectra)
+        low = min(level[1:].min() for _, (_, level) in spectra)
+        high = max(level[1:].max() for _, (_, level) in spectra)
+        if high - low < 1e-9:
+            low, high = low - 1.0, high + 1.0
+        x_scale = rect.width() / max(max_frequency, 1e-9)
+        y_scale = rect.height() / (high - low)
+
+        # Frequency axis
+        painter.setPen(QColor('#757575'))
+        axis = QRectF(rect.left(), rect.bottom(), rect.width(), self.AXIS_HEIGHT)
+        painter.drawText(axis, Qt.AlignLeft | Qt.AlignVCenter, "0 Hz")
+        painter.drawText(axis, Qt.AlignRight | Qt.AlignVCenter, f"{max_frequency:.0f} Hz")
+        painter.drawText(axis, Qt.AlignHCenter | Qt.AlignVCenter, f"Accel PSD {low:.0f} .. {high:.0f} dB")
+
+        # Commanded frequency marker
+        legend = []
+        if self.commanded_frequency and self.commanded_frequency <= max_frequency:
+            x = rect.left() + self.commanded_frequency * x_scale
+            painter.setPen(QPen(QColor('#d32f2f'), 1, Qt.DashLine))
+            painter.drawLine(int(x), int(rect.top()), int(x), int(rect.bottom()))
+            legend.append((f"Shaker {self.commanded_frequency:g} Hz", QColor('#d32f2f')))
+
+        painter.save()
+        painter.setClipRect(rect)
+        for index, (sensor_id, (frequencies, level)) in enumerate(spectra):
+            # DC is dominated by gravity and carries no vibration information
+            x = rect.left() + frequencies[1:] * x_scale
+            y = rect.bottom() - (level[1:] - low) * y_scale
+            color = SENSOR_COLORS[index % len(SENSOR_COLORS)]
+            painter.setPen(QPen(color, 1.5))
+            painter.drawPolyline(polygon_from_arrays(x, y))
+            peak = self.find_peak(frequencies, level)
+            if peak is not None:
+                legend.append((f"Sensor {sensor_id}: {peak:.2f} Hz", color))
+        painter.restore()
+
+        # Legend, each entry in the color of its line
+        x = rect.left()
+        for text, color in legend:
+            painter.setPen(color)
+            painter.drawText(QRectF(x, rect.top() - self.LABEL_HEIGHT, rect.right() - x, self.LABEL_HEIGHT),
+                             Qt.AlignLeft | Qt.AlignVCenter, text)
+            x += painter.fontMetrics().horizontalAdvance(text + "    ")
@@ -0,0 +1,218 @@
+from collections import namedtuple
+import numpy as np
+
+# Delta times more than 5% above the median are timing outliers
+OUTLIER_THRESHOLD = 1.05
+
+TimingStats = namedtuple('TimingStats', ['samples', 'median_delta', 'outlier_count', 'max_outlier', 'max_delta'])
+TimingStats.__doc__ = """Result of analyze_timing; max_outlier is 0.0 when there are no outliers."""
+
+
+def analyze_timing(timestamps, outlier_threshold=OUTLIER_THRESHOLD):
+    """Analyze the sample timestamps of one sensor in a single vectorized pass.
+
+    Returns TimingStats, or None if there are fewer than three samples.
+    """
+    deltas = np.diff(timestamps)
+    if len(deltas) < 2:
+        return None
+
+    median_delta = float(np.median(deltas))
+    outliers = deltas[deltas > median_delta * outlier_threshold]
+    return TimingStats(
+        samples=len(timestamps),
+        median_delta=median_delta,
+        outlier_count=len(outliers),
+        max_outlier=float(outliers.max()) if len(outliers) else 0.0,
+        max_delta=float(deltas.max())
+    )
+
+
+def iter_deltas(blocks):
+    """Yield the delta times of timestamps given in consecutive 1-D blocks."""
+    last_time = None
+    for block in blocks:
+        if not len(block):
+            continue
+        if last_time is None:
+            deltas = np.diff(block)
+        else:
+            deltas = np.diff(block, prepend=last_time)
+        last_time = block[-1]
+        if len(deltas):
+            yield deltas
+
+
+def analyze_timing_blocks(block_source, outlier_threshold=OUTLIER_THRESHOLD, max_selected=1 << 20):
+    """analyze_timing over timestamps that are too long to hold in memory at once.
+
+    block_source() must return a fresh iterable of consecutive 1-D timestamp
+    blocks each time it is called (e.g. a spilled SampleBuffer's
+    iter_column). The exact median is found with a radix select over a few
+    passes, holding at most max_selected deltas in memory; a final pass
+    counts the outliers.
+
+    Returns TimingStats, or None if there are fewer than three samples.
+    """
+    count = 0
+    max_delta = -np.inf
+    for deltas in iter_deltas(block_source()):
+        count += len(deltas)
+        max_delta = max(max_delta, float(deltas.max()))
+    if count < 2:
+        return None
+
+    # The median is the mean of the values at these ranks (equal for odd counts)
+    ranks = sorted({(count - 1) // 2, count // 2})
+    median_delta = float(np.mean([_select_rank(block_source, rank, max_selected) for rank in ranks]))
+
+    outlier_count = 0
+    max_outlier = 0.0
+    limit = median_delta * outlier_threshold
+    for deltas in iter_deltas(block_source()):
+        outliers = deltas[deltas > limit]
+        if len(outliers):
+            outlier_count += len(outliers)
+            max_outlier = max(max_outlier, float(outliers.max()))
+
+    return TimingStats(
+        samples=count + 1,
+        median_delta=median_delta,
+        outlier_count=outlier_count,
+        max_outlier=max_outlier,
+        max_delta=max_delta
+    )
+
+
+_SIGN_BIT = np.uint64(1 << 63)
+
+
+def _sort_keys(values):
+    """Map float64 values to uint64 keys that sort in the same order."""
+    bits = values.view(np.uint64)
+    negative = (bits & _SIGN_BIT).astype(bool)
+    # Negative floats: flip every bit; positive floats: set the sign bit
+    return np.where(negative, ~bits, bits | _SIGN_BIT)
+
+
+def _select_rank(block_source, rank, max_selected, digit_bits=16):
+    """Return the delta at sorted position `rank`, reading the deltas a few times over.
+
+    Each pass fixes the next digit_bits of the sort key of the wanted
+    value, until the deltas sharing the key prefix fit in max_selected.
+    """
+    prefix = 0
+    prefix_bits = 0
+    below = 0  # deltas known to sort before the prefix
+    while prefix_bits < 64:
+        histogram = np.zeros(1 << digit_bits, dtype=np.int64)
+        in_range = 0
+        shift = np.uint64(64 - prefix_bits - digit_bits)
+        for deltas in iter_deltas(block_source()):
+            keys = _prefixed_keys(deltas, prefix, prefix_bits)
+            in_range += len(keys)
+            histogram += np.bincount((keys >> shift).astype(np.intp) & ((1 << digit_bits) - 1),
+                                     minlength=len(histogram))
+        if in_range <= max_selected:
+            break
+
+        cumulative = np.cumsum(histogram)
+        digit = int(np.searchsorted(cumulative, rank - below, side='right'))
+        below += int(cumulative[digit - 1]) if digit else 0
+        prefix = (prefix << digit_bits) | digit
+        prefix_bits += digit_bits
+
+    if prefix_bits == 64:
+        # Every remaining delta has the same key, i.e. the same value
+        key = np.array([prefix], dtype=np.uint64)
+        bits = np.where((key & _SIGN_BIT).astype(bool), key & ~_SIGN_BIT, ~key)
+        return float(bits.view(np.float64)[0])
+
+    selected = [deltas[_prefix_mask(deltas, prefix, prefix_bits)] for deltas in iter_deltas(block_source())]
+    selected = np.concatenate(selected) if selected else np.empty(0)
+    return float(np.partition(selected, rank - below)[rank - below])
+
+
+def _prefix_mask(deltas, prefix, prefix_bits):
+    """Boolean mask of the deltas whose sort key starts with prefix."""
+    if not prefix_bits:
+        return np.ones(len(deltas), dtype=bool)
+    return (_sort_keys(deltas) >> np.uint64(64 - prefix_bits)) == np.uint64(prefix)
+
+
+def _prefixed_keys(deltas, prefix, prefix_bits):
+    """Sort keys of the deltas whose key starts with prefix."""
+    keys = _sort_keys(deltas)
+    if not prefix_bits:
+        return keys
+    return keys[(keys >> np.uint64(64 - prefix_bits)) == np.uint64(prefix)]
+
+
+class StreamingTimingMonitor:
+    """Online counterpart of analyze_timing, fed with timestamps as samples arrive.
+
+    The running median of the delta times is estimated from a log-binned
+    histogram, so memory stays constant however long the capture runs and
+    the median is accurate to about half the bin resolution. A timing
+    outlier is flagged as soon as the largest delta seen exceeds
+    outlier_threshold times the upper edge of the median's bin, once
+    `warmup` deltas are in. That only flags runs analyze_timing is sure to
+    reject too; a max delta within one bin of the threshold is left to the
+    exact analysis after the capture. Deltas from min_delta to max_binned
+    seconds are binned; a median beyond max_binned never flags an outlier.
+    """
+
+    def __init__(self, outlier_threshold=OUTLIER_THRESHOLD, warmup=200, resolution=0.005,
+                 min_delta=1e-6, max_binned=10.0):
+        self.outlier_threshold = outlier_threshold
+        self.warmup = warmup
+        self._log_min = np.log(min_delta)
+        self._log_step = np.log1p(resolution)
+        self._min_delta = min_delta
+        self._histogram = np.zeros(int(np.ceil((np.log(max_binned) - self._log_min) / self._log_step)) + 1,
+                                   dtype=np.int64)
+        self._last_time = None
+        self.count = 0
+        self.max_delta = 0.0
+        self.median_delta = None
+        self.outlier_detected = False
+
+    def add(self, timestamps):
+        """Add a block of sample timestamps; returns True when the first outlier is detected."""
+        if not len(timestamps):
+            return False
+        if self._last_time is None:
+            deltas = np.diff(timestamps)
+        else:
+            deltas = np.diff(timestamps, prepend=self._last_time)
+        self._last_time = timestamps[-1]
+
+        if len(deltas):
+            bins = ((np.log(np.maximum(deltas, self._min_delta)) - self._log_min) / self._log_step).astype(np.intp)
+            np.clip(bins, 0, len(self._histogram) - 1, out=bins)
+            self._histogram += np.bincount(bins, minlength=len(self._histogram))
+            self.count += len(deltas)
+            self.max_delta = max(self.max_delta, float(deltas.max()))
+
+        if self.outlier_detected or self.count < self.warmup:
+            return False
+
+        cumulative = np.cumsum(self._histogram)
+        self.median_delta = self._median(cumulative)
+        if self.max_delta > self._median_upper_bound(cumulative) * self.outlier_threshold:
+            self.outlier_detected = True
+            return True
+        return False
+
+    def _median(self, cumulative):
+        """Estimate the median delta from the histogram (bin centre)."""
+        index = int(np.searchsorted(cumulative, (self.count + 1) / 2))
+        return float(np.exp(self._log_min + (index + 0.5) * self._log_step))
+
+    def _median_upper_bound(self, cumulative):
+        """Upper edge of the bin holding the upper of the middle deltas; the exact median is not above it."""
+        index = int(np.searchsorted(cumulative, self.count // 2 + 1))
+        if index >= len(self._histogram) - 1:
+            # The last bin also holds every delta above max_binned
+            return np.inf
+        return float(np.exp(self._log_min + (index + 1) * self._log_step))
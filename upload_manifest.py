@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+MANIFEST_FILENAME = ".evident_upload_manifest.json"
+_HASH_BLOCK = 1 << 20
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_test_files(directory, test_id):
+    """Capture files in directory that belong to test_id (named ..._<test_id>_<timestamp>...)."""
+    marker = f"_{test_id}_"
+    with os.scandir(directory) as entries:
+        return sorted(entry.path for entry in entries
+                      if entry.is_file() and marker in entry.name and not entry.name.endswith((".journal", ".part")))
+
+
+class UploadManifest:
+    """Record of the files already shipped to AWS from a save folder.
+
+    Kept as a small JSON file in the folder itself, keyed by file name with
+    each file's size, modification time, content hash and the S3 key it went
+    out in. A file whose size and modification time are unchanged is taken
+    to be unchanged without reading it again, so checking a folder of
+    already shipped files costs a stat per file.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_FILENAME)
+        self.entries = {}
+        try:
+            with open(self.path, 'r') as file:
+                self.entries = json.load(file).get('files', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def changed_files(self, paths):
+        """Return {path: sha256} for the paths that are new or changed since they were shipped."""
+        changed = {}
+        for path in paths:
+            entry = self.entries.get(self._key(path))
+            stat = os.stat(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                continue
+            digest = file_digest(path)
+            if entry and entry['sha256'] == digest:
+                # Touched but not modified; remember the new timestamp
+                entry['mtime_ns'] = stat.st_mtime_ns
+                continue
+            changed[path] = digest
+        return changed
+
+    def shipped_keys(self, paths):
+        """S3 keys the given files have already gone out in."""
+        return {self.entries[self._key(path)]['s3_key'] for path in paths if self._key(path) in self.entries}
+
+    def mark_shipped(self, digests, s3_key):
+        """Record {path: sha256} as uploaded in s3_key."""
+        uploaded_at = datetime.now().isoformat(timespec='seconds')
+        for path, digest in digests.items():
+            stat = os.stat(path)
+            self.entries[self._key(path)] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': digest,
+                's3_key': s3_key,
+                'uploaded_at': uploaded_at
+            }
+
+    def save(self):
+        """Write the manifest, replacing the old one only once the new one is complete."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({'files': self.entries}, file, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def _key(self, path):
+        return os.path.relpath(path, self.directory).replace(os.sep, '/')
@@ -0,0 +1,207 @@
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from PyQt5.QtCore import QObject, pyqtSignal
+from s3_upload import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, abort_interrupted_uploads, stream_zip_to_s3
+from upload_manifest import UploadManifest
+from utils import app_data_dir
+
+
+def default_outbox_dir():
+    """Location of the upload outbox in the per-user application data folder."""
+    return os.path.join(app_data_dir(), 'outbox')
+
+
+class UploadQueue(QObject):
+    """Uploads archives to S3 on a background thread from a persistent outbox.
+
+    Every queued upload is a small JSON job file in the outbox folder, so
+    uploads that are pending or failing survive a restart of the app and
+    are picked up again by the next UploadQueue. A failed upload is retried
+    with exponential backoff (retry_delay doubling up to max_retry_delay);
+    since stream_zip_to_s3 leaves the multipart upload open, each retry
+    resumes where the last attempt stopped. A job whose files are gone is
+    dropped and its unfinished multipart upload aborted. Once shipped, the files are
+    recorded in their folder's UploadManifest and the job is removed.
+    """
+
+    # Define signals
+    upload_progress = pyqtSignal(str, int)        # s3_key, percent of the archive uploaded
+    upload_finished = pyqtSignal(str, int)        # s3_key, number of files shipped
+    upload_failed = pyqtSignal(str, str, float)   # s3_key, error message, seconds until the retry (-1: dropped)
+    queue_changed = pyqtSignal(int)               # number of uploads waiting
+
+    def __init__(self, bucket, client_factory, outbox_dir=None, part_size=DEFAULT_PART_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, retry_delay=5.0, max_retry_delay=900.0):
+        super().__init__()
+        self.bucket = bucket
+        self.client_factory = client_factory
+        self.outbox_dir = outbox_dir or default_outbox_dir()
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        os.makedirs(self.outbox_dir, exist_ok=True)
+
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Uploads left over from an earlier session
+        for path in sorted(glob.glob(os.path.join(self.outbox_dir, "*.json"))):
+            try:
+                with open(path, 'r') as file:
+                    job = json.load(file)
+                job['next_attempt'] = 0.0
+                self._jobs[path] = job
+            except (OSError, ValueError):
+                continue
+
+    def start(self):
+        """Start the upload thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self.queue_changed.emit(len(self._jobs))
+
+    def stop(self, timeout=2.0):
+        """Stop the upload thread; unfinished uploads stay in the outbox."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def enqueue(self, paths, s3_key, digests, manifest_dir):
+        """Queue paths to be zipped and uploaded as s3_key.
+
+        digests maps each path to its SHA-256, recorded in the UploadManifest
+        of manifest_dir once the upload has completed.
+        """
+        job = {
+            's3_key': s3_key,
+            'paths': list(paths),
+            'digests': digests,
+            'manifest_dir': manifest_dir,
+            'attempts': 0,
+            'queued_at': time.time(),
+            'next_attempt': 0.0
+        }
+        path = os.path.join(self.outbox_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.json")
+        self._save_job(path, job)
+        with self._lock:
+            self._jobs[path] = job
+            count = len(self._jobs)
+        self.queue_changed.emit(count)
+        self._wake.set()
+        return path
+
+    def pending(self):
+        """The jobs waiting to be uploaded, oldest first."""
+        with self._lock:
+            return [dict(job) for _, job in sorted(self._jobs.items())]
+
+    def queued_paths(self):
+        """Every file that is part of a waiting upload."""
+        return {path for job in self.pending() for path in job['paths']}
+
+    def queued_keys(self):
+        """The S3 keys of the waiting uploads."""
+        return {job['s3_key'] for job in self.pending()}
+
+    def _run(self):
+        while not self._stop.is_set():
+            path, job = self._next_due()
+            if job is None:
+                self._wake.wait(self._time_to_next())
+                self._wake.clear()
+                continue
+
+            try:
+                self._upload(job)
+            except FileNotFoundError as e:
+                # Retrying cannot help once the files are gone (e.g. removed by a redo)
+                message = self._abandon_upload(job, str(e))
+                self._remove_job(path)
+                self.upload_failed.emit(job['s3_key'], message, -1.0)
+                continue
+            except Exception as e:
+                job['attempts'] += 1
+                delay = min(self.retry_delay * 2 ** (job['attempts'] - 1), self.max_retry_delay)
+                delay *= random.uniform(0.8, 1.2)
+                job['next_attempt'] = time.time() + delay
+                job['last_error'] = str(e)
+                self._save_job(path, job)
+                self.upload_failed.emit(job['s3_key'], str(e), delay)
+                continue
+
+            self._remove_job(path)
+            self.upload_finished.emit(job['s3_key'], len(job['paths']))
+
+    def _upload(self, job):
+        """Ship one job and record it in the manifest; raises on failure."""
+        missing = [path for path in job['paths'] if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"{len(missing)} file(s) to upload no longer exist, e.g. {missing[0]}")
+        s3 = self.client_factory()
+
+        last_percent = [-1]
+
+        def progress(done, total):
+            # Up to 99% while the files are read; the last parts are still in flight
+            percent = min(99, 100 * done // max(total, 1))
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.upload_progress.emit(job['s3_key'], percent)
+
+        stream_zip_to_s3(s3, self.bucket, job['s3_key'], job['paths'],
+                         self.part_size, self.concurrency, progress)
+        self.upload_progress.emit(job['s3_key'], 100)
+
+        manifest = UploadManifest(job['manifest_dir'])
+        manifest.mark_shipped(job['digests'], job['s3_key'])
+        manifest.save()
+
+    def _abandon_upload(self, job, message):
+        """Abort the job's unfinished multipart upload, if any, so its parts stop being stored.
+
+        Returns message, noting if the abort failed.
+        """
+        try:
+            abort_interrupted_uploads(self.client_factory(), self.bucket, job['s3_key'])
+        except Exception as e:
+            message += f" (could not abort the unfinished upload: {str(e)})"
+        return message
+
+    def _next_due(self):
+        now = time.time()
+        with self._lock:
+            for path, job in sorted(self._jobs.items()):
+                if job['next_attempt'] <= now:
+                    return path, job
+        return None, None
+
+    def _time_to_next(self):
+        with self._lock:
+            if not self._jobs:
+                return None
+            return max(0.0, min(job['next_attempt'] for job in self._jobs.values()) - time.time())
+
+    def _remove_job(self, path):
+        with self._lock:
+            self._jobs.pop(path, None)
+            count = len(self._jobs)
+        os.remove(path)
+        self.queue_changed.emit(count)
+
+    def _save_job(self, path, job):
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(job, file, indent=1)
+        os.replace(temp_path, path)
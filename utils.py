@@ -3,6 +3,11 @@ from PyQt5.QtGui import QPixmap, QPainter
 from PyQt5.QtCore import Qt
 from PyQt5.QtSvg import QSvgRenderer
 
+def app_data_dir():
+    """Per-user folder for the application's own data (run catalog, upload outbox)."""
+    base = os.environ.get('APPDATA') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'EVident')
+
 def load_svg_logo(svg_path, width=None, height=None):
     """Load an SVG file and convert it to a QPixmap of specified size."""
     if not os.path.exists(svg_path):